@@ -0,0 +1,207 @@
+"""
+Size/speed/quality matrix of the page codec settings over a corpus of captured pages.
+
+Runs every image_format PdfConverter supports (JPEG at each --qualities
+value) at each --widths page width on every page, on all cores, and reports
+per configuration: bytes/page, encode ms/page, decode ms/page, and PSNR and
+SSIM of the decoded page against the captured page (grayscale, at capture
+resolution). Configurations that no other configuration beats on both size
+and SSIM are marked as Pareto-optimal.
+
+Usage:
+    python -m benchmarks.compression_matrix path/to/temp_screenshots --json matrix.json
+    python -m benchmarks.compression_matrix --synthetic 20
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.automation.mrc import is_mrc_data, unpack_layers
+from src.automation.parallel_optimizer import optimize_page
+from src.constants import FrameFile, ImageProcessing
+
+_IMAGE_EXTENSIONS = (FrameFile.EXTENSION, ".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+# Worker state: captured pages and their grayscale planes, loaded once per process
+_pages = []
+_references = []
+
+
+def _load_corpus(folder, synthetic, limit):
+    """Captured page bytes from folder (frame files or images), or synthetic pages"""
+    if synthetic:
+        from src.automation.frame_source import SyntheticFrameSource
+        from src.frame import Frame
+        from src.frame_file import encode_frame
+
+        source = SyntheticFrameSource(page_count=synthetic)
+        return [encode_frame(Frame(cv2.cvtColor(source.render_page(i), cv2.COLOR_GRAY2BGRA)))
+                for i in range(synthetic)]
+    paths = sorted(path for path in glob.glob(os.path.join(folder, "*"))
+                   if path.lower().endswith(_IMAGE_EXTENSIONS))
+    pages = []
+    for path in paths[:limit] if limit else paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def _init_worker(pages):
+    from src.frame_file import decode_page_image
+
+    global _pages, _references
+    _pages = pages
+    _references = []
+    for data in pages:
+        with decode_page_image(data) as img:
+            _references.append(np.asarray(img.convert("L")))
+
+
+def _decode(data):
+    """Decode an optimized page to a grayscale plane, as a PDF viewer would composite it"""
+    if is_mrc_data(data):
+        layers = unpack_layers(data)
+        with Image.open(io.BytesIO(layers.mask)) as mask_img:
+            mask = np.asarray(mask_img.convert("L")) < 128
+        with Image.open(io.BytesIO(layers.background)) as background_img:
+            background = np.asarray(background_img.convert("L"))
+        plane = cv2.resize(background, (mask.shape[1], mask.shape[0]), interpolation=cv2.INTER_LINEAR)
+        red, green, blue = layers.color
+        plane[mask] = int(round(0.299 * red + 0.587 * green + 0.114 * blue))
+        return plane
+    with Image.open(io.BytesIO(data)) as img:
+        return np.asarray(img.convert("L"))
+
+
+def _ssim(a, b):
+    """Mean SSIM of two float32 planes (Gaussian window, sigma 1.5)"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    covariance = blur(a * b) - mu_a * mu_b
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * covariance + c2) /
+            ((mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2)))
+    return float(ssim.mean())
+
+
+def _measure(task):
+    """Worker entry point: encode, decode and score one page with one configuration"""
+    config, index = task
+    start = time.perf_counter()
+    data, _ = optimize_page(_pages[index], config["format"], config["quality"] or 90,
+                            max_width=config["width"])
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    plane = _decode(data)
+    decode_time = time.perf_counter() - start
+
+    reference = _references[index]
+    # Compare at capture resolution, as the page is viewed at its full size
+    restored = cv2.resize(plane, (reference.shape[1], reference.shape[0]), interpolation=cv2.INTER_LINEAR)
+    a, b = reference.astype(np.float32), restored.astype(np.float32)
+    mse = float(np.mean((a - b) ** 2))
+    psnr = 99.0 if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+    return len(data), encode_time, decode_time, psnr, _ssim(a, b)
+
+
+def _configurations(formats, qualities, widths):
+    configs = []
+    for image_format in formats:
+        for width in widths:
+            for quality in qualities if image_format == "JPEG" else [None]:
+                name = image_format + (f" q{quality}" if quality is not None else "") + f" w{width}"
+                configs.append({"name": name, "format": image_format, "quality": quality, "width": width})
+    return configs
+
+
+def _mark_pareto(results):
+    """Flag results that no other result beats on both bytes/page and SSIM"""
+    for result in results:
+        result["pareto"] = not any(
+            other is not result and
+            other["bytes_per_page"] <= result["bytes_per_page"] and other["ssim"] >= result["ssim"] and
+            (other["bytes_per_page"] < result["bytes_per_page"] or other["ssim"] > result["ssim"])
+            for other in results
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codec size/speed/quality matrix over captured pages")
+    parser.add_argument("folder", nargs="?", help="Folder of captured pages (.kfr frame files or images)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use this many virtual Kindle pages instead of a folder")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many pages (0 = all)")
+    parser.add_argument("--formats", default=",".join(ImageProcessing.SUPPORTED_FORMATS),
+                        help="Comma-separated image formats")
+    parser.add_argument("--qualities", default="60,75,85,90", help="Comma-separated JPEG qualities")
+    parser.add_argument("--widths", default=str(ImageProcessing.MAX_IMAGE_WIDTH),
+                        help="Comma-separated page width limits")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = one per CPU core)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+    if not args.folder and not args.synthetic:
+        parser.error("pass a folder of captured pages or --synthetic N")
+
+    pages = _load_corpus(args.folder, args.synthetic, args.limit)
+    if not pages:
+        parser.error(f"no captured pages found in {args.folder}")
+    configs = _configurations(
+        [f.strip().upper() for f in args.formats.split(",") if f.strip()],
+        [int(q) for q in args.qualities.split(",") if q.strip()],
+        [int(w) for w in args.widths.split(",") if w.strip()],
+    )
+    workers = args.workers or os.cpu_count() or 1
+    tasks = [(config, index) for config in configs for index in range(len(pages))]
+    print(f"{len(pages)} pages x {len(configs)} configurations on {workers} worker processes")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pages,)) as pool:
+        measurements = list(pool.map(_measure, tasks, chunksize=max(1, len(pages) // 4)))
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for i, config in enumerate(configs):
+        rows = np.array(measurements[i * len(pages):(i + 1) * len(pages)], dtype=np.float64)
+        results.append({
+            "name": config["name"],
+            "format": config["format"],
+            "quality": config["quality"],
+            "width": config["width"],
+            "bytes_per_page": float(rows[:, 0].mean()),
+            "encode_ms": float(rows[:, 1].mean() * 1000),
+            "decode_ms": float(rows[:, 2].mean() * 1000),
+            "psnr": float(rows[:, 3].mean()),
+            "ssim": float(rows[:, 4].mean()),
+        })
+    _mark_pareto(results)
+
+    print(f"{'configuration':<20}{'KB/page':>9}{'encode ms':>11}{'decode ms':>11}"
+          f"{'PSNR dB':>9}{'SSIM':>8}  pareto")
+    for result in sorted(results, key=lambda r: r["bytes_per_page"]):
+        print(f"{result['name']:<20}{result['bytes_per_page'] / 1024:>9.1f}{result['encode_ms']:>11.1f}"
+              f"{result['decode_ms']:>11.1f}{result['psnr']:>9.2f}{result['ssim']:>8.4f}"
+              f"  {'*' if result['pareto'] else ''}")
+    print(f"Total {elapsed:.1f} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pages": len(pages), "source": args.folder or f"synthetic:{args.synthetic}",
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
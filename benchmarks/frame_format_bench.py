@@ -0,0 +1,80 @@
+"""
+Encode+decode cost per page of the temp screenshot formats.
+
+Compares the previous default-settings PNG round-trip (save on the writer
+thread, Image.open/load in PdfConverter) with the intermediate frame file
+format (src/frame_file.py) on pages rendered by the synthetic "virtual Kindle".
+
+Usage:
+    python -m benchmarks.frame_format_bench --pages 20
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import cv2
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.automation.frame_source import SyntheticFrameSource
+from src.frame import Frame
+from src.frame_file import decode_frame, encode_frame
+
+
+def _png_encode(frame):
+    buffer = io.BytesIO()
+    frame.to_image().save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _png_decode(data):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temp screenshot format benchmark")
+    parser.add_argument("--pages", type=int, default=20, help="Pages to encode")
+    parser.add_argument("--width", type=int, default=1200, help="Page width in pixels")
+    parser.add_argument("--height", type=int, default=1700, help="Page height in pixels")
+    args = parser.parse_args()
+
+    source = SyntheticFrameSource(page_count=args.pages, page_size=(args.width, args.height))
+    frames = []
+    for index in range(args.pages):
+        gray = source.render_page(index)
+        frames.append(Frame(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGRA)))
+
+    formats = [
+        ("PNG (previous)", _png_encode, _png_decode),
+        ("frame L zlib-1", lambda f: encode_frame(f, "L", 1), decode_frame),
+        ("frame L raw", lambda f: encode_frame(f, "L", 0), decode_frame),
+        ("frame BGRA zlib-1", lambda f: encode_frame(f, "BGRA", 1), decode_frame),
+    ]
+
+    print(f"{args.pages} pages of {args.width}x{args.height}")
+    print(f"{'format':<20}{'encode ms':>11}{'decode ms':>11}{'total ms':>10}{'KB/page':>10}")
+    for name, encode, decode in formats:
+        encode_time = decode_time = 0.0
+        total_bytes = 0
+        for frame in frames:
+            # The grayscale plane is cached on the frame; reset it so every format pays for it
+            frame._gray = None
+            start = time.perf_counter()
+            data = encode(frame)
+            encode_time += time.perf_counter() - start
+            start = time.perf_counter()
+            decode(data)
+            decode_time += time.perf_counter() - start
+            total_bytes += len(data)
+        pages = len(frames)
+        print(f"{name:<20}{encode_time / pages * 1000:>11.1f}{decode_time / pages * 1000:>11.1f}"
+              f"{(encode_time + decode_time) / pages * 1000:>10.1f}{total_bytes / pages / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
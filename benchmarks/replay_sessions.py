@@ -0,0 +1,86 @@
+"""
+Replay recorded capture sessions through the page-change and end-of-book logic.
+
+Record sessions by passing record_session=<dir> to AutomationCoordinator.run()
+(or --record to benchmarks/virtual_kindle_run.py), then evaluate detector
+settings offline:
+
+    python -m benchmarks.replay_sessions recordings/* --threshold 8 --settle-samples 2
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.automation.session_replay import SessionReplayer
+from src.constants import AdaptiveWait, PageDetection, SessionRecording
+
+
+def _fmt(value, unit=""):
+    return "-" if value is None else f"{value * 1000:.0f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay of capture session recordings")
+    parser.add_argument("sessions", nargs="+", help="Recording directories (globs allowed)")
+    parser.add_argument("--threshold", type=float, default=PageDetection.HASH_DIFF_THRESHOLD,
+                        help="Page change / end detection hash threshold")
+    parser.add_argument("--settle-samples", type=int, default=AdaptiveWait.SETTLE_SAMPLES)
+    parser.add_argument("--settle-threshold", type=float, default=AdaptiveWait.SETTLE_DIFF_THRESHOLD)
+    parser.add_argument("--timeout", type=float, default=AdaptiveWait.TIMEOUT)
+    parser.add_argument("--end-sensitivity", type=int, default=PageDetection.DEFAULT_END_DETECTION_SENSITIVITY)
+    parser.add_argument("--rehash", action="store_true",
+                        help="Re-hash the recorded grayscale planes instead of using the live hashes")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    args = parser.parse_args()
+
+    session_dirs = []
+    for pattern in args.sessions:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if os.path.exists(os.path.join(path, SessionRecording.EVENTS_FILENAME)):
+                session_dirs.append(path)
+    if not session_dirs:
+        parser.error("No recordings found")
+
+    replayer = SessionReplayer(
+        change_threshold=args.threshold,
+        settle_samples=args.settle_samples,
+        settle_threshold=args.settle_threshold,
+        timeout=args.timeout,
+        consecutive_matches=args.end_sensitivity,
+        end_threshold=args.threshold,
+        rehash=args.rehash,
+    )
+    start = time.perf_counter()
+    result = replayer.replay_many(session_dirs)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'session':40} {'pages':>6} {'live':>6} {'end':>4} {'f.end':>5} {'miss':>5} "
+          f"{'spur':>5} {'torn':>5} {'dup':>5} {'lat.mean':>9} {'lat.p95':>8}")
+    for r in result["sessions"]:
+        print(f"{os.path.basename(r['session'].rstrip(os.sep))[:40]:40} {r['pages']:>6} {r['live_pages']:>6} "
+              f"{'yes' if r['end_detected'] else 'no':>4} {r['false_end_detections']:>5} "
+              f"{r['missed_turns']:>5} {r['spurious_turns']:>5} {r['torn_captures']:>5} "
+              f"{r['duplicate_pages']:>5} {_fmt(r['latency_mean'], 'ms'):>9} {_fmt(r['latency_p95'], 'ms'):>8}")
+
+    totals = result["totals"]
+    print()
+    print(f"Sessions: {totals['sessions']}, pages: {totals['pages']} (live: {totals['live_pages']}), "
+          f"replayed in {elapsed:.2f} s")
+    print(f"False end detections: {totals['false_end_detections']}, missed turns: {totals['missed_turns']}, "
+          f"spurious turns: {totals['spurious_turns']}, torn captures: {totals['torn_captures']}, "
+          f"exhausted waits: {totals['exhausted_waits']}")
+    print(f"Decision latency: mean {_fmt(totals['latency_mean'], ' ms')}, p95 {_fmt(totals['latency_p95'], ' ms')}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
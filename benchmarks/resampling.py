@@ -0,0 +1,126 @@
+"""
+Speed and quality of the page resampling engines (src/automation/resampler.py).
+
+For every captured page, times decode + grayscale + downscale to --width
+with each engine and with the previous path (full PIL decode, convert("L"),
+LANCZOS resize), and scores each engine's page against the LANCZOS page
+(PSNR, SSIM) and, scaled back up as a viewer shows it, against the captured
+page (SSIM vs capture; LANCZOS is not necessarily the best there). Synthetic pages are rendered at --page-width, i.e. a HiDPI
+capture that has to be scaled down.
+
+Usage:
+    python -m benchmarks.resampling --synthetic 20 --page-width 2400
+    python -m benchmarks.resampling path/to/temp_screenshots --width 1200
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.compression_matrix import _load_corpus, _ssim
+from src.automation.resampler import RESAMPLERS, decode_pixels, resample
+from src.constants import ImageProcessing, VirtualKindle
+from src.frame_file import decode_page_image
+
+
+def _previous_path(data, width):
+    """Decode, convert and resize the way optimize_page did before the resampling engines"""
+    with decode_page_image(data) as img:
+        page = img.convert("L")
+        if page.width > width:
+            page = page.resize((width, int(page.height * (width / float(page.width)))), Image.LANCZOS)
+        return np.asarray(page)
+
+
+def _synthetic_corpus(pages, page_width, color):
+    from src.automation.frame_source import SyntheticFrameSource
+    from src.frame import Frame
+    from src.frame_file import encode_frame
+
+    aspect = VirtualKindle.PAGE_SIZE[1] / VirtualKindle.PAGE_SIZE[0]
+    source = SyntheticFrameSource(page_count=pages, page_size=(page_width, int(page_width * aspect)))
+    return [encode_frame(Frame(cv2.cvtColor(source.render_page(i), cv2.COLOR_GRAY2BGRA)),
+                         mode="BGRA" if color else "L")
+            for i in range(pages)]
+
+
+def _capture_ssim(plane, captured):
+    """SSIM of a page scaled back to capture size against the captured grayscale page"""
+    restored = cv2.resize(plane, (captured.shape[1], captured.shape[0]), interpolation=cv2.INTER_LINEAR)
+    return _ssim(restored.astype(np.float32), captured)
+
+
+def _time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page resampling engine benchmark")
+    parser.add_argument("folder", nargs="?", help="Folder of captured pages (.kfr frame files or images)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use this many virtual Kindle pages instead of a folder")
+    parser.add_argument("--page-width", type=int, default=2400, help="Width of synthetic pages")
+    parser.add_argument("--color", action="store_true", help="Store synthetic pages as BGRA frames")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many pages (0 = all)")
+    parser.add_argument("--width", type=int, default=ImageProcessing.MAX_IMAGE_WIDTH, help="Target page width")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per page (best is kept)")
+    args = parser.parse_args()
+    if not args.folder and not args.synthetic:
+        parser.error("pass a folder of captured pages or --synthetic N")
+
+    if args.synthetic:
+        pages = _synthetic_corpus(args.synthetic, args.page_width, args.color)
+    else:
+        pages = _load_corpus(args.folder, 0, args.limit)
+    if not pages:
+        parser.error(f"no captured pages found in {args.folder}")
+
+    names = ["previous (PIL decode + LANCZOS)"] + list(RESAMPLERS)
+    times = {name: [] for name in names}
+    scores = {name: [] for name in names}
+    fidelity = {name: [] for name in names}
+    pixels = 0
+    for data in pages:
+        reference, elapsed = _time(lambda: _previous_path(data, args.width), args.repeat)
+        times[names[0]].append(elapsed)
+        captured = _previous_path(data, sys.maxsize).astype(np.float32)
+        pixels += captured.size
+        fidelity[names[0]].append(_capture_ssim(reference, captured))
+        reference = reference.astype(np.float32)
+        for resampler in RESAMPLERS:
+            plane, elapsed = _time(lambda: resample(
+                decode_pixels(data, min_width=args.width, resampler=resampler), args.width,
+                resampler=resampler), args.repeat)
+            times[resampler].append(elapsed)
+            fidelity[resampler].append(_capture_ssim(plane, captured))
+            plane = plane.astype(np.float32)
+            mse = float(np.mean((plane - reference) ** 2))
+            scores[resampler].append((99.0 if mse == 0 else 10 * np.log10(255.0 ** 2 / mse),
+                                      _ssim(plane, reference)))
+    scores[names[0]] = [(99.0, 1.0)] * len(pages)
+
+    baseline = sum(times[names[0]])
+    print(f"{len(pages)} pages, {pixels / len(pages) / 1e6:.2f} Mpixel/page -> {args.width} px wide")
+    print(f"{'engine':<34}{'ms/page':>9}{'Mpixel/s':>10}{'speedup':>9}{'PSNR dB':>9}{'SSIM':>8}"
+          f"{'SSIM vs capture':>17}")
+    for name in names:
+        total = sum(times[name])
+        psnr, ssim = np.mean(scores[name], axis=0)
+        print(f"{name:<34}{total / len(pages) * 1000:>9.1f}{pixels / total / 1e6:>10.1f}"
+              f"{baseline / total:>8.1f}x{psnr:>9.2f}{ssim:>8.4f}{np.mean(fidelity[name]):>17.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Headless throughput run against the synthetic "virtual Kindle".
+
+Drives AutomationCoordinator's capture loop, ImageHasher and PdfConverter with
+a SyntheticFrameSource, so the whole pipeline can be measured on a machine
+without a Windows desktop or Kindle for PC.
+
+Usage:
+    python -m benchmarks.virtual_kindle_run --pages 100 --latency 0.15
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.automation.automation_coordinator import AutomationCoordinator
+from src.automation.frame_source import SyntheticFrameSource
+from src.automation.frame_store import DiskFrameStore, MemoryFrameStore
+from src.automation.session_recorder import SessionRecorder
+from src.constants import ImageProcessing, PageTurnDirection
+from src.utils import create_temp_dir, cleanup_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless capture/PDF throughput run")
+    parser.add_argument("--pages", type=int, default=50, help="Pages to capture")
+    parser.add_argument("--book-pages", type=int, default=None,
+                        help="Pages in the fake book (default: pages, to exercise end detection use fewer)")
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated render latency (s)")
+    parser.add_argument("--animation-frames", type=int, default=4, help="Simulated animation frames")
+    parser.add_argument("--fixed-delays", action="store_true", help="Use fixed sleeps instead of the adaptive waiter")
+    parser.add_argument("--no-sentinels", action="store_true",
+                        help="Poll the full region instead of sentinel patches")
+    parser.add_argument("--serial-pdf", action="store_true",
+                        help="Build the PDF after capture instead of while capturing")
+    parser.add_argument("--frame-store", choices=["memory", "disk"], default="memory",
+                        help="Keep captured pages in RAM or in a temp screenshots folder")
+    parser.add_argument("--region-margin", type=int, default=0,
+                        help="Grow the capture region by this many pixels on every side (generous selections)")
+    parser.add_argument("--content-crop", action="store_true",
+                        help="Narrow the capture region to the page content measured on the first pages")
+    parser.add_argument("--image-format", choices=ImageProcessing.SUPPORTED_FORMATS, default="PNG",
+                        help="Optimized page format (AUTO = per-page codec policy)")
+    parser.add_argument("--volume-pages", type=int, default=0,
+                        help="Build the PDF as volumes of this many pages after capture (implies --serial-pdf)")
+    parser.add_argument("--volume-mb", type=float, default=0,
+                        help="Build the PDF as volumes of about this many MB after capture (implies --serial-pdf)")
+    parser.add_argument("--chapters", action="store_true",
+                        help="Cut volumes at detected chapter starts (implies --serial-pdf)")
+    parser.add_argument("--merge-volumes", action="store_true",
+                        help="Also merge the volumes into one PDF without re-encoding")
+    parser.add_argument("--no-linearize", action="store_true",
+                        help="Write a plain PDF instead of a linearized (fast web view) one")
+    parser.add_argument("--verbose", action="store_true", help="Print status messages (per-page codec decisions)")
+    parser.add_argument("--record", help="Record the session to this directory for offline replay")
+    parser.add_argument("--keep", action="store_true", help="Keep the output folder")
+    args = parser.parse_args()
+    volume_mode = bool(args.volume_pages or args.volume_mb or args.chapters)
+
+    source = SyntheticFrameSource(
+        page_count=args.book_pages or args.pages,
+        render_latency=args.latency,
+        animation_frames=args.animation_frames,
+        forward_key=PageTurnDirection.LEFT_KEY,
+    )
+    # Count grabbed pixels to compare polling cost between detectors
+    grab_stats = {"grabs": 0, "pixels": 0}
+    synthetic_grab = source.grab
+
+    def counting_grab(region):
+        grab_stats["grabs"] += 1
+        grab_stats["pixels"] += region["width"] * region["height"]
+        return synthetic_grab(region)
+
+    source.grab = counting_grab
+    quiet = lambda *a: None
+    coordinator = AutomationCoordinator(
+        status_callback=print if args.verbose else quiet, preview_callback=quiet, progress_callback=quiet,
+        frame_source=source
+    )
+    coordinator.pdf_converter.linearize = not args.no_linearize
+    region = source.book_region
+    margin = args.region_margin
+    book_region = (region["left"] - margin, region["top"] - margin,
+                   region["width"] + 2 * margin, region["height"] + 2 * margin)
+
+    output_folder = tempfile.mkdtemp(prefix="virtual_kindle_")
+    screenshots_folder = None
+    if args.frame_store == "disk":
+        screenshots_folder = create_temp_dir(output_folder, prefix="temp_screenshots_")
+        frame_store = DiskFrameStore(screenshots_folder)
+    else:
+        frame_store = MemoryFrameStore()
+    recorder = SessionRecorder(args.record, metadata={"synthetic": True}) if args.record else None
+    try:
+        pdf_build = None
+        if not args.serial_pdf and not volume_mode:
+            pdf_build = coordinator.pdf_converter.start_incremental_pdf(
+                output_folder, "virtual_book.pdf", image_format=args.image_format, frame_store=frame_store
+            )
+
+        start = time.perf_counter()
+        image_files = coordinator._take_screenshots(
+            args.pages, frame_store, PageTurnDirection.LEFT_KEY, book_region,
+            adaptive_wait=not args.fixed_delays,
+            session_recorder=recorder,
+            sentinel_detection=not args.no_sentinels,
+            on_page_written=pdf_build.add if pdf_build is not None else None,
+            keep_color=args.image_format == "AUTO",
+            content_crop=args.content_crop
+        )
+        capture_time = time.perf_counter() - start
+        if recorder is not None:
+            recorder.close()
+
+        # With the incremental build this only measures the tail left after capture
+        start = time.perf_counter()
+        if pdf_build is not None:
+            pdf_path = pdf_build.finish(len(image_files))
+        elif volume_mode:
+            pdf_paths = coordinator.pdf_converter.create_pdf_volumes(
+                image_files, output_folder, "virtual_book.pdf", image_format=args.image_format,
+                frame_store=frame_store, max_pages=args.volume_pages,
+                max_bytes=int(args.volume_mb * 1024 * 1024), split_at_chapters=args.chapters,
+                merge=args.merge_volumes
+            )
+            for path in pdf_paths:
+                print(f"Volume         : {os.path.basename(path)} {os.path.getsize(path) / 1024:.1f} KB")
+            pdf_path = pdf_paths[0]
+        else:
+            pdf_path = coordinator.pdf_converter.create_pdf_from_images(
+                image_files, output_folder, "virtual_book.pdf", image_format=args.image_format,
+                frame_store=frame_store
+            )
+        pdf_time = time.perf_counter() - start
+
+        pages = len(image_files)
+        print(f"Captured pages : {pages}")
+        print(f"Capture time   : {capture_time:.2f} s ({pages / capture_time * 60:.1f} pages/min)")
+        print(f"Grabs          : {grab_stats['grabs']} "
+              f"({grab_stats['pixels'] / max(1, pages) / 1e6:.2f} Mpixel/page)")
+        print(f"PDF after capture: {pdf_time:.2f} s ({pdf_time / max(1, pages) * 1000:.1f} ms/page)")
+        print(f"PDF size       : {os.path.getsize(pdf_path) / 1024:.1f} KB")
+        with open(pdf_path, "rb") as f:
+            linearized = re.search(rb"/Linearized 1 .*?/E (\d+)", f.read(1024))
+        if linearized:
+            print(f"First page end : {int(linearized.group(1)) / 1024:.1f} KB (linearized)")
+        if isinstance(frame_store, MemoryFrameStore):
+            stats = frame_store.stats()
+            print(f"Frame store    : peak {stats['peak_memory_bytes'] / (1024 ** 2):.1f} MB, "
+                  f"{stats['total_spilled']} pages spilled")
+    finally:
+        frame_store.close()
+        cleanup_dir(screenshots_folder)
+        if not args.keep:
+            cleanup_dir(output_folder)
+        else:
+            print(f"Output kept in {output_folder}")
+
+
+if __name__ == "__main__":
+    main()
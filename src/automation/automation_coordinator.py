@@ -7,24 +7,44 @@ import os
 import time
 import uuid
 from typing import Optional, Callable, List, Tuple
-import pyautogui
-from PIL import Image
-import mss
 import tkinter as tk
 import tkinter.messagebox as messagebox
 import threading
-import shutil
 import ctypes
 from src.constants import (
     PowerManagement,
     Storage,
     PageDetection,
     Delays,
+    CapturePipeline,
+    AdaptiveWait,
+    GUI,
+    Fingerprint,
+    DuplicateDetection,
+    SentinelDetection,
+    FrameStorage,
+    FrameFile,
+    ContentCrop,
+    PageClassification,
 )
 from ..utils import create_temp_dir, cleanup_dir
 from src.automation.kindle_controller import KindleController
-from .pdf_converter import PdfConverter
-from src.image_hasher import ImageHasher
+from .pdf_converter import PdfConverter, IncrementalPdfBuild
+from .capture_pipeline import FrameWriterPool
+from .page_turn_waiter import PageTurnWaiter
+from .sentinel_detector import SentinelChangeDetector
+from .frame_source import FrameSource, MssFrameSource
+from .end_of_book import EndOfBookDetector
+from .page_index import PageHashIndex, RepeatedPageMonitor
+from .session_recorder import SessionRecorder, RecordingFrameSource
+from .capture_journal import CaptureJournal
+from .frame_store import FrameStore, DiskFrameStore, MemoryFrameStore
+from .storage_budget import StorageBudgetManager
+from .content_bounds import ContentBoundsCalibrator
+from src.fingerprint import FingerprintEngine
+from src.frame import Frame
+from src.frame_file import encode_frame, page_file_name
+from src.page_classifier import is_color
 from src.callback_utils import get_callback_or_default
 
 
@@ -33,18 +53,23 @@ class AutomationCoordinator:
 
     def __init__(self, output_dir=None, status_callback=None, error_callback=None,
                  success_callback=None, completion_callback=None, preview_callback=None,
-                 progress_callback=None, root_window=None):
+                 progress_callback=None, root_window=None,
+                 frame_source: Optional[FrameSource] = None):
         from src.constants import DefaultConfig
         self.output_dir = output_dir if output_dir is not None else DefaultConfig.get_output_folder()
         self.status_callback = get_callback_or_default(status_callback, "Status")
         self.error_callback = get_callback_or_default(error_callback, "Error")
         self.success_callback = success_callback or (lambda path: print(f"Success: {path}"))
         self.completion_callback = completion_callback or (lambda: print("Complete."))
-        self.preview_callback = preview_callback or (lambda path: print(f"Preview: {path}"))
+        self.preview_callback = preview_callback or (lambda image: print(f"Preview: {image}"))
         self.progress_callback = progress_callback or (lambda cur, tot: print(f"Progress: {cur}/{tot}"))
         self.root_window = root_window
 
-        self.kindle_controller = KindleController(self.status_callback, self.error_callback)
+        # Capture/key-input backend; a SyntheticFrameSource allows headless runs
+        self.frame_source = frame_source if frame_source is not None else MssFrameSource()
+        self.kindle_controller = KindleController(
+            self.status_callback, self.error_callback, frame_source=self.frame_source
+        )
         self.pdf_converter = PdfConverter(self.status_callback)
 
         self.stop_event = threading.Event()
@@ -67,14 +92,93 @@ class AutomationCoordinator:
     def _take_screenshots(
         self,
         pages: int,
-        screenshots_folder: str,
+        frame_store: FrameStore,
         page_turn_direction: str,
-        book_region: Tuple[int, int, int, int]
+        book_region: Tuple[int, int, int, int],
+        writer_workers: int = CapturePipeline.WRITER_WORKERS,
+        max_pending_frames: int = CapturePipeline.MAX_PENDING_FRAMES,
+        adaptive_wait: bool = AdaptiveWait.ENABLED,
+        session_recorder: Optional[SessionRecorder] = None,
+        fingerprint_engine: Optional[FingerprintEngine] = None,
+        confirm_end_of_book: bool = Fingerprint.CONFIRM_END_OF_BOOK,
+        duplicate_policy: str = DuplicateDetection.POLICY,
+        sentinel_detection: bool = SentinelDetection.ENABLED,
+        on_page_written: Optional[Callable[[int, str], None]] = None,
+        journal: Optional[CaptureJournal] = None,
+        start_page: int = 1,
+        previous_hashes: Optional[List[Tuple[float, int]]] = None,
+        storage_manager: Optional[StorageBudgetManager] = None,
+        keep_color: bool = False,
+        content_crop: bool = ContentCrop.ENABLED
     ) -> List[str]:
-        """Capture screenshots of pages."""
-        image_files = []
-        last_hashes = []
-        consecutive_matches = 3  # Default end detection sensitivity
+        """
+        Capture screenshots of pages.
+
+        The capture thread only grabs, hashes and turns pages. Frame encoding and
+        storing run on a FrameWriterPool; pages are put into frame_store and the
+        returned page names are ordered by page number. Worker failures are
+        re-raised as CaptureWriteError.
+
+        With adaptive_wait, the page turn is followed by a PageTurnWaiter that
+        polls the region until the new page has settled; the fixed
+        PAGE_TURN/PAGE_STABILIZATION sleeps are only used when it is disabled.
+        With sentinel_detection, the polling only grabs a few small sentinel
+        patches (SentinelChangeDetector) and the full region once per page.
+        It is not used while recording a session, since replays expect every
+        sample to be a full-region capture.
+
+        on_page_written(page_num, page_name) is called from the writer
+        threads as soon as each page is stored (used to build the PDF while
+        capture is still running). If it or the journal fails, the capture
+        stops with CaptureWriteError; only preview failures are ignored.
+
+        With a journal (which needs a DiskFrameStore), every page is recorded
+        once its file is fully written.
+        A resumed run passes start_page and the hashes of pages
+        1..start_page-1, which seed end-of-book and repeat detection; only
+        the newly captured page names are returned.
+
+        With a storage_manager, every stored page is measured and the free
+        space is re-checked between pages; if the disk is about to fill up,
+        capture stops early and the pages captured so far are returned.
+
+        With keep_color, pages with enough saturated pixels are stored in
+        colour (BGRA) so the "AUTO" codec policy can keep them in colour;
+        all other pages are stored as FrameFile.MODE.
+
+        With content_crop (fresh, unrecorded runs only), the first
+        ContentCrop.CALIBRATION_PAGES pages are held back while a
+        ContentBoundsCalibrator measures where the page content is; the
+        region is then narrowed to it, the held pages are cropped and
+        re-hashed before they are stored, and the journal records the
+        narrowed region for resuming.
+
+        If session_recorder is given, every sampled frame, key press and
+        capture decision is logged for offline replay (see session_replay).
+
+        Page turns are polled with fingerprint_engine.hot_hash. With
+        confirm_end_of_book, an end-of-book candidate is only accepted if the
+        engine's stronger fingerprints also match the previous page, so small
+        changes (e.g. one manga panel) do not end the capture early.
+
+        Every capture is also looked up in a book-wide RepeatedPageMonitor, so
+        pages repeated after Kindle jumps back are reported as they happen.
+        With duplicate_policy DuplicateDetection.SKIP, a repeat confirmed by
+        the stronger fingerprints is dropped and the book is turned on without
+        using up a page number.
+        """
+        engine = fingerprint_engine if fingerprint_engine is not None else FingerprintEngine()
+        end_detector = EndOfBookDetector()
+        repeat_monitor = RepeatedPageMonitor()
+        skip_repeats = duplicate_policy == DuplicateDetection.SKIP
+        use_fingerprints = confirm_end_of_book or skip_repeats
+        for previous_page, previous_hash in enumerate(previous_hashes or [], 1):
+            end_detector.add(previous_hash)
+            repeat_monitor.add(previous_page, previous_hash)
+        page_hashes = {}
+        source = self.frame_source
+        if session_recorder is not None:
+            source = RecordingFrameSource(self.frame_source, session_recorder)
 
         sct_monitor = {
             "left": book_region[0],
@@ -83,82 +187,346 @@ class AutomationCoordinator:
             "height": book_region[3]
         }
 
-        page_num = 1
-        with mss.mss() as sct:
+        calibrator = None
+        if content_crop and start_page == 1 and session_recorder is None:
+            calibrator = ContentBoundsCalibrator()
+        calibration = []  # (frame, hash, page_num or None if skipped) while calibrating
+
+        def save_frame(frame: Frame, page_name: str) -> None:
+            # Runs on a writer thread
+            data = encode_frame(frame, "BGRA" if keep_color and is_color(frame.bgra) else FrameFile.MODE)
+            frame_store.put(page_name, data)
+            if storage_manager is not None:
+                storage_manager.record_intermediate(len(data))
+
+        def on_written(index: int, frame: Frame, page_name: str) -> None:
+            # Failures here (e.g. a full disk while journaling) abort the capture
+            page_hash = page_hashes.pop(index, None)
+            if journal is not None and page_hash is not None:
+                journal.record_page(index, page_hash, frame_store.path(page_name))
+            if on_page_written is not None:
+                on_page_written(index, page_name)
+
+        writer = FrameWriterPool(
+            save_frame,
+            workers=writer_workers,
+            max_pending=max_pending_frames,
+            on_written=on_written,
+            on_preview=self._on_frame_written
+        )
+
+        def make_waiter():
+            """(SentinelChangeDetector or None, waiter) for the current sct_monitor"""
+            if sentinel_detection and session_recorder is None:
+                detector = SentinelChangeDetector(
+                    source.grab, sct_monitor,
+                    hash_func=engine.hot_hash,
+                    stop_event=self.stop_event
+                )
+                return detector, detector
+            return None, PageTurnWaiter(
+                lambda: source.grab(sct_monitor),
+                hash_func=engine.hot_hash,
+                stop_event=self.stop_event
+            )
+
+        def finish_calibration() -> None:
+            """Narrow the region to the measured content and store the held pages"""
+            nonlocal calibrator, end_detector, repeat_monitor, previous_fingerprint, current_hash
+            nonlocal sentinel, waiter
+            bounds = calibrator.bounds()
+            calibrator = None
+            if bounds is not None:
+                x, y, width, height = bounds
+                saving = 1.0 - (width * height) / (sct_monitor["width"] * sct_monitor["height"])
+                sct_monitor.update(left=sct_monitor["left"] + x, top=sct_monitor["top"] + y,
+                                   width=width, height=height)
+                self.status_callback(
+                    f"Content bounds found: capturing {width}x{height} at "
+                    f"({sct_monitor['left']}, {sct_monitor['top']}) ({saving:.0%} fewer pixels)."
+                )
+                if journal is not None:
+                    journal.update_settings(book_region=[
+                        sct_monitor["left"], sct_monitor["top"], width, height
+                    ])
+
+                # Crop the held pages and rebuild the detectors so every hash covers the same area
+                end_detector = EndOfBookDetector()
+                repeat_monitor = RepeatedPageMonitor()
+                page_fingerprints.clear()
+                for i, (held_frame, _, held_page) in enumerate(calibration):
+                    held_frame = held_frame.crop(x, y, width, height)
+                    held_hash = engine.hot_hash(held_frame)
+                    calibration[i] = (held_frame, held_hash, held_page)
+                    end_detector.add(held_hash)
+                    if held_page is not None:
+                        repeat_monitor.add(held_page, held_hash)
+                        if use_fingerprints:
+                            page_fingerprints[held_page] = engine.fingerprint(held_frame)
+                last_frame, current_hash, _ = calibration[-1]
+                previous_fingerprint = engine.fingerprint(last_frame) if use_fingerprints else None
+                sentinel, waiter = make_waiter()
+                if sentinel is not None:
+                    sentinel.calibrate(last_frame)
+                    self.status_callback(f"Sentinel patches: {sentinel.sentinels}")
+
+            for held_frame, held_hash, held_page in calibration:
+                if held_page is not None:
+                    page_hashes[held_page] = held_hash
+                    writer.submit(held_page, held_frame, page_file_name(held_page))
+            calibration.clear()
+
+        page_num = start_page
+        try:
+            sentinel, waiter = make_waiter()
+            frame = None
+            current_hash = None
+            previous_fingerprint = None
+            page_fingerprints = {}
+            consecutive_skips = 0
+
             while page_num <= pages:
                 if self.stop_event.is_set():
                     self.status_callback("Automation stopped by user.")
+                    if session_recorder is not None:
+                        session_recorder.mark_end("stopped")
+                    break
+
+                if storage_manager is not None and not storage_manager.check():
+                    self.status_callback(
+                        f"Disk almost full ({storage_manager.describe()}). "
+                        f"Stopping capture and finishing the PDF with the pages captured so far."
+                    )
+                    if session_recorder is not None:
+                        session_recorder.mark_end("disk_full")
                     break
 
                 # Update current page
                 self.current_page = page_num
                 self.progress_callback(page_num, pages)
 
-                # Wait before capturing
-                if page_num > 1:
-                    time.sleep(Delays.PAGE_STABILIZATION)
-
                 self.status_callback(f"Capturing page {page_num}/{pages}...")
-                sct_img = sct.grab(sct_monitor)
-
-                current_hash = ImageHasher.hash_image(sct_img)
+                if frame is None:
+                    # Wait before capturing (fixed-delay mode)
+                    if page_num > start_page:
+                        time.sleep(Delays.PAGE_STABILIZATION)
+                    frame = source.grab(sct_monitor)
+                    current_hash = engine.hot_hash(frame)
+                    if sentinel is not None and not sentinel.sentinels:
+                        sentinel.calibrate(frame)
+                        self.status_callback(f"Sentinel patches: {sentinel.sentinels}")
+
+                page_fingerprint = engine.fingerprint(frame) if use_fingerprints else None
 
                 # Check for end of book (consecutive identical pages)
-                if len(last_hashes) >= consecutive_matches:
-                    # Check if last N pages are very similar (diff < threshold)
-                    recent_hashes = last_hashes[-consecutive_matches:]
-                    all_similar = all(
-                        ImageHasher.compare_hashes(current_hash, prev_hash) < PageDetection.HASH_DIFF_THRESHOLD
-                        for prev_hash in recent_hashes
-                    )
-                    if all_similar:
-                        self.status_callback(f"End of book detected ({consecutive_matches} identical pages).")
+                if end_detector.is_end(current_hash):
+                    if (confirm_end_of_book and page_fingerprint is not None and previous_fingerprint is not None and
+                            not engine.same_page(previous_fingerprint, page_fingerprint)):
+                        distances = engine.distances(previous_fingerprint, page_fingerprint)
+                        self.status_callback(
+                            f"End-of-book candidate rejected, fingerprints differ: {distances}"
+                        )
+                    else:
+                        self.status_callback(
+                            f"End of book detected ({end_detector.consecutive_matches} identical pages)."
+                        )
+                        if session_recorder is not None:
+                            session_recorder.mark_end("end_detected")
                         break
 
-                last_hashes.append(current_hash)
-
-                image_path = os.path.join(screenshots_folder, f"page_{page_num:04d}.png")
-                img = Image.frombytes("RGB", sct_img.size, sct_img.rgb)
-                img.save(image_path)
-                image_files.append(image_path)
-
-                self.preview_callback(image_path)
+                # Check for repeats of any earlier page (Kindle jumping back)
+                skip = False
+                repeat = repeat_monitor.check(page_num, current_hash)
+                if repeat is not None:
+                    self.status_callback(RepeatedPageMonitor.describe(repeat))
+                    original_fingerprint = page_fingerprints.get(repeat.original)
+                    if (skip_repeats and consecutive_skips < DuplicateDetection.MAX_CONSECUTIVE_SKIPS and
+                            original_fingerprint is not None and
+                            engine.same_page(original_fingerprint, page_fingerprint)):
+                        skip = True
+
+                end_detector.add(current_hash)
+                previous_fingerprint = page_fingerprint
+                if calibrator is not None:
+                    calibration.append((frame, current_hash, None if skip else page_num))
+
+                if skip:
+                    consecutive_skips += 1
+                    self.status_callback(f"Skipping repeated page (same as page {repeat.original}).")
+                else:
+                    consecutive_skips = 0
+                    repeat_monitor.add(page_num, current_hash)
+                    if page_fingerprint is not None:
+                        page_fingerprints[page_num] = page_fingerprint
+
+                    if calibrator is not None:
+                        # Held back until the content bounds are known
+                        calibrator.add(frame)
+                    else:
+                        page_hashes[page_num] = current_hash
+                        writer.submit(page_num, frame, page_file_name(page_num))
+                    if session_recorder is not None:
+                        session_recorder.mark_capture(page_num, current_hash)
+
+                    if page_num == pages:
+                        self.status_callback(f"Reached user-defined page limit of {pages}.")
+                        if session_recorder is not None:
+                            session_recorder.mark_end("page_limit")
+                        break
 
-                if page_num == pages:
-                    self.status_callback(f"Reached user-defined page limit of {pages}.")
-                    break
+                if calibrator is not None and calibrator.ready:
+                    finish_calibration()
 
                 # Turn page
                 self.status_callback(f"Turning page with {page_turn_direction} arrow key...")
-                pyautogui.keyDown(page_turn_direction)
-                time.sleep(Delays.KEY_PRESS)
-                pyautogui.keyUp(page_turn_direction)
-
-                time.sleep(Delays.PAGE_TURN)
-                page_num += 1
-        return image_files
-
-    def _check_disk_space(self, output_folder: str, estimated_pages: int) -> bool:
-        """Check if sufficient disk space is available."""
-        estimated_total_bytes_needed = (
-            estimated_pages *
-            Storage.ESTIMATED_BYTES_PER_PAGE *
-            Storage.PDF_OVERHEAD_FACTOR
+                source.press_key(page_turn_direction)
+
+                if adaptive_wait:
+                    # The settled frame returned by the waiter is the next page's capture
+                    frame, current_hash, changed = waiter.wait(current_hash)
+                    if not changed:
+                        self.status_callback(
+                            f"No page change detected within {waiter.timeout:.1f}s."
+                        )
+                else:
+                    time.sleep(Delays.PAGE_TURN)
+                    frame = None
+                if not skip:
+                    page_num += 1
+
+            if calibrator is not None:
+                # Capture ended during calibration
+                finish_calibration()
+        except Exception:
+            # Drain the writers before propagating so no thread keeps a frame
+            writer.close(raise_error=False)
+            raise
+
+        return writer.close()
+
+    def _on_frame_written(self, index: int, frame: Frame, page_name: str) -> None:
+        """Show the written page in the preview, downscaled from the in-memory frame"""
+        self.preview_callback(frame.thumbnail(GUI.PREVIEW_WIDTH, GUI.PREVIEW_HEIGHT))
+
+    def _choose_frame_storage(self, mode: str, pages: int, book_region: Tuple[int, int, int, int],
+                              memory_budget: int) -> str:
+        """
+        Resolve the FrameStorage.MODE setting for a new run
+
+        Args:
+            mode: "memory", "disk" or "auto"
+            pages: Maximum number of pages to capture
+            book_region: (left, top, width, height) of the capture region
+            memory_budget: MemoryFrameStore budget in bytes
+
+        Returns:
+            "memory" or "disk"
+        """
+        if mode != "auto":
+            return mode
+        estimated_bytes = pages * book_region[2] * book_region[3] * FrameStorage.ESTIMATED_BYTES_PER_PIXEL
+        return "memory" if estimated_bytes <= memory_budget else "disk"
+
+    def _create_storage_manager(
+        self,
+        output_folder: str,
+        pages: int,
+        book_region: Tuple[int, int, int, int],
+        frame_store: FrameStore,
+        pdf_build: IncrementalPdfBuild,
+        pages_done: int
+    ) -> StorageBudgetManager:
+        """
+        Storage budget for a run, with its fallback steps in the order they are applied:
+        skip linearization and the page cache, delete captured pages once they are in
+        the PDF, then switch PNG pages to JPEG or lower the JPEG quality of "AUTO" pages.
+        """
+        keeps_intermediates = isinstance(frame_store, DiskFrameStore)
+        cache = pdf_build.cache
+        cache_bytes = 0
+        if cache is not None and os.stat(cache.cache_dir).st_dev == os.stat(output_folder).st_dev:
+            cache_bytes = max(0, cache.max_bytes - cache.total_bytes)
+        storage_manager = StorageBudgetManager(
+            output_folder, pages, book_region[2] * book_region[3],
+            keeps_intermediates=keeps_intermediates,
+            linearizes=pdf_build.linearize,
+            cache_bytes=cache_bytes,
+            pages_done=pages_done,
+            output_probe=lambda: (pdf_build.pages_written, pdf_build.bytes_written),
+            status_callback=self.status_callback
         )
 
-        os.makedirs(output_folder, exist_ok=True)
+        if pdf_build.linearize or cache_bytes:
+            def drop_extras() -> None:
+                pdf_build.linearize = False
+                pdf_build.cache = None
+                storage_manager.linearizes = False
+                storage_manager.cache_bytes = 0
+
+            storage_manager.add_degradation(
+                "writing a plain (non-linearized) PDF without the page cache",
+                drop_extras
+            )
+
+        if keeps_intermediates:
+            def drop_intermediates() -> None:
+                frame_store.drop_released()
+                storage_manager.keeps_intermediates = False
+
+            storage_manager.add_degradation(
+                "deleting captured pages once they are in the PDF (this run can no longer be resumed)",
+                drop_intermediates
+            )
+
+        if pdf_build.image_format.upper() == "PNG":
+            def use_jpeg() -> None:
+                pdf_build.jpeg_quality = Storage.DEGRADED_JPEG_QUALITY
+                pdf_build.image_format = "JPEG"
+
+            storage_manager.add_degradation(
+                f"switching the remaining pages to JPEG (quality {Storage.DEGRADED_JPEG_QUALITY})",
+                use_jpeg
+            )
+        elif pdf_build.image_format.upper() == "AUTO":
+            # Text pages are already G4; only the grayscale and colour JPEG pages shrink
+            def lower_auto_quality() -> None:
+                pdf_build.policy = {
+                    label: dict(codec, quality=Storage.DEGRADED_AUTO_JPEG_QUALITY) if "quality" in codec else codec
+                    for label, codec in PageClassification.POLICY.items()
+                }
+
+            storage_manager.add_degradation(
+                f"lowering the JPEG quality of the remaining pages to {Storage.DEGRADED_AUTO_JPEG_QUALITY}",
+                lower_auto_quality
+            )
+        return storage_manager
+
+    def _check_disk_space(self, storage_manager: StorageBudgetManager) -> bool:
+        """
+        Check if sufficient disk space is available.
+
+        A projection larger than the free space is not fatal: the storage
+        manager degrades the run once measurements confirm it. Only a disk
+        already below the reserve aborts.
+        """
+        os.makedirs(storage_manager.folder, exist_ok=True)
 
         try:
-            total, used, free = shutil.disk_usage(output_folder)
-            self.status_callback(f"Disk space check: Free space {free / (1024**3):.2f} GB, Estimated needed: {estimated_total_bytes_needed / (1024**3):.2f} GB")
+            free = storage_manager.free_bytes(force=True)
+            self.status_callback(f"Disk space check: {storage_manager.describe()}")
 
-            if free < estimated_total_bytes_needed:
+            if free < storage_manager.reserve_bytes:
                 self.error_callback(
-                    f"Insufficient disk space in '{output_folder}'.\n"
-                    f"Needed {estimated_total_bytes_needed / (1024**3):.2f} GB, "
+                    f"Insufficient disk space in '{storage_manager.folder}'.\n"
+                    f"At least {storage_manager.reserve_bytes / (1024**3):.2f} GB must stay free, "
                     f"Available {free / (1024**3):.2f} GB."
                 )
                 return False
+            if storage_manager.projected_need() > storage_manager.available_bytes():
+                self.status_callback(
+                    "Warning: The estimate exceeds the free space; "
+                    "output will be reduced automatically if the measured pages confirm it."
+                )
             return True
         except Exception as e:
             self.error_callback(f"Could not check disk space: {e}")
@@ -231,6 +599,101 @@ class AutomationCoordinator:
             self.status_callback(f"Traceback: {traceback.format_exc()}")
             return None
 
+    def _find_resume_journal(self, output_folder: str, output_filename: str,
+                             resume_from: Optional[str] = None) -> Tuple[Optional[CaptureJournal], List[dict]]:
+        """
+        Look for an interrupted run of the same PDF and ask whether to resume it
+
+        Args:
+            output_folder: Output directory
+            output_filename: Output PDF filename
+            resume_from: Screenshots folder to resume (skips the search)
+
+        Returns:
+            Tuple of (journal, valid page entries), or (None, []) for a fresh run
+        """
+        folder = resume_from or CaptureJournal.find_resumable(output_folder, output_filename)
+        if not folder:
+            return None, []
+
+        try:
+            journal = CaptureJournal.open(folder)
+            valid_pages = journal.valid_pages()
+        except Exception as e:
+            self.status_callback(f"Warning: Could not read capture journal in '{folder}': {e}")
+            return None, []
+        if not valid_pages:
+            journal.close()
+            return None, []
+
+        resume = resume_from is not None or messagebox.askyesno(
+            "再開確認",
+            f"前回中断したキャプチャが見つかりました（{len(valid_pages)}ページ取得済み）。\n\n"
+            f"{len(valid_pages) + 1}ページ目から再開しますか？\n"
+            "「いいえ」を押すと前回のデータを削除して最初からキャプチャします。"
+        )
+        if not resume:
+            journal.close()
+            try:
+                cleanup_dir(folder)
+            except Exception as e:
+                self.status_callback(f"Warning: Could not remove previous capture: {e}")
+            return None, []
+
+        self.status_callback(f"Found interrupted capture with {len(valid_pages)} pages in '{folder}'.")
+        return journal, valid_pages
+
+    def _position_for_resume(self, valid_pages: List[dict], book_region: Tuple[int, int, int, int],
+                             direction_key: str, previous_hashes: List[Tuple[float, int]],
+                             fingerprint_engine: FingerprintEngine) -> Optional[int]:
+        """
+        Find which journaled page Kindle shows and turn to the first page not yet captured
+
+        Args:
+            valid_pages: Journal entries of the captured pages
+            book_region: Capture region of the interrupted run
+            direction_key: Page turn key of the interrupted run
+            previous_hashes: Hashes of the captured pages (page 1 first)
+            fingerprint_engine: Engine whose hot_hash produced previous_hashes
+
+        Returns:
+            Page number to continue capturing at, or None if the shown page
+            does not match any captured page
+        """
+        region = {
+            "left": book_region[0],
+            "top": book_region[1],
+            "width": book_region[2],
+            "height": book_region[3]
+        }
+        index = PageHashIndex()
+        for page_num, page_hash in enumerate(previous_hashes, 1):
+            index.add(page_num, page_hash)
+
+        current_hash = fingerprint_engine.hot_hash(self.frame_source.grab(region))
+        matches = index.query(current_hash)
+        if not matches:
+            self.error_callback(
+                "The page shown in Kindle does not match any captured page. "
+                f"Show page {len(valid_pages)} and start again to resume."
+            )
+            return None
+
+        # The last match is the latest page it could be (blank pages repeat)
+        shown_page = max(page_id for page_id, _ in matches)
+        last_page = len(valid_pages)
+        turns = last_page - shown_page + 1
+        self.status_callback(f"Kindle shows captured page {shown_page}; turning {turns} page(s) to resume.")
+
+        waiter = PageTurnWaiter(lambda: self.frame_source.grab(region),
+                                hash_func=fingerprint_engine.hot_hash, stop_event=self.stop_event)
+        for _ in range(turns):
+            if self.stop_event.is_set():
+                return None
+            self.frame_source.press_key(direction_key)
+            _, current_hash, _ = waiter.wait(current_hash)
+        return last_page + 1
+
     def run(self, pages: int, output_folder: str = None,
             output_filename: str = None, **kwargs):
         """
@@ -256,17 +719,37 @@ class AutomationCoordinator:
 
         kindle_win = None
         screenshots_folder = None
-
-        # Prompt user to prepare Kindle
-        while True:
-            user_response = messagebox.askokcancel(
-                "準備確認",
+        frame_store = None
+        session_recorder = None
+        pdf_build = None
+        journal = None
+        storage_manager = None
+        capture_complete = False
+
+        # Offer to resume an interrupted run for the same PDF
+        resume_journal, resume_pages = self._find_resume_journal(
+            output_folder, output_filename, kwargs.get("resume_from")
+        )
+        if resume_journal is not None:
+            prepare_message = (
+                f"前回のキャプチャを{len(resume_pages)}ページ目から再開します。\n\n"
+                f"Kindleアプリで{len(resume_pages)}ページ目（最後にキャプチャしたページ）を表示してください。\n\n"
+                "準備ができたら「OK」を押してください。"
+            )
+        else:
+            prepare_message = (
                 "Kindleアプリを立ち上げて、対象書籍のスタートページに移動してください。\n\n"
                 "準備ができたら「OK」を押してください。"
             )
 
+        # Prompt user to prepare Kindle
+        while True:
+            user_response = messagebox.askokcancel("準備確認", prepare_message)
+
             if not user_response:
                 self.status_callback("User cancelled the automation.")
+                if resume_journal is not None:
+                    resume_journal.close()
                 self.completion_callback()
                 return
 
@@ -287,6 +770,8 @@ class AutomationCoordinator:
 
                 if not retry:
                     self.status_callback("User cancelled the automation after Kindle check failed.")
+                    if resume_journal is not None:
+                        resume_journal.close()
                     self.completion_callback()
                     return
                 continue
@@ -298,13 +783,6 @@ class AutomationCoordinator:
         self._prevent_sleep()
 
         try:
-            # Check disk space
-            self.status_callback(f"Checking disk space in '{output_folder}'...")
-            if not self._check_disk_space(output_folder, pages):
-                self.error_callback("Disk space check failed. Aborting automation.")
-                return
-            self.status_callback("Disk space check passed.")
-
             # Activate Kindle window
             self.status_callback("Activating Kindle window...")
             kindle_win, monitor = self.kindle_controller.find_and_activate_kindle()
@@ -329,24 +807,39 @@ class AutomationCoordinator:
             except Exception as e:
                 self.status_callback(f"Warning: Could not bring Kindle to front: {e}")
 
-            # Manual region selection
-            self.status_callback("Starting manual region selection...")
-            book_region = self._select_region_manual(kindle_win, monitor)
+            start_page = 1
+            previous_hashes = []
+            memory_budget = kwargs.get("frame_memory_budget", FrameStorage.MEMORY_BUDGET)
+            if resume_journal is not None:
+                # Reuse the region and direction of the interrupted run
+                journal = resume_journal
+                resume_journal = None
+                screenshots_folder = journal.folder
+                book_region = tuple(journal.settings["book_region"])
+                direction_key = journal.settings["direction"]
+                self.status_callback(
+                    f"Resuming capture in '{screenshots_folder}' "
+                    f"({len(resume_pages)} valid pages, direction {direction_key})."
+                )
+            else:
+                # Manual region selection
+                self.status_callback("Starting manual region selection...")
+                book_region = self._select_region_manual(kindle_win, monitor)
 
-            if not book_region:
-                self.error_callback("Region selection failed. Aborting automation.")
-                return
+                if not book_region:
+                    self.error_callback("Region selection failed. Aborting automation.")
+                    return
 
-            self.status_callback(f"Capture region: {book_region[2]}x{book_region[3]} at ({book_region[0]}, {book_region[1]})")
+                self.status_callback(f"Capture region: {book_region[2]}x{book_region[3]} at ({book_region[0]}, {book_region[1]})")
 
-            # Determine page turn direction automatically
-            self.status_callback("Determining page turn direction automatically...")
-            direction_key = self.kindle_controller.determine_page_turn_direction(kindle_win)
+                # Determine page turn direction automatically
+                self.status_callback("Determining page turn direction automatically...")
+                direction_key = self.kindle_controller.determine_page_turn_direction(kindle_win)
 
-            if not direction_key:
-                self.error_callback("Could not determine page turn direction. Aborting automation.")
-                return
-            self.status_callback(f"Page turn direction determined: {direction_key}")
+                if not direction_key:
+                    self.error_callback("Could not determine page turn direction. Aborting automation.")
+                    return
+                self.status_callback(f"Page turn direction determined: {direction_key}")
 
             # Start screenshot capture
             self.status_callback("Starting screenshot process...")
@@ -356,9 +849,92 @@ class AutomationCoordinator:
                 self.status_callback("Automation stopped before screenshots began.")
                 return
 
-            screenshots_folder = create_temp_dir(output_folder, prefix="temp_screenshots_")
+            # The journal records hot hashes, so resuming must use the same engine
+            fingerprint_engine = FingerprintEngine(
+                algorithms=kwargs.get("fingerprint_algorithms", Fingerprint.CONFIRM_ALGORITHMS),
+                combiner=kwargs.get("fingerprint_combiner", Fingerprint.COMBINER),
+                thresholds=kwargs.get("fingerprint_thresholds"),
+                hot_algorithm=kwargs.get("fingerprint_hot_algorithm", Fingerprint.HOT_ALGORITHM)
+            )
+            if journal is not None:
+                previous_hashes = [tuple(entry["hash"]) for entry in resume_pages]
+                start_page = self._position_for_resume(
+                    resume_pages, book_region, direction_key, previous_hashes, fingerprint_engine
+                )
+                if start_page is None:
+                    return
+                frame_store = DiskFrameStore(screenshots_folder)
+            elif self._choose_frame_storage(
+                    kwargs.get("frame_store", FrameStorage.MODE), pages, book_region, memory_budget) == "memory":
+                frame_store = MemoryFrameStore(memory_budget)
+                self.status_callback(
+                    f"Keeping captured pages in memory (up to {frame_store.memory_budget / (1024 ** 2):.0f} MB); "
+                    f"an interrupted run cannot be resumed."
+                )
+            else:
+                screenshots_folder = create_temp_dir(output_folder, prefix="temp_screenshots_")
+                frame_store = DiskFrameStore(screenshots_folder)
+                journal = CaptureJournal.create(screenshots_folder, {
+                    "pages": pages,
+                    "book_region": list(book_region),
+                    "direction": direction_key,
+                    "output_folder": output_folder,
+                    "output_filename": output_filename,
+                })
+
+            record_dir = kwargs.get("record_session")
+            if record_dir:
+                self.status_callback(f"Recording capture session to '{record_dir}'...")
+                session_recorder = SessionRecorder(record_dir, metadata={
+                    "pages": pages,
+                    "direction": direction_key,
+                    "book_region": list(book_region),
+                    "hash_diff_threshold": PageDetection.HASH_DIFF_THRESHOLD,
+                    "hot_algorithm": fingerprint_engine.hot_algorithm,
+                    "adaptive_wait": kwargs.get("adaptive_wait", AdaptiveWait.ENABLED),
+                }, hash_func=fingerprint_engine.hot_hash)
+
+            # The PDF is built while pages are captured; finish() only appends the tail
+            pdf_build = self.pdf_converter.start_incremental_pdf(
+                output_folder, output_filename,
+                optimize_images=True,  # Always optimize
+                image_format=kwargs.get("image_format", DefaultConfig.IMAGE_FORMAT),
+                jpeg_quality=kwargs.get("jpeg_quality", DefaultConfig.JPEG_QUALITY),
+                frame_store=frame_store
+            )
+            for entry in resume_pages[:start_page - 1]:
+                pdf_build.add(entry["page"], entry["file"])
 
-            image_files = self._take_screenshots(pages, screenshots_folder, direction_key, book_region)
+            # Check disk space against the projection for this region and store
+            storage_manager = self._create_storage_manager(
+                output_folder, pages, book_region, frame_store, pdf_build, start_page - 1
+            )
+            self.status_callback(f"Checking disk space in '{output_folder}'...")
+            if not self._check_disk_space(storage_manager):
+                self.error_callback("Disk space check failed. Aborting automation.")
+                return
+            self.status_callback("Disk space check passed.")
+
+            new_files = self._take_screenshots(
+                pages, frame_store, direction_key, book_region,
+                writer_workers=kwargs.get("writer_workers", CapturePipeline.WRITER_WORKERS),
+                max_pending_frames=kwargs.get("max_pending_frames", CapturePipeline.MAX_PENDING_FRAMES),
+                adaptive_wait=kwargs.get("adaptive_wait", AdaptiveWait.ENABLED),
+                session_recorder=session_recorder,
+                fingerprint_engine=fingerprint_engine,
+                confirm_end_of_book=kwargs.get("confirm_end_of_book", Fingerprint.CONFIRM_END_OF_BOOK),
+                duplicate_policy=kwargs.get("duplicate_policy", DuplicateDetection.POLICY),
+                sentinel_detection=kwargs.get("sentinel_detection", SentinelDetection.ENABLED),
+                on_page_written=pdf_build.add,
+                journal=journal,
+                start_page=start_page,
+                previous_hashes=previous_hashes,
+                storage_manager=storage_manager,
+                # Colour pages only survive optimization with the per-page policy
+                keep_color=pdf_build.image_format.upper() == "AUTO",
+                content_crop=kwargs.get("content_crop", ContentCrop.ENABLED)
+            )
+            image_files = [entry["file"] for entry in resume_pages[:start_page - 1]] + new_files
 
             if self.stop_event.is_set():
                 self.status_callback("Automation stopped during screenshot capture.")
@@ -368,14 +944,19 @@ class AutomationCoordinator:
                 return
             self.status_callback(f"{len(image_files)} images captured.")
 
-            # Create PDF
-            self.status_callback("Creating PDF from captured images...")
-            pdf_path = self.pdf_converter.create_pdf_from_images(
-                image_files, output_folder, output_filename,
-                optimize_images=True,  # Always optimize
-                image_format="PNG",    # Always PNG
-                jpeg_quality=90
+            # Finish PDF
+            self.status_callback(
+                f"Finishing PDF ({pdf_build.pages_written}/{len(image_files)} pages already written)..."
             )
+            pdf_path = pdf_build.finish(len(image_files))
+            pdf_build = None
+            capture_complete = True
+            if isinstance(frame_store, MemoryFrameStore):
+                stats = frame_store.stats()
+                self.status_callback(
+                    f"Frame store: peak {stats['peak_memory_bytes'] / (1024 ** 2):.1f} MB in memory, "
+                    f"{stats['total_spilled']} pages spilled to disk."
+                )
             self.success_callback(pdf_path)
             self.status_callback("Automation finished successfully.")
 
@@ -397,10 +978,37 @@ class AutomationCoordinator:
                 except Exception as e:
                     self.status_callback(f"Warning: Could not restore main window: {e}")
 
-            try:
-                cleanup_dir(screenshots_folder)
-            except Exception as e:
-                self.status_callback(f"Warning: Could not cleanup temporary files: {e}")
+            if session_recorder is not None:
+                session_recorder.close()
+
+            if pdf_build is not None:
+                # Stopped or failed before the PDF was finished
+                try:
+                    pdf_build.abort()
+                except Exception as e:
+                    self.status_callback(f"Warning: Could not discard partial PDF: {e}")
+
+            if resume_journal is not None:
+                resume_journal.close()
+            if journal is not None:
+                journal.close()
+            if frame_store is not None:
+                frame_store.close()
+
+            # The storage fallback may have deleted pages that are already in the (discarded) PDF
+            resumable = (not capture_complete and journal is not None and journal.page_count > 0 and
+                         (storage_manager is None or storage_manager.keeps_intermediates))
+            if not resumable:
+                try:
+                    cleanup_dir(screenshots_folder)
+                except Exception as e:
+                    self.status_callback(f"Warning: Could not cleanup temporary files: {e}")
+            else:
+                # Keep the frames so the next run can resume instead of recapturing
+                self.status_callback(
+                    f"Captured pages kept in '{screenshots_folder}' ({journal.page_count} pages). "
+                    f"Start again with the same output file to resume."
+                )
 
             self.is_running = False
             self.completion_callback()
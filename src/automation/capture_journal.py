@@ -0,0 +1,190 @@
+"""
+Crash-safe capture journal.
+Records every page written to the screenshots folder so an interrupted run
+can be resumed from the last captured page instead of starting over.
+
+Journal layout (inside the screenshots folder):
+    journal_header.json   run settings, written with write-rename
+    journal.jsonl         one JSON line per page, appended and fsynced
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.constants import Journal
+from src.frame_file import verify_page_file
+from src.utils import atomic_write_json
+
+
+class CaptureJournal:
+    """
+    Append-only record of the pages of one capture run.
+
+    A page is only journaled after its image file has been fully written
+    (page images are written to a temporary name and renamed), and every
+    line is flushed and fsynced, so after a crash the journal never refers
+    to a page that is not on disk. A torn last line is ignored on load.
+    """
+
+    def __init__(self, folder: str, header: Dict[str, Any], entries: Dict[int, Dict[str, Any]]):
+        """
+        Use create() or open() instead of calling this directly.
+
+        Args:
+            folder: Screenshots folder holding the journal and page images
+            header: Run settings
+            entries: Journaled pages by page number
+        """
+        self.folder = folder
+        self.header = header
+        self.entries = entries
+        self._lock = threading.Lock()
+        self._file = open(os.path.join(folder, Journal.FILENAME), "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, folder: str, settings: Dict[str, Any]) -> "CaptureJournal":
+        """
+        Start a new journal
+
+        Args:
+            folder: Screenshots folder of the run
+            settings: Run settings needed to resume (region, direction, output, ...)
+        """
+        header = {
+            "version": Journal.FORMAT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": settings,
+        }
+        atomic_write_json(os.path.join(folder, Journal.HEADER_FILENAME), header)
+        open(os.path.join(folder, Journal.FILENAME), "w", encoding="utf-8").close()
+        return cls(folder, header, {})
+
+    @classmethod
+    def open(cls, folder: str) -> "CaptureJournal":
+        """
+        Load an existing journal for resuming
+
+        Raises:
+            ValueError: If the folder has no readable journal of a supported version
+        """
+        header_path = os.path.join(folder, Journal.HEADER_FILENAME)
+        try:
+            with open(header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"No readable capture journal in {folder}: {e}")
+        if header.get("version") != Journal.FORMAT_VERSION:
+            raise ValueError(f"Unsupported journal version in {folder}: {header.get('version')}")
+
+        entries = {}
+        journal_path = os.path.join(folder, Journal.FILENAME)
+        if os.path.exists(journal_path):
+            with open(journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash; the page will be recaptured
+                        continue
+                    entries[entry["page"]] = entry
+        return cls(folder, header, entries)
+
+    @staticmethod
+    def find_resumable(output_folder: str, output_filename: str) -> Optional[str]:
+        """
+        Find the newest interrupted run for the same output PDF
+
+        Args:
+            output_folder: Output directory the screenshots folders live in
+            output_filename: PDF filename of the new run
+
+        Returns:
+            Screenshots folder path, or None
+        """
+        pattern = os.path.join(output_folder, "temp_screenshots_*", Journal.HEADER_FILENAME)
+        candidates = []
+        for header_path in glob.glob(pattern):
+            try:
+                with open(header_path, "r", encoding="utf-8") as f:
+                    header = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if header.get("settings", {}).get("output_filename") == output_filename:
+                candidates.append((os.path.getmtime(header_path), os.path.dirname(header_path)))
+        return max(candidates)[1] if candidates else None
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.header.get("settings", {})
+
+    def update_settings(self, **changes: Any) -> None:
+        """Change run settings in the header (e.g. the narrowed capture region)"""
+        with self._lock:
+            self.header["settings"] = dict(self.settings, **changes)
+            atomic_write_json(os.path.join(self.folder, Journal.HEADER_FILENAME), self.header)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.entries)
+
+    def record_page(self, page_num: int, page_hash: Tuple[float, int], image_path: str) -> None:
+        """
+        Append a written page (thread-safe; called from the frame writer threads)
+
+        Args:
+            page_num: Page number
+            page_hash: (mean_value, dhash) of the page
+            image_path: Fully written image file
+        """
+        entry = {
+            "page": page_num,
+            "hash": [page_hash[0], page_hash[1]],
+            "file": os.path.basename(image_path),
+            "size": os.path.getsize(image_path),
+            "t": time.time(),
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            if Journal.FSYNC:
+                os.fsync(self._file.fileno())
+            self.entries[page_num] = entry
+
+    def image_path(self, entry: Dict[str, Any]) -> str:
+        return os.path.join(self.folder, entry["file"])
+
+    def valid_pages(self) -> List[Dict[str, Any]]:
+        """
+        Journaled pages 1..N whose image files are intact
+
+        Stops at the first missing, resized or unreadable page, since the
+        PDF needs a gap-free sequence; later pages will be recaptured.
+
+        Returns:
+            Entries in page order
+        """
+        valid = []
+        page_num = 1
+        while page_num in self.entries:
+            entry = self.entries[page_num]
+            path = self.image_path(entry)
+            try:
+                if os.path.getsize(path) != entry["size"]:
+                    break
+                verify_page_file(path)
+            except Exception:
+                break
+            valid.append(entry)
+            page_num += 1
+        return valid
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._file.close()
+            except Exception:
+                pass
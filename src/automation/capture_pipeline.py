@@ -0,0 +1,166 @@
+"""
+Capture pipeline module.
+Moves image encoding and disk writes off the page-turn thread.
+
+The capture thread only grabs and hashes frames, then hands them to a bounded
+queue that is drained by a pool of writer threads. Results are collected by
+page index so the output order is deterministic regardless of which worker
+finishes first.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from src.constants import CapturePipeline
+
+
+class CaptureWriteError(Exception):
+    """Raised when a writer worker fails to encode, save or record a frame"""
+    pass
+
+
+class FrameWriterPool:
+    """
+    Bounded producer/consumer pool that encodes and writes captured frames.
+
+    The producer calls submit() for every captured frame. When max_pending
+    frames are already waiting, submit() blocks until a worker frees a slot,
+    which keeps memory bounded if the disk is slower than the page turns.
+    """
+
+    _SENTINEL = object()
+
+    def __init__(
+        self,
+        write_func: Callable[[Any, str], None],
+        workers: int = CapturePipeline.WRITER_WORKERS,
+        max_pending: int = CapturePipeline.MAX_PENDING_FRAMES,
+        on_written: Optional[Callable[[int, Any, str], None]] = None,
+        on_preview: Optional[Callable[[int, Any, str], None]] = None
+    ):
+        """
+        Initialize and start the writer pool
+
+        Args:
+            write_func: Function called as write_func(frame, path) on a worker thread
+            workers: Number of writer threads
+            max_pending: Maximum number of frames waiting in the queue (backpressure)
+            on_written: Optional function called as on_written(index, frame, path) after each
+                write; its failures are handled like write failures
+            on_preview: Optional function called as on_preview(index, frame, path) after
+                on_written; its failures are ignored
+        """
+        self.write_func = write_func
+        self.on_written = on_written
+        self.on_preview = on_preview
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._results: Dict[int, str] = {}
+        self._results_lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._error_index: Optional[int] = None
+        self._closed = False
+
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"FrameWriter-{i + 1}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._SENTINEL:
+                    return
+                if self._error is not None:
+                    # Drain remaining items quickly once a failure has been recorded
+                    continue
+
+                index, frame, path = item
+                try:
+                    self.write_func(frame, path)
+                    if self.on_written:
+                        self.on_written(index, frame, path)
+                except Exception as e:
+                    with self._results_lock:
+                        if self._error is None:
+                            self._error = e
+                            self._error_index = index
+                    continue
+
+                with self._results_lock:
+                    self._results[index] = path
+
+                if self.on_preview:
+                    try:
+                        self.on_preview(index, frame, path)
+                    except Exception:
+                        # A failing preview must never abort the capture
+                        pass
+            finally:
+                self._queue.task_done()
+
+    def check_error(self) -> None:
+        """
+        Re-raise the first worker failure on the calling thread.
+
+        Raises:
+            CaptureWriteError: If any worker failed to write a frame
+        """
+        if self._error is not None:
+            raise CaptureWriteError(
+                f"Failed to write frame {self._error_index}: {self._error}"
+            ) from self._error
+
+    def submit(self, index: int, frame: Any, path: str) -> None:
+        """
+        Queue a frame for encoding. Blocks while the queue is full.
+
+        Args:
+            index: Page index used to order the results
+            frame: Captured frame passed to write_func
+            path: Destination file path
+
+        Raises:
+            CaptureWriteError: If a previous write failed
+        """
+        if self._closed:
+            raise RuntimeError("FrameWriterPool is already closed")
+        self.check_error()
+        self._queue.put((index, frame, path))
+
+    @property
+    def pending(self) -> int:
+        """Approximate number of frames waiting to be written"""
+        return self._queue.qsize()
+
+    def close(self, raise_error: bool = True) -> List[str]:
+        """
+        Wait for all queued frames to be written and stop the workers.
+
+        Args:
+            raise_error: Re-raise a worker failure (False when already unwinding)
+
+        Returns:
+            List of written file paths ordered by page index
+
+        Raises:
+            CaptureWriteError: If any worker failed to write a frame
+        """
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(self._SENTINEL)
+            for thread in self._threads:
+                thread.join()
+
+        if raise_error:
+            self.check_error()
+        with self._results_lock:
+            return [self._results[i] for i in sorted(self._results)]
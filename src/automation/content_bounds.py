@@ -0,0 +1,83 @@
+"""
+Content bounds calibration module.
+Finds the part of the capture region that actually changes from page to
+page, so the blank margins and static reader UI around the page are no
+longer grabbed, hashed, encoded and embedded for every page.
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.constants import ContentCrop
+from src.frame import Frame
+
+
+class ContentBoundsCalibrator:
+    """
+    Content bounding box from the first pages of a run.
+
+    Keeps the per-pixel minimum and maximum of the grayscale plane over the
+    pages added. Pixels whose value varies by more than
+    ContentCrop.VARIATION_THRESHOLD are content: text and pictures differ
+    from page to page, while margins and toolbars stay put. Rows and
+    columns with fewer than ContentCrop.MIN_LINE_PIXELS such pixels are
+    treated as noise.
+    """
+
+    def __init__(self, pages: int = ContentCrop.CALIBRATION_PAGES,
+                 padding: int = ContentCrop.PADDING,
+                 min_saving: float = ContentCrop.MIN_SAVING):
+        """
+        Args:
+            pages: Pages to accumulate before the bounds are final
+            padding: Pixels added around the content on every side
+            min_saving: Minimum fraction of the region area the crop must remove
+        """
+        self.pages = pages
+        self.padding = padding
+        self.min_saving = min_saving
+        self.count = 0
+        self._low: Optional[np.ndarray] = None
+        self._high: Optional[np.ndarray] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.pages
+
+    def add(self, frame: Frame) -> None:
+        """Accumulate one captured page"""
+        gray = frame.gray
+        if self._low is None:
+            self._low = gray.copy()
+            self._high = gray.copy()
+        else:
+            cv2.min(self._low, gray, dst=self._low)
+            cv2.max(self._high, gray, dst=self._high)
+        self.count += 1
+
+    def bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Padded content rectangle relative to the region
+
+        Returns:
+            (x, y, width, height), or None if fewer than two pages were added,
+            nothing varied, or the crop would save less than min_saving
+        """
+        if self.count < 2:
+            return None
+        varying = cv2.absdiff(self._high, self._low) > ContentCrop.VARIATION_THRESHOLD
+        rows = np.flatnonzero(np.count_nonzero(varying, axis=1) >= ContentCrop.MIN_LINE_PIXELS)
+        columns = np.flatnonzero(np.count_nonzero(varying, axis=0) >= ContentCrop.MIN_LINE_PIXELS)
+        if rows.size == 0 or columns.size == 0:
+            return None
+
+        height, width = varying.shape
+        top = max(0, int(rows[0]) - self.padding)
+        bottom = min(height, int(rows[-1]) + 1 + self.padding)
+        left = max(0, int(columns[0]) - self.padding)
+        right = min(width, int(columns[-1]) + 1 + self.padding)
+        if (right - left) * (bottom - top) > (1.0 - self.min_saving) * width * height:
+            return None
+        return left, top, right - left, bottom - top
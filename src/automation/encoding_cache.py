@@ -0,0 +1,167 @@
+"""
+Content-addressed cache of optimized page encodings.
+Maps a hash of a captured page file plus the encoding parameters to the
+encoded bytes, so rebuilding a PDF (a resumed run, a re-export under another
+name) only re-encodes pages that were never seen with those settings.
+
+Cache layout (one directory shared by all runs):
+    <key[:2]>/<key>.bin   encoded page bytes; file mtime is the LRU stamp
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.constants import EncodingCache
+
+
+class EncodedPageCache:
+    """
+    Size-bounded LRU store of encoded pages, keyed by content.
+
+    Identical pages (blank pages, repeated title pages, the same book
+    exported twice) resolve to the same key and share one blob. The index
+    is rebuilt from the directory on start, ordered by file mtime, and
+    every hit refreshes the mtime, so the LRU order survives restarts.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = EncodingCache.MAX_BYTES):
+        """
+        Open (or create) the cache directory
+
+        Args:
+            cache_dir: Cache directory (defaults to EncodingCache.get_default_dir())
+            max_bytes: Total blob size above which the least recently used blobs are evicted
+        """
+        self.cache_dir = cache_dir or EncodingCache.get_default_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        found = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for blob in os.scandir(shard.path):
+                if blob.name.endswith(".bin"):
+                    stat = blob.stat()
+                    found.append((stat.st_mtime, blob.name[:-4], stat.st_size))
+                elif blob.name.endswith(".tmp"):
+                    # Left behind by an interrupted put()
+                    try:
+                        os.remove(blob.path)
+                    except OSError:
+                        pass
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(data: bytes, params: Dict[str, Any]) -> str:
+        """
+        Content key of a captured page and its encoding parameters
+
+        The key is computed from the captured file bytes, so a hit needs no
+        decoding. Frame files are a deterministic function of the pixels,
+        so identical captures produce identical keys.
+
+        Args:
+            data: Captured page file contents (before any conversion)
+            params: Encoding parameters (format, quality, max width, colour mode, ...)
+
+        Returns:
+            Hex digest
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps(
+            {"v": EncodingCache.KEY_VERSION, "params": params}, sort_keys=True
+        ).encode("utf-8"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".bin")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Encoded bytes for key, or None on a miss
+
+        Args:
+            key: Key from make_key()
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                # Removed behind our back (e.g. another instance evicted it)
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store encoded bytes under key and evict old blobs if over budget
+
+        Args:
+            key: Key from make_key()
+            data: Encoded page
+        """
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used blobs until the total fits max_bytes (lock held)"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
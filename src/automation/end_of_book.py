@@ -0,0 +1,69 @@
+"""
+End-of-book detection.
+Shared by the live capture loop and the offline session replay harness.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from src.constants import PageDetection
+from src.image_hasher import ImageHasher
+
+
+class EndOfBookDetector:
+    """
+    Detects the end of a book from consecutive near-identical page hashes.
+
+    Kindle stops turning at the last page, so every further capture shows the
+    same page. Once the current hash matches each of the last
+    consecutive_matches captured hashes, the book is considered finished.
+    """
+
+    def __init__(
+        self,
+        consecutive_matches: int = PageDetection.DEFAULT_END_DETECTION_SENSITIVITY,
+        threshold: float = PageDetection.HASH_DIFF_THRESHOLD
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            consecutive_matches: Number of previous pages that must match
+            threshold: Hash diff below which two pages count as identical
+        """
+        self.consecutive_matches = consecutive_matches
+        self.threshold = threshold
+        self.hashes: List[Tuple[float, int]] = []
+        # Same hashes as arrays, so is_end() compares the whole window in one call
+        self._means = np.empty(64, dtype=np.float64)
+        self._dhashes = np.empty(64, dtype=np.uint64)
+
+    def is_end(self, current_hash: Tuple[float, int]) -> bool:
+        """
+        Check whether current_hash completes a run of identical pages.
+
+        Args:
+            current_hash: Hash of the page just captured
+
+        Returns:
+            True if the last consecutive_matches pages are all similar to it
+        """
+        count = len(self.hashes)
+        if count < self.consecutive_matches:
+            return False
+        start = count - self.consecutive_matches
+        diffs = ImageHasher.compare_many(
+            current_hash, (self._means[start:count], self._dhashes[start:count])
+        )
+        return bool(np.all(diffs < self.threshold))
+
+    def add(self, current_hash: Tuple[float, int]) -> None:
+        """Record the hash of a captured page"""
+        count = len(self.hashes)
+        if count == len(self._means):
+            self._means = np.resize(self._means, count * 2)
+            self._dhashes = np.resize(self._dhashes, count * 2)
+        self._means[count] = current_hash[0]
+        self._dhashes[count] = current_hash[1]
+        self.hashes.append(current_hash)
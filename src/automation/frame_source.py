@@ -0,0 +1,335 @@
+"""
+Frame source module.
+Abstracts screen capture and page-turn input so the capture pipeline can run
+against the real desktop (mss + pyautogui) or a synthetic "virtual Kindle".
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from src.constants import Delays, PyAutoGUIConfig, PageTurnDirection, VirtualKindle
+from src.frame import Frame
+
+
+class FrameSource:
+    """
+    Interface for capture backends.
+
+    grab() returns a Frame (a BGRA view with a lazily computed grayscale
+    plane), so every consumer (ImageHasher, the capture pipeline, region
+    detection, the preview) works unchanged regardless of the backend.
+    """
+
+    @property
+    def monitors(self) -> List[Dict[str, int]]:
+        """Monitor list in mss layout: index 0 is the union, 1.. are physical monitors"""
+        raise NotImplementedError
+
+    def grab(self, region: Dict[str, int]) -> Frame:
+        """
+        Capture a screen region
+
+        Args:
+            region: Dict with 'left', 'top', 'width', 'height' keys
+
+        Returns:
+            Frame of the region
+        """
+        raise NotImplementedError
+
+    def press_key(self, key: str) -> None:
+        """Send a key press (e.g. a page-turn arrow key) to the book viewer"""
+        raise NotImplementedError
+
+    def ground_truth(self) -> Optional[Dict]:
+        """
+        Actual viewer state, if the backend knows it (used to label recordings)
+
+        Returns:
+            Dict with 'page', 'animating' and 'at_end' keys, or None
+        """
+        return None
+
+    def close(self) -> None:
+        """Release backend resources"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MssFrameSource(FrameSource):
+    """Real desktop backend using mss for capture and pyautogui for key input"""
+
+    def __init__(self):
+        # mss handles are bound to the thread that created them
+        self._local = threading.local()
+        self._instances = []
+        self._instances_lock = threading.Lock()
+        self._pyautogui = None
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            import mss
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._instances_lock:
+                self._instances.append(sct)
+        return sct
+
+    def _get_pyautogui(self):
+        if self._pyautogui is None:
+            # Imported lazily: pyautogui needs a display at import time
+            import pyautogui
+            pyautogui.PAUSE = PyAutoGUIConfig.PAUSE
+            pyautogui.FAILSAFE = PyAutoGUIConfig.FAILSAFE
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    @property
+    def monitors(self) -> List[Dict[str, int]]:
+        return self._sct().monitors
+
+    def grab(self, region: Dict[str, int]) -> Frame:
+        # Zero-copy view of mss's BGRA buffer
+        return Frame.from_screenshot(self._sct().grab(region))
+
+    def press_key(self, key: str) -> None:
+        # Use keyDown/keyUp instead of press for more reliable input
+        pyautogui = self._get_pyautogui()
+        pyautogui.keyDown(key)
+        time.sleep(Delays.KEY_PRESS)
+        pyautogui.keyUp(key)
+
+    def close(self) -> None:
+        with self._instances_lock:
+            for sct in self._instances:
+                try:
+                    sct.close()
+                except Exception:
+                    pass
+            self._instances = []
+        self._local = threading.local()
+
+
+class SyntheticFrameSource(FrameSource):
+    """
+    Deterministic "virtual Kindle" for headless runs and throughput testing.
+
+    Renders a fake book of generated text pages on a virtual desktop. A
+    page-turn key starts a transition that shows the old page for
+    render_latency seconds, then animation_frames intermediate wipe frames,
+    then the new page. Pressing the forward key on the last page does nothing,
+    which simulates the end of the book.
+    """
+
+    _WORDS = (
+        "the of and to in is was that for it with as his on be at by had not "
+        "are but from or have an they which one you were her all she there "
+        "would their we him been has when who will more no if out so said what "
+        "up its about into than them can only other new some could time these "
+        "two may then do first any my now such like our over man me even most"
+    ).split()
+
+    def __init__(
+        self,
+        page_count: int = VirtualKindle.PAGE_COUNT,
+        page_size=VirtualKindle.PAGE_SIZE,
+        book_origin=VirtualKindle.BOOK_ORIGIN,
+        screen_size=VirtualKindle.SCREEN_SIZE,
+        render_latency: float = VirtualKindle.RENDER_LATENCY,
+        animation_frames: int = VirtualKindle.ANIMATION_FRAMES,
+        animation_duration: float = VirtualKindle.ANIMATION_DURATION,
+        forward_key: str = PageTurnDirection.LEFT_KEY,
+        seed: int = 0,
+        clock=time.monotonic
+    ):
+        """
+        Initialize the virtual Kindle
+
+        Args:
+            page_count: Number of pages in the fake book
+            page_size: (width, height) of a rendered page in pixels
+            book_origin: (left, top) of the page on the virtual desktop
+            screen_size: (width, height) of the virtual monitor
+            render_latency: Seconds between the key press and the first changed frame
+            animation_frames: Number of intermediate frames during the transition
+            animation_duration: Seconds the transition animation lasts
+            forward_key: Key that advances the book (the other arrow goes back)
+            seed: Seed for the generated text
+            clock: Time function (injectable for deterministic replays)
+        """
+        self.page_count = max(1, int(page_count))
+        self.page_size = tuple(page_size)
+        self.book_origin = tuple(book_origin)
+        self.screen_size = tuple(screen_size)
+        self.render_latency = render_latency
+        self.animation_frames = max(0, int(animation_frames))
+        self.animation_duration = animation_duration if self.animation_frames else 0.0
+        self.forward_key = forward_key
+        self.backward_key = (PageTurnDirection.RIGHT_KEY if forward_key == PageTurnDirection.LEFT_KEY
+                             else PageTurnDirection.LEFT_KEY)
+        self.seed = seed
+        self.clock = clock
+
+        self.current_page = 0
+        self._target_page = 0
+        self._turn_started = None
+        self._lock = threading.Lock()
+        self._page_cache = OrderedDict()
+        self._page_cache_size = VirtualKindle.PAGE_CACHE_SIZE
+        self.key_presses = 0
+
+    @property
+    def monitors(self) -> List[Dict[str, int]]:
+        screen = {"left": 0, "top": 0, "width": self.screen_size[0], "height": self.screen_size[1]}
+        return [dict(screen), dict(screen)]
+
+    @property
+    def book_region(self) -> Dict[str, int]:
+        """Exact region of the rendered page on the virtual desktop"""
+        return {
+            "left": self.book_origin[0],
+            "top": self.book_origin[1],
+            "width": self.page_size[0],
+            "height": self.page_size[1],
+        }
+
+    @property
+    def at_end(self) -> bool:
+        """True once the last page is displayed"""
+        return self.current_page >= self.page_count - 1
+
+    def ground_truth(self) -> Optional[Dict]:
+        with self._lock:
+            return {
+                "page": self.current_page + 1,
+                "animating": self._turn_started is not None,
+                "at_end": self.at_end,
+            }
+
+    def press_key(self, key: str) -> None:
+        with self._lock:
+            self._settle()
+            self.key_presses += 1
+            if self._turn_started is not None:
+                # Kindle ignores input while a page animation is in progress
+                return
+            if key == self.forward_key and self.current_page < self.page_count - 1:
+                self._target_page = self.current_page + 1
+            elif key == self.backward_key and self.current_page > 0:
+                self._target_page = self.current_page - 1
+            else:
+                return
+            self._turn_started = self.clock()
+
+    def _settle(self) -> Optional[float]:
+        """Advance the transition state; returns animation progress (0-1) or None"""
+        if self._turn_started is None:
+            return None
+        elapsed = self.clock() - self._turn_started
+        if elapsed < self.render_latency:
+            return None
+        if self.animation_frames and elapsed < self.render_latency + self.animation_duration:
+            step = int((elapsed - self.render_latency) / self.animation_duration * self.animation_frames)
+            return (step + 1) / (self.animation_frames + 1)
+        self.current_page = self._target_page
+        self._turn_started = None
+        return None
+
+    def render_page(self, index: int) -> np.ndarray:
+        """
+        Render a page of the fake book as a grayscale array (deterministic per seed)
+
+        Args:
+            index: Zero-based page index
+
+        Returns:
+            uint8 array of shape (height, width)
+        """
+        cached = self._page_cache.get(index)
+        if cached is not None:
+            self._page_cache.move_to_end(index)
+            return cached
+
+        width, height = self.page_size
+        rng = random.Random(self.seed * 1000003 + index)
+        img = Image.new("L", (width, height), 250)
+        draw = ImageDraw.Draw(img)
+
+        margin = max(8, width // 12)
+        line_height = 14
+        y = margin
+        while y < height - margin - line_height:
+            words = []
+            line_len = 0
+            max_chars = max(1, (width - 2 * margin) // 6)
+            while True:
+                word = rng.choice(self._WORDS)
+                if line_len + len(word) + 1 > max_chars:
+                    break
+                words.append(word)
+                line_len += len(word) + 1
+            draw.text((margin, y), " ".join(words), fill=20)
+            # Occasional paragraph break
+            y += line_height * (2 if rng.random() < 0.1 else 1)
+
+        draw.text((width // 2 - 10, height - margin), str(index + 1), fill=60)
+        page = np.asarray(img, dtype=np.uint8)
+
+        self._page_cache[index] = page
+        if len(self._page_cache) > self._page_cache_size:
+            self._page_cache.popitem(last=False)
+        return page
+
+    def _current_view(self) -> np.ndarray:
+        with self._lock:
+            progress = self._settle()
+            old = self.render_page(self.current_page)
+            if progress is None:
+                return old
+            new = self.render_page(self._target_page)
+
+        # Horizontal wipe from the page-turn side
+        view = old.copy()
+        cut = int(self.page_size[0] * progress)
+        if self._target_page > self.current_page:
+            view[:, :cut] = new[:, :cut]
+        else:
+            start = self.page_size[0] - cut
+            view[:, start:] = new[:, start:]
+        return view
+
+    def grab(self, region: Dict[str, int]) -> Frame:
+        left, top = int(region["left"]), int(region["top"])
+        width, height = int(region["width"]), int(region["height"])
+
+        # Kindle-like grey desktop background around the page
+        canvas = np.full((height, width), VirtualKindle.BACKGROUND_GRAY, dtype=np.uint8)
+        page = self._current_view()
+
+        page_left, page_top = self.book_origin
+        page_h, page_w = page.shape
+        x0, y0 = max(left, page_left), max(top, page_top)
+        x1, y1 = min(left + width, page_left + page_w), min(top + height, page_top + page_h)
+        if x0 < x1 and y0 < y1:
+            canvas[y0 - top:y1 - top, x0 - left:x1 - left] = \
+                page[y0 - page_top:y1 - page_top, x0 - page_left:x1 - page_left]
+
+        bgra = np.empty((height, width, 4), dtype=np.uint8)
+        bgra[..., 0] = canvas
+        bgra[..., 1] = canvas
+        bgra[..., 2] = canvas
+        bgra[..., 3] = 255
+        # The page is rendered in grayscale, so the gray plane is known already
+        return Frame(bgra, left, top, gray=canvas)
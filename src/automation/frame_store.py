@@ -0,0 +1,194 @@
+"""
+Frame store module.
+Holds the encoded captured pages between the frame writers and the PDF
+builder. Pages are addressed by name (e.g. "page_0001.kfr"), so the same
+pipeline works whether the pages live in RAM or in the screenshots folder.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.constants import FrameStorage
+from src.utils import cleanup_dir
+
+
+class FrameStore:
+    """Storage interface for encoded captured pages (thread-safe)"""
+
+    def put(self, name: str, data: bytes) -> None:
+        """Store an encoded page under name"""
+        raise NotImplementedError
+
+    def get(self, name: str) -> bytes:
+        """
+        Encoded page stored under name
+
+        Raises:
+            KeyError: If no page is stored under name
+        """
+        raise NotImplementedError
+
+    def path(self, name: str) -> Optional[str]:
+        """File holding the page if it is persisted for resume, else None"""
+        return None
+
+    def release(self, name: str) -> None:
+        """Called once the consumer no longer needs the page"""
+        pass
+
+    def close(self) -> None:
+        """Free the store's resources"""
+        pass
+
+
+class DiskFrameStore(FrameStore):
+    """
+    Pages written as files in a folder (the journaled temp screenshots folder).
+
+    Pages are kept after release() so an interrupted run can be resumed
+    (until drop_released() is called); the folder itself is removed by the
+    coordinator.
+    """
+
+    def __init__(self, folder: str):
+        """
+        Args:
+            folder: Existing directory the page files are written to
+        """
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._released = []
+        self._delete_released = False
+
+    def put(self, name: str, data: bytes) -> None:
+        # Write-rename, so a crash never leaves a truncated page under its final name
+        path = os.path.join(self.folder, name)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, name: str) -> bytes:
+        try:
+            with open(os.path.join(self.folder, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(name)
+
+    def path(self, name: str) -> Optional[str]:
+        return os.path.join(self.folder, name)
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            if not self._delete_released:
+                self._released.append(name)
+                return
+        self._remove(name)
+
+    def drop_released(self) -> None:
+        """Delete pages once released, including those released so far (disables resume)"""
+        with self._lock:
+            self._delete_released = True
+            released, self._released = self._released, []
+        for name in released:
+            self._remove(name)
+
+    def _remove(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.folder, name))
+        except OSError:
+            pass
+
+
+class MemoryFrameStore(FrameStore):
+    """
+    Pages kept in RAM up to a byte budget, spilling the oldest to a local temp dir.
+
+    The spill directory is created under the system temp folder on first
+    use, so a network-mounted output folder is only touched by the final
+    PDF. Pages are dropped as soon as the PDF builder releases them.
+    """
+
+    def __init__(self, memory_budget: int = FrameStorage.MEMORY_BUDGET,
+                 spill_dir: Optional[str] = None):
+        """
+        Args:
+            memory_budget: Bytes of encoded pages held in RAM before spilling
+            spill_dir: Parent directory for spilled pages (defaults to the system temp dir)
+        """
+        self.memory_budget = memory_budget
+        self._spill_parent = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()  # oldest first
+        self._spilled: Dict[str, str] = {}
+        self.memory_bytes = 0
+        self.peak_memory_bytes = 0
+        self.spilled_pages = 0
+
+    def _spill_path(self, name: str) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix=FrameStorage.SPILL_PREFIX, dir=self._spill_parent)
+        return os.path.join(self._spill_dir, name)
+
+    def put(self, name: str, data: bytes) -> None:
+        with self._lock:
+            self._discard(name)
+            self._memory[name] = data
+            self.memory_bytes += len(data)
+            while self.memory_bytes > self.memory_budget and self._memory:
+                old_name, old_data = self._memory.popitem(last=False)
+                path = self._spill_path(old_name)
+                with open(path, "wb") as f:
+                    f.write(old_data)
+                self._spilled[old_name] = path
+                self.memory_bytes -= len(old_data)
+                self.spilled_pages += 1
+            self.peak_memory_bytes = max(self.peak_memory_bytes, self.memory_bytes)
+
+    def get(self, name: str) -> bytes:
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                return data
+            path = self._spilled[name]
+        with open(path, "rb") as f:
+            return f.read()
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._discard(name)
+
+    def _discard(self, name: str) -> None:
+        """Drop a page from memory or the spill dir (lock held)"""
+        data = self._memory.pop(name, None)
+        if data is not None:
+            self.memory_bytes -= len(data)
+        path = self._spilled.pop(name, None)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Current and peak RAM use and spill count"""
+        with self._lock:
+            return {
+                "pages_in_memory": len(self._memory),
+                "pages_spilled": len(self._spilled),
+                "memory_bytes": self.memory_bytes,
+                "peak_memory_bytes": self.peak_memory_bytes,
+                "total_spilled": self.spilled_pages,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self.memory_bytes = 0
+            cleanup_dir(self._spill_dir)
+            self._spill_dir = None
@@ -0,0 +1,95 @@
+"""
+Low-bit-depth grayscale page encoding module.
+Maps pages to 4 or 16 evenly spaced gray levels with a lookup table and
+writes them as 2- or 4-bit grayscale PNG, which the PDF writer embeds by
+copying the IDAT stream. Anti-aliased text only uses a handful of gray
+levels, so the page stays legible at a fraction of its 8-bit size.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+from src.constants import GrayPalette
+
+# 4x4 Bayer matrix as offsets in (0, 1), centred on 0.5 so dithering does not shift the mean
+_BAYER = (np.array([[0, 8, 2, 10],
+                    [12, 4, 14, 6],
+                    [3, 11, 1, 9],
+                    [15, 7, 13, 5]], dtype=np.float32) + 0.5) / 16.0
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def bits_for_levels(levels: int) -> int:
+    """PNG bit depth for a number of gray levels (2, 4 or 16)"""
+    bits = {2: 1, 4: 2, 16: 4}.get(levels)
+    if bits is None:
+        raise ValueError(f"Unsupported number of gray levels: {levels}")
+    return bits
+
+
+def quantize_gray(gray: np.ndarray, levels: int, dither: bool = GrayPalette.DITHER) -> np.ndarray:
+    """
+    Map a grayscale plane to level indices
+
+    Args:
+        gray: uint8 grayscale plane
+        levels: Number of evenly spaced gray levels
+        dither: Apply ordered (Bayer 4x4) dithering
+
+    Returns:
+        uint8 plane of indices 0..levels-1 (0 = black)
+    """
+    if not dither:
+        lut = np.round(np.arange(256) * (levels - 1) / 255.0).astype(np.uint8)
+        return lut[gray]
+    height, width = gray.shape
+    thresholds = np.tile(_BAYER, (height // 4 + 1, width // 4 + 1))[:height, :width]
+    scaled = gray.astype(np.float32) * ((levels - 1) / 255.0)
+    return np.minimum(np.floor(scaled + thresholds), levels - 1).astype(np.uint8)
+
+
+def _pack_rows(indices: np.ndarray, bits: int) -> np.ndarray:
+    """Pack indices MSB-first into PNG scanlines of the given bit depth"""
+    per_byte = 8 // bits
+    height, width = indices.shape
+    padded_width = -(-width // per_byte) * per_byte
+    if padded_width != width:
+        indices = np.pad(indices, ((0, 0), (0, padded_width - width)))
+    groups = indices.reshape(height, padded_width // per_byte, per_byte).astype(np.uint8)
+    packed = np.zeros(groups.shape[:2], dtype=np.uint8)
+    for i in range(per_byte):
+        packed |= groups[:, :, i] << (8 - bits * (i + 1))
+    return packed
+
+
+def _chunk(chunk_type: bytes, body: bytes) -> bytes:
+    return (struct.pack(">I", len(body)) + chunk_type + body +
+            struct.pack(">I", zlib.crc32(chunk_type + body) & 0xFFFFFFFF))
+
+
+def encode_gray_png(indices: np.ndarray, levels: int,
+                    level: int = GrayPalette.ZLIB_LEVEL) -> bytes:
+    """
+    Write level indices as a low-bit-depth grayscale PNG
+
+    Args:
+        indices: Plane from quantize_gray()
+        levels: Number of gray levels used by quantize_gray()
+        level: zlib compression level
+
+    Returns:
+        PNG file contents
+    """
+    # Each level count fills its bit depth, so index i decodes to gray i * 255 / (levels - 1)
+    bits = bits_for_levels(levels)
+    packed = _pack_rows(indices, bits)
+    height, width = indices.shape
+    # Filter type 0 (None) on every row
+    scanlines = np.zeros((height, packed.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 1:] = packed
+    header = struct.pack(">IIBBBBB", width, height, bits, 0, 0, 0, 0)
+    return (_PNG_SIGNATURE + _chunk(b"IHDR", header) +
+            _chunk(b"IDAT", zlib.compress(scanlines.tobytes(), level)) + _chunk(b"IEND", b""))
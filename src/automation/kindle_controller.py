@@ -5,12 +5,8 @@ Handles Kindle window detection, region detection, and page turn automation.
 
 import time
 from typing import Optional, Dict, Tuple, Callable
-import pyautogui
-import pygetwindow as gw
-import mss
 import cv2
 import numpy as np
-from PIL import Image
 from src.constants import (
     Delays,
     PyAutoGUIConfig,
@@ -22,6 +18,8 @@ from src.constants import (
 )
 from src.image_hasher import ImageHasher
 from src.callback_utils import get_callback_or_default
+from src.automation.frame_source import FrameSource, MssFrameSource
+from src.automation.sentinel_detector import SentinelChangeDetector
 
 class KindleController:
     """
@@ -32,7 +30,8 @@ class KindleController:
     def __init__(
         self,
         status_callback: Optional[Callable[[str], None]] = None,
-        error_callback: Optional[Callable[[str], None]] = None
+        error_callback: Optional[Callable[[str], None]] = None,
+        frame_source: Optional[FrameSource] = None
     ):
         """
         Initialize Kindle controller
@@ -40,35 +39,43 @@ class KindleController:
         Args:
             status_callback: Function to call with status messages
             error_callback: Function to call with error messages
+            frame_source: Capture/key-input backend (defaults to MssFrameSource)
         """
         self.status_callback = get_callback_or_default(status_callback, "Status")
         self.error_callback = get_callback_or_default(error_callback, "Error")
+        self.frame_source = frame_source if frame_source is not None else MssFrameSource()
 
         # Set instance delay values (can be overridden from constants)
         self.WINDOW_RESTORE_DELAY = Delays.WINDOW_RESTORE
         self.WINDOW_ACTIVATION_DELAY = Delays.WINDOW_ACTIVATION
         self.PAGE_TURN_DELAY = Delays.PAGE_TURN
 
-        # Configure PyAutoGUI
+    @staticmethod
+    def _get_pyautogui():
+        """Import and configure pyautogui lazily (it needs a display at import time)"""
+        import pyautogui
         pyautogui.PAUSE = PyAutoGUIConfig.PAUSE
         pyautogui.FAILSAFE = PyAutoGUIConfig.FAILSAFE
+        return pyautogui
 
     def get_monitor_for_window(self, window):
-        with mss.mss() as sct:
-            for monitor in sct.monitors[1:]:
-                window_center_x = window.left + window.width / 2
-                window_center_y = window.top + window.height / 2
-                if (monitor["left"] <= window_center_x < monitor["left"] + monitor["width"] and
-                    monitor["top"] <= window_center_y < monitor["top"] + monitor["height"]):
-                    return monitor
-        if len(sct.monitors) > 1:
-            return sct.monitors[1]
+        monitors = self.frame_source.monitors
+        for monitor in monitors[1:]:
+            window_center_x = window.left + window.width / 2
+            window_center_y = window.top + window.height / 2
+            if (monitor["left"] <= window_center_x < monitor["left"] + monitor["width"] and
+                monitor["top"] <= window_center_y < monitor["top"] + monitor["height"]):
+                return monitor
+        if len(monitors) > 1:
+            return monitors[1]
         return None
 
     def _get_kindle_window(self):
         self.status_callback("Finding Kindle app window...")
 
         try:
+            import pygetwindow as gw
+
             # Find all windows and filter for actual Kindle windows
             all_windows = gw.getAllWindows()
             kindle_windows = []
@@ -146,8 +153,8 @@ class KindleController:
                                f"size={monitor['width']}x{monitor['height']}")
         else:
             # Use primary monitor if no monitor detected
-            with mss.mss() as sct:
-                monitor = sct.monitors[1] if len(sct.monitors) > 1 else None
+            monitors = self.frame_source.monitors
+            monitor = monitors[1] if len(monitors) > 1 else None
 
         # ウィンドウをモニターの左半分にリサイズして配置
         if monitor:
@@ -178,6 +185,7 @@ class KindleController:
 
         # Move mouse to window and click to ensure focus
         try:
+            pyautogui = self._get_pyautogui()
             self.status_callback(f"Moving cursor to window center: ({window_center_x}, {window_center_y})")
             pyautogui.moveTo(window_center_x, window_center_y, duration=0.2)
             time.sleep(0.3)
@@ -204,12 +212,10 @@ class KindleController:
 
             self.status_callback(f"Capture area: {window_rect['width']}x{window_rect['height']} at ({window_rect['left']}, {window_rect['top']})")
 
-            with mss.mss() as sct:
-                sct_img = sct.grab(window_rect)
-                full_screenshot_np = np.array(Image.frombytes("RGB", sct_img.size, sct_img.rgb))
+            frame = self.frame_source.grab(window_rect)
 
             # 2. Process the image with OpenCV
-            gray = cv2.cvtColor(full_screenshot_np, cv2.COLOR_RGB2GRAY)
+            gray = frame.gray
 
             # Apply blur to reduce noise
             blurred = cv2.GaussianBlur(gray, RegionDetection.GAUSSIAN_BLUR_KERNEL, RegionDetection.GAUSSIAN_BLUR_SIGMA)
@@ -293,16 +299,26 @@ class KindleController:
         指定された領域のスクリーンショットを撮り、ハッシュを返す
         Returns: tuple (mean_value, histogram_hash)
         """
-        with mss.mss() as sct:
-            sct_img = sct.grab(screenshot_region)
-            return ImageHasher.hash_image(sct_img)
+        frame = self.frame_source.grab(screenshot_region)
+        return ImageHasher.hash_image(frame)
+
+    def _calibrated_detector(self, screenshot_region):
+        """
+        現在のページでセンチネル検出器を校正し、(検出器, ハッシュ) を返す
+        """
+        detector = SentinelChangeDetector(
+            self.frame_source.grab, screenshot_region, timeout=self.PAGE_TURN_DELAY
+        )
+        frame = self.frame_source.grab(screenshot_region)
+        detector.calibrate(frame)
+        return detector, ImageHasher.hash_image(frame)
 
     def determine_page_turn_direction(self, kindle_win):
         self.status_callback("Determining page turn direction...")
 
         book_region = self.get_book_region(kindle_win)
 
-        # mss.mss().grab()に渡すモニター引数
+        # frame_source.grab()に渡すモニター引数
         sct_monitor = {
             "left": book_region["left"],
             "top": book_region["top"],
@@ -321,6 +337,7 @@ class KindleController:
             region_center_y = book_region["top"] + book_region["height"] // 2
 
             self.status_callback(f"Ensuring window focus at capture region center: ({region_center_x}, {region_center_y})")
+            pyautogui = self._get_pyautogui()
 
             # Move mouse to capture region center
             pyautogui.moveTo(region_center_x, region_center_y, duration=0.3)
@@ -341,38 +358,37 @@ class KindleController:
         # 安定するまで待機
         time.sleep(0.5)
 
-        # 最初のページハッシュを記録
-        initial_hash = self._hash_image(sct_monitor)
+        # 最初のページハッシュを記録（ページめくりはセンチネルパッチで監視する）
+        detector, initial_hash = self._calibrated_detector(sct_monitor)
         self.status_callback(f"Initial page hash recorded: mean={initial_hash[0]:.2f}, dhash={initial_hash[1]}")
 
         # Take a test screenshot to verify we're capturing something
         try:
-            with mss.mss() as sct:
-                test_img = sct.grab(sct_monitor)
-                test_arr = np.array(Image.frombytes("RGB", test_img.size, test_img.rgb))
-                mean_brightness = np.mean(test_arr)
-                std_brightness = np.std(test_arr)
-                self.status_callback(f"Capture verification - Size: {test_img.size}, Brightness: {mean_brightness:.2f}, StdDev: {std_brightness:.2f}")
-
-                # Save debug image for troubleshooting
-                try:
-                    debug_img = Image.fromarray(test_arr)
-                    debug_path = "debug_capture_initial.png"
-                    debug_img.save(debug_path)
-                    self.status_callback(f"Debug: Saved initial capture to {debug_path}")
-                except Exception as save_err:
-                    self.status_callback(f"Debug: Could not save test image: {save_err}")
-
-                # Check if image is not completely black or white
-                if mean_brightness < PageDetection.MIN_BRIGHTNESS:
-                    self.status_callback(f"⚠ WARNING: Captured image is too dark (brightness: {mean_brightness:.2f} < {PageDetection.MIN_BRIGHTNESS})")
-                    self.status_callback("This suggests the capture region may be wrong or the screen is black")
-                elif mean_brightness > PageDetection.MAX_BRIGHTNESS:
-                    self.status_callback(f"⚠ WARNING: Captured image is too bright (brightness: {mean_brightness:.2f} > {PageDetection.MAX_BRIGHTNESS})")
-                    self.status_callback("This suggests a blank/white screen or wrong capture region")
-                elif std_brightness < 10:
-                    self.status_callback(f"⚠ WARNING: Very low variation in image (StdDev: {std_brightness:.2f})")
-                    self.status_callback("This suggests a uniform color screen - likely not showing book content")
+            test_img = self.frame_source.grab(sct_monitor)
+            test_arr = test_img.gray
+            mean_brightness = np.mean(test_arr)
+            std_brightness = np.std(test_arr)
+            self.status_callback(f"Capture verification - Size: {test_img.size}, Brightness: {mean_brightness:.2f}, StdDev: {std_brightness:.2f}")
+
+            # Save debug image for troubleshooting
+            try:
+                debug_img = test_img.to_image()
+                debug_path = "debug_capture_initial.png"
+                debug_img.save(debug_path)
+                self.status_callback(f"Debug: Saved initial capture to {debug_path}")
+            except Exception as save_err:
+                self.status_callback(f"Debug: Could not save test image: {save_err}")
+
+            # Check if image is not completely black or white
+            if mean_brightness < PageDetection.MIN_BRIGHTNESS:
+                self.status_callback(f"⚠ WARNING: Captured image is too dark (brightness: {mean_brightness:.2f} < {PageDetection.MIN_BRIGHTNESS})")
+                self.status_callback("This suggests the capture region may be wrong or the screen is black")
+            elif mean_brightness > PageDetection.MAX_BRIGHTNESS:
+                self.status_callback(f"⚠ WARNING: Captured image is too bright (brightness: {mean_brightness:.2f} > {PageDetection.MAX_BRIGHTNESS})")
+                self.status_callback("This suggests a blank/white screen or wrong capture region")
+            elif std_brightness < 10:
+                self.status_callback(f"⚠ WARNING: Very low variation in image (StdDev: {std_brightness:.2f})")
+                self.status_callback("This suggests a uniform color screen - likely not showing book content")
         except Exception as e:
             self.status_callback(f"Capture verification warning: {e}")
 
@@ -380,26 +396,20 @@ class KindleController:
         self.status_callback("Testing RIGHT arrow key...")
         self.status_callback("Pressing RIGHT arrow...")
 
-        # Use keyDown/keyUp instead of press for more reliable input
-        pyautogui.keyDown(PageTurnDirection.RIGHT_KEY)
-        time.sleep(Delays.KEY_PRESS)
-        pyautogui.keyUp(PageTurnDirection.RIGHT_KEY)
-
-        self.status_callback(f"Waiting {self.PAGE_TURN_DELAY}s for page to turn...")
-        time.sleep(self.PAGE_TURN_DELAY)
+        self.frame_source.press_key(PageTurnDirection.RIGHT_KEY)
 
-        after_right_hash = self._hash_image(sct_monitor)
+        self.status_callback(f"Waiting up to {self.PAGE_TURN_DELAY}s for page to turn...")
+        _, after_right_hash, _ = detector.wait(initial_hash)
         right_diff = ImageHasher.compare_hashes(initial_hash, after_right_hash)
         self.status_callback(f"After RIGHT arrow: mean={after_right_hash[0]:.2f}, dhash={after_right_hash[1]} (diff: {right_diff:.2f})")
 
         # Save debug image after RIGHT arrow
         try:
-            with mss.mss() as sct:
-                debug_img_data = sct.grab(sct_monitor)
-                debug_img = Image.frombytes("RGB", debug_img_data.size, debug_img_data.rgb)
-                debug_path = "debug_capture_after_right.png"
-                debug_img.save(debug_path)
-                self.status_callback(f"Debug: Saved after-RIGHT capture to {debug_path}")
+            debug_img_data = self.frame_source.grab(sct_monitor)
+            debug_img = debug_img_data.to_image()
+            debug_path = "debug_capture_after_right.png"
+            debug_img.save(debug_path)
+            self.status_callback(f"Debug: Saved after-RIGHT capture to {debug_path}")
         except Exception as save_err:
             self.status_callback(f"Debug: Could not save after-RIGHT image: {save_err}")
 
@@ -409,59 +419,48 @@ class KindleController:
             self.status_callback("Page turn direction: Right-to-Left (RTL) - RIGHT arrow advances page")
             # ページがめくれたので、テストで進んだ分を戻す
             self.status_callback("Pressing LEFT arrow to return to original page...")
-            pyautogui.keyDown(PageTurnDirection.LEFT_KEY)
-            time.sleep(Delays.KEY_PRESS)
-            pyautogui.keyUp(PageTurnDirection.LEFT_KEY)
-            time.sleep(self.PAGE_TURN_DELAY)
+            self.frame_source.press_key(PageTurnDirection.LEFT_KEY)
+            detector.wait(after_right_hash)
             return PageTurnDirection.RIGHT_KEY
 
         # No change detected - try going back with LEFT to return to original state
         self.status_callback("No change detected with RIGHT arrow. Pressing LEFT to return to original state...")
-        pyautogui.keyDown(PageTurnDirection.LEFT_KEY)
-        time.sleep(Delays.KEY_PRESS)
-        pyautogui.keyUp(PageTurnDirection.LEFT_KEY)
-        time.sleep(self.PAGE_TURN_DELAY)
+        self.frame_source.press_key(PageTurnDirection.LEFT_KEY)
 
         # 元のページに戻ったか確認
-        current_hash = self._hash_image(sct_monitor)
+        _, current_hash, _ = detector.wait(after_right_hash)
         back_diff = ImageHasher.compare_hashes(initial_hash, current_hash)
         self.status_callback(f"After LEFT return: mean={current_hash[0]:.2f}, dhash={current_hash[1]} (diff: {back_diff:.2f})")
 
         if back_diff > PageDetection.HASH_DIFF_THRESHOLD:
             # LEFT made a change, so we're probably not at initial page anymore
             self.status_callback("WARNING: Could not reliably return to initial page. Trying RIGHT to stabilize...")
-            pyautogui.press(PageTurnDirection.RIGHT_KEY)
-            time.sleep(self.PAGE_TURN_DELAY)
+            self.frame_source.press_key(PageTurnDirection.RIGHT_KEY)
+            detector.wait(current_hash)
 
         # Wait and recapture initial state
         time.sleep(1)
-        initial_hash = self._hash_image(sct_monitor)
+        detector, initial_hash = self._calibrated_detector(sct_monitor)
         self.status_callback(f"Re-captured initial page hash: mean={initial_hash[0]:.2f}, dhash={initial_hash[1]}")
 
         # 左矢印でテスト
         self.status_callback("Testing LEFT arrow key...")
         self.status_callback("Pressing LEFT arrow...")
 
-        # Use keyDown/keyUp instead of press for more reliable input
-        pyautogui.keyDown(PageTurnDirection.LEFT_KEY)
-        time.sleep(Delays.KEY_PRESS)
-        pyautogui.keyUp(PageTurnDirection.LEFT_KEY)
-
-        self.status_callback(f"Waiting {self.PAGE_TURN_DELAY}s for page to turn...")
-        time.sleep(self.PAGE_TURN_DELAY)
+        self.frame_source.press_key(PageTurnDirection.LEFT_KEY)
 
-        after_left_hash = self._hash_image(sct_monitor)
+        self.status_callback(f"Waiting up to {self.PAGE_TURN_DELAY}s for page to turn...")
+        _, after_left_hash, _ = detector.wait(initial_hash)
         left_diff = ImageHasher.compare_hashes(initial_hash, after_left_hash)
         self.status_callback(f"After LEFT arrow: mean={after_left_hash[0]:.2f}, dhash={after_left_hash[1]} (diff: {left_diff:.2f})")
 
         # Save debug image after LEFT arrow
         try:
-            with mss.mss() as sct:
-                debug_img_data = sct.grab(sct_monitor)
-                debug_img = Image.frombytes("RGB", debug_img_data.size, debug_img_data.rgb)
-                debug_path = "debug_capture_after_left.png"
-                debug_img.save(debug_path)
-                self.status_callback(f"Debug: Saved after-LEFT capture to {debug_path}")
+            debug_img_data = self.frame_source.grab(sct_monitor)
+            debug_img = debug_img_data.to_image()
+            debug_path = "debug_capture_after_left.png"
+            debug_img.save(debug_path)
+            self.status_callback(f"Debug: Saved after-LEFT capture to {debug_path}")
         except Exception as save_err:
             self.status_callback(f"Debug: Could not save after-LEFT image: {save_err}")
 
@@ -470,10 +469,8 @@ class KindleController:
             self.status_callback("Page turn direction: Left-to-Right (LTR) - LEFT arrow advances page")
             # ページがめくれたので、テストで進んだ分を戻す
             self.status_callback("Pressing RIGHT arrow to return to original page...")
-            pyautogui.keyDown(PageTurnDirection.RIGHT_KEY)
-            time.sleep(Delays.KEY_PRESS)
-            pyautogui.keyUp(PageTurnDirection.RIGHT_KEY)
-            time.sleep(self.PAGE_TURN_DELAY)
+            self.frame_source.press_key(PageTurnDirection.RIGHT_KEY)
+            detector.wait(after_left_hash)
             return PageTurnDirection.LEFT_KEY
 
         # Neither direction worked - check if it's close to threshold
@@ -0,0 +1,169 @@
+"""
+Mixed raster content (MRC) page encoding module.
+Splits a page into a full-resolution 1-bit text mask (CCITT G4) and a
+downsampled JPEG background with the text removed. The PDF writer paints
+the background and then the mask as a stencil in the text colour, so text
+over shaded or coloured backgrounds stays sharp at a fraction of the size
+of a lossless page.
+
+The mask has a single ink colour. Pages whose text pixels do not share one
+colour (several text colours, or screentone and artwork pulled into the
+mask) are left to the caller to store as a plain JPEG page.
+"""
+
+import io
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.automation.bilevel import encode_g4
+from src.constants import MixedRasterContent
+
+MAGIC = b"KMRC"
+VERSION = 1
+# magic, version, text colour (r, g, b), background length, mask length
+_HEADER = struct.Struct(">4sBBBBxxxII")
+
+
+class MrcLayers(NamedTuple):
+    """Encoded layers of an MRC page"""
+    background: bytes  # JPEG, drawn over the whole page
+    mask: bytes  # Single-strip G4 TIFF; black pixels are painted in color
+    color: Tuple[int, int, int]  # Text colour (RGB)
+
+
+def is_mrc_data(data: bytes) -> bool:
+    """True if data is an MRC page produced by encode_mrc()"""
+    return data[:4] == MAGIC
+
+
+def pack_layers(layers: MrcLayers) -> bytes:
+    """Serialize layers into one blob (stored in the page cache and passed to the PDF writer)"""
+    header = _HEADER.pack(MAGIC, VERSION, *layers.color, len(layers.background), len(layers.mask))
+    return header + layers.background + layers.mask
+
+
+def unpack_layers(data: bytes) -> MrcLayers:
+    """
+    Parse a blob from pack_layers()
+
+    Raises:
+        ValueError: If data is not a complete MRC page
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("MRC page is truncated")
+    magic, version, red, green, blue, background_len, mask_len = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a supported MRC page")
+    start = _HEADER.size
+    if len(data) < start + background_len + mask_len:
+        raise ValueError("MRC page is truncated")
+    background = data[start:start + background_len]
+    mask = data[start + background_len:start + background_len + mask_len]
+    return MrcLayers(background, mask, (red, green, blue))
+
+
+def segment_text(gray: np.ndarray,
+                 kernel: int = MixedRasterContent.BACKGROUND_KERNEL) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Separate dark text from its local background
+
+    A morphological closing with a kernel wider than any text stroke removes
+    the text and leaves the (possibly shaded) background; pixels much darker
+    than that background are text.
+
+    Args:
+        gray: uint8 grayscale plane
+        kernel: Closing kernel size in pixels
+
+    Returns:
+        (bool text mask, uint8 background estimate)
+    """
+    structuring = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel, kernel))
+    background = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, structuring)
+    contrast = cv2.subtract(background, gray)
+    mask = ((contrast >= MixedRasterContent.TEXT_CONTRAST) &
+            (gray <= MixedRasterContent.TEXT_MAX_LEVEL))
+    return mask, background
+
+
+def ink_color(pixels: np.ndarray, mask: np.ndarray) -> Optional[Tuple[int, int, int]]:
+    """
+    The one colour the text mask is painted in
+
+    Only the solid interior of the mask is measured (pixels whose
+    neighbours are all text), so anti-aliased edges, which blend the ink
+    with the background, neither lighten the colour nor count as a second
+    one. Thin strokes without an interior fall back to all mask pixels.
+
+    Args:
+        pixels: uint8 plane or RGB array the mask was segmented from
+        mask: bool text mask with at least one pixel
+
+    Returns:
+        (r, g, b), or None if more than MixedRasterContent.MAX_OFF_INK_FRACTION
+        of the solid text pixels differ from the median ink by more than
+        MixedRasterContent.INK_TOLERANCE gray levels in a channel
+    """
+    core = cv2.erode(mask.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+    if not core.any():
+        ink = pixels[mask]
+        return tuple(int(v) for v in (ink.mean(axis=0) if pixels.ndim == 3 else [ink.mean()] * 3))
+    ink = pixels[core].astype(np.int16).reshape(-1, pixels.shape[2] if pixels.ndim == 3 else 1)
+    median = np.median(ink, axis=0)
+    off_ink = np.count_nonzero(np.abs(ink - median).max(axis=1) > MixedRasterContent.INK_TOLERANCE)
+    if off_ink > MixedRasterContent.MAX_OFF_INK_FRACTION * len(ink):
+        return None
+    return tuple(int(v) for v in (median if pixels.ndim == 3 else [median[0]] * 3))
+
+
+def encode_mrc(pixels: np.ndarray, dpi: Tuple[float, float]) -> Tuple[Optional[bytes], float]:
+    """
+    Encode a page as MRC layers
+
+    Args:
+        pixels: uint8 plane (height, width) or RGB array (height, width, 3)
+        dpi: Resolution of the mask (sizes the PDF page)
+
+    Returns:
+        (pack_layers() blob, or None if the text has no single ink colour
+        (see ink_color), fraction of pixels in the text mask)
+    """
+    color = pixels.ndim == 3
+    gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY) if color else pixels
+    mask, gray_background = segment_text(gray)
+    text_fraction = float(np.count_nonzero(mask)) / mask.size
+
+    if text_fraction:
+        text_color = ink_color(pixels, mask)
+        if text_color is None:
+            return None, text_fraction
+    else:
+        text_color = (0, 0, 0)
+
+    # Replace text (and its anti-aliased rim) with the background so the JPEG
+    # does not spend bits on edges the mask already draws
+    covered = cv2.dilate(mask.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+    if color:
+        structuring = cv2.getStructuringElement(
+            cv2.MORPH_RECT, (MixedRasterContent.BACKGROUND_KERNEL, MixedRasterContent.BACKGROUND_KERNEL)
+        )
+        background = cv2.morphologyEx(pixels, cv2.MORPH_CLOSE, structuring)
+        filled = np.where(covered[..., None], background, pixels)
+    else:
+        filled = np.where(covered, gray_background, gray)
+
+    height, width = gray.shape
+    scale = MixedRasterContent.BACKGROUND_SCALE
+    small = cv2.resize(filled, (max(1, width // scale), max(1, height // scale)),
+                       interpolation=cv2.INTER_AREA)
+    buffer = io.BytesIO()
+    Image.fromarray(small).save(buffer, "JPEG", quality=MixedRasterContent.BACKGROUND_QUALITY,
+                                optimize=True)
+
+    mask_plane = np.where(mask, 0, 255).astype(np.uint8)
+    layers = MrcLayers(buffer.getvalue(), encode_g4(mask_plane, dpi), text_color)
+    return pack_layers(layers), text_fraction
@@ -0,0 +1,187 @@
+"""
+Book-wide near-duplicate page index.
+Finds earlier captures of the current page, so repeated pages caused by
+Kindle jumping back (sync-position popups, double turns that get corrected)
+are noticed anywhere in the book, not only among the last few pages.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.constants import PageDetection
+from src.image_hasher import ImageHasher
+
+
+class PageHashIndex:
+    """
+    Incremental multi-index hash table over (mean, 64-bit dHash) page hashes.
+
+    Each dHash is split into 8 one-byte chunks with one bucket table per
+    chunk. Two hashes within Hamming distance 7 agree exactly on at least
+    one chunk, so the union of the 8 buckets holds every candidate; those are
+    then scored with ImageHasher.compare_many. Queries touch a few dozen
+    entries instead of the whole book, and stay well under a millisecond at
+    10,000 pages. Radii the chunking cannot guarantee fall back to a
+    vectorized scan over all entries.
+    """
+
+    CHUNKS = 8
+    MAX_INDEXED_RADIUS = CHUNKS - 1
+
+    def __init__(self, threshold: float = PageDetection.HASH_DIFF_THRESHOLD):
+        """
+        Initialize an empty index
+
+        Args:
+            threshold: Default ImageHasher.compare_hashes score below which
+                two pages count as the same
+        """
+        self.threshold = threshold
+        self._ids: List[int] = []
+        self._means = np.empty(256, dtype=np.float64)
+        self._dhashes = np.empty(256, dtype=np.uint64)
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.CHUNKS)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _chunks(dhash: int):
+        return [(dhash >> (8 * i)) & 0xFF for i in range(PageHashIndex.CHUNKS)]
+
+    def add(self, page_id: int, page_hash: Tuple[float, int]) -> None:
+        """
+        Add a captured page
+
+        Args:
+            page_id: Page number (returned by query())
+            page_hash: (mean_value, dhash) from ImageHasher
+        """
+        row = len(self._ids)
+        if row == len(self._means):
+            self._means = np.resize(self._means, row * 2)
+            self._dhashes = np.resize(self._dhashes, row * 2)
+        self._means[row] = page_hash[0]
+        self._dhashes[row] = page_hash[1]
+        self._ids.append(page_id)
+        for bucket, chunk in zip(self._buckets, self._chunks(page_hash[1])):
+            bucket.setdefault(chunk, []).append(row)
+
+    def query(self, page_hash: Tuple[float, int],
+              threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Find indexed pages similar to page_hash
+
+        Args:
+            page_hash: (mean_value, dhash) to look up
+            threshold: Score threshold (defaults to the index threshold)
+
+        Returns:
+            List of (page_id, score) with score < threshold, most similar first
+        """
+        if threshold is None:
+            threshold = self.threshold
+        count = len(self._ids)
+        if count == 0:
+            return []
+
+        # score = mean_diff + 2 * hamming, so a match needs hamming < threshold / 2
+        radius = int(np.ceil(threshold / 2.0)) - 1
+        if radius > self.MAX_INDEXED_RADIUS:
+            rows = np.arange(count)
+        else:
+            candidates = set()
+            for bucket, chunk in zip(self._buckets, self._chunks(page_hash[1])):
+                candidates.update(bucket.get(chunk, ()))
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+        scores = ImageHasher.compare_many(page_hash, (self._means[rows], self._dhashes[rows]))
+        hits = np.flatnonzero(scores < threshold)
+        matches = [(self._ids[rows[i]], float(scores[i])) for i in hits]
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+
+class PageRepeat(NamedTuple):
+    """A capture that matches an earlier page"""
+    capture: int  # Sequence number of the capture
+    page: int  # Page number the capture would have been saved as
+    original: int  # Earlier page it repeats
+    score: float  # ImageHasher.compare_hashes score against the original
+    loop_start: int  # First original page of the current run of repeats
+    loop_length: int  # Consecutive captures repeating consecutive earlier pages
+
+
+class RepeatedPageMonitor:
+    """
+    Flags captures that repeat earlier pages and groups them into loops.
+
+    A loop is a run of consecutive captures that repeat consecutive earlier
+    pages, e.g. Kindle jumping back from page 57 to page 52 yields repeats of
+    52, 53, 54, ... until the capture reaches new content again.
+    """
+
+    def __init__(self, threshold: float = PageDetection.HASH_DIFF_THRESHOLD):
+        """
+        Args:
+            threshold: ImageHasher.compare_hashes score below which pages match
+        """
+        self.index = PageHashIndex(threshold)
+        self.repeats: List[PageRepeat] = []
+        self._captures = 0
+        self._last: Optional[PageRepeat] = None
+
+    def check(self, page_num: int, page_hash: Tuple[float, int]) -> Optional[PageRepeat]:
+        """
+        Look up a new capture (call once per capture, before add())
+
+        Args:
+            page_num: Page number the capture would be saved as
+            page_hash: Its (mean_value, dhash)
+
+        Returns:
+            PageRepeat if an earlier page matches, else None
+        """
+        self._captures += 1
+        matches = self.index.query(page_hash)
+        if not matches:
+            self._last = None
+            return None
+
+        last = self._last
+        original, score = matches[0]
+        if last is not None and last.capture == self._captures - 1:
+            # Prefer the match that continues the current loop
+            for page_id, page_score in matches:
+                if page_id in (last.original, last.original + 1):
+                    original, score = page_id, page_score
+                    break
+        if (last is not None and last.capture == self._captures - 1 and
+                original in (last.original, last.original + 1)):
+            loop_start, loop_length = last.loop_start, last.loop_length + 1
+        else:
+            loop_start, loop_length = original, 1
+
+        repeat = PageRepeat(self._captures, page_num, original, score, loop_start, loop_length)
+        self.repeats.append(repeat)
+        self._last = repeat
+        return repeat
+
+    def add(self, page_num: int, page_hash: Tuple[float, int]) -> None:
+        """Index a page that was kept"""
+        self.index.add(page_num, page_hash)
+
+    @staticmethod
+    def describe(repeat: PageRepeat) -> str:
+        """Human-readable status line for a repeat"""
+        if repeat.loop_length > 1 and repeat.loop_start == repeat.original:
+            return (f"Page not advancing: {repeat.loop_length} captures repeat page "
+                    f"{repeat.original} (diff {repeat.score:.1f})")
+        if repeat.loop_length > 1:
+            return (f"Loop detected: {repeat.loop_length} captures repeat pages "
+                    f"{repeat.loop_start}-{repeat.original} (latest: page {repeat.page} "
+                    f"= page {repeat.original}, diff {repeat.score:.1f})")
+        return f"Page {repeat.page} repeats page {repeat.original} (diff {repeat.score:.1f})"
@@ -0,0 +1,123 @@
+"""
+Adaptive page turn waiter.
+Polls the capture region after a page-turn key press and returns as soon as
+the page has changed and settled, instead of sleeping a fixed delay.
+"""
+
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from src.constants import AdaptiveWait, PageDetection
+from src.image_hasher import ImageHasher
+
+
+class PageTurnWaiter:
+    """
+    Waits for a page turn by sampling the capture region at a high rate.
+
+    A sample counts as "changed" once its hash differs from the previous page
+    by more than PageDetection.HASH_DIFF_THRESHOLD. After that, the frame must
+    stay unchanged for settle_samples consecutive samples (Kindle's page
+    animation and late glyph rendering produce intermediate frames). If the
+    timeout expires first, the latest sample is returned, which matches the
+    old fixed-sleep behaviour in the worst case.
+    """
+
+    def __init__(
+        self,
+        grab_func: Callable[[], Any],
+        hash_func: Callable[[Any], Tuple[float, int]] = ImageHasher.hash_image,
+        poll_interval: float = AdaptiveWait.POLL_INTERVAL,
+        settle_samples: int = AdaptiveWait.SETTLE_SAMPLES,
+        timeout: float = AdaptiveWait.TIMEOUT,
+        change_threshold: float = PageDetection.HASH_DIFF_THRESHOLD,
+        settle_threshold: float = AdaptiveWait.SETTLE_DIFF_THRESHOLD,
+        stop_event=None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the waiter
+
+        Args:
+            grab_func: Function returning a new capture of the book region
+            hash_func: Function hashing a capture (defaults to ImageHasher.hash_image)
+            poll_interval: Seconds between samples
+            settle_samples: Consecutive unchanged samples required after the change
+            timeout: Maximum seconds to wait before giving up
+            change_threshold: Hash diff above which the page counts as turned
+            settle_threshold: Hash diff below which two samples count as identical
+            stop_event: Optional threading.Event that aborts the wait when set
+            clock: Time function (the replay harness injects recorded timestamps)
+            sleep: Sleep function (a no-op when replaying faster than real time)
+        """
+        self.grab_func = grab_func
+        self.hash_func = hash_func
+        self.poll_interval = poll_interval
+        self.settle_samples = max(1, int(settle_samples))
+        self.timeout = timeout
+        self.change_threshold = change_threshold
+        self.settle_threshold = settle_threshold
+        self.stop_event = stop_event
+        self.clock = clock
+        self.sleep = sleep
+
+        # Statistics of the last wait (useful for logging and tuning)
+        self.last_elapsed = 0.0
+        self.last_samples = 0
+        self.last_timed_out = False
+
+    def wait(self, previous_hash: Optional[Tuple[float, int]]) -> Tuple[Any, Tuple[float, int], bool]:
+        """
+        Wait until the page differs from previous_hash and has settled.
+
+        Args:
+            previous_hash: Hash of the page shown before the key press
+
+        Returns:
+            Tuple of (capture, hash, changed). changed is False when the wait
+            timed out (or was stopped) without detecting a page change.
+        """
+        start = self.clock()
+        deadline = start + self.timeout
+        changed = False
+        stable_count = 0
+        last_hash = None
+        capture = None
+        current_hash = None
+        samples = 0
+
+        while True:
+            sample_start = self.clock()
+            capture = self.grab_func()
+            current_hash = self.hash_func(capture)
+            samples += 1
+
+            if not changed:
+                if (previous_hash is None or
+                        ImageHasher.compare_hashes(previous_hash, current_hash) > self.change_threshold):
+                    changed = True
+                    stable_count = 0
+            elif ImageHasher.compare_hashes(last_hash, current_hash) <= self.settle_threshold:
+                stable_count += 1
+            else:
+                # Still animating - restart the settle count from this frame
+                stable_count = 0
+            last_hash = current_hash
+
+            if changed and stable_count >= self.settle_samples:
+                break
+
+            now = self.clock()
+            if now >= deadline or (self.stop_event is not None and self.stop_event.is_set()):
+                break
+
+            # Keep a steady sampling rate regardless of grab/hash cost
+            remaining = self.poll_interval - (now - sample_start)
+            if remaining > 0:
+                self.sleep(min(remaining, max(0.0, deadline - now)))
+
+        self.last_elapsed = self.clock() - start
+        self.last_samples = samples
+        self.last_timed_out = not (changed and stable_count >= self.settle_samples)
+        return capture, current_hash, changed
@@ -0,0 +1,353 @@
+"""
+Parallel page optimization module.
+Runs the CPU-bound page optimization (decode, grayscale, resize,
+encode as PNG/JPEG/low-bit gray/G4/MRC or per-page codec choice) in a
+process pool, so a whole book is optimized on all cores instead of one page
+at a time under the GIL.
+"""
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.constants import (
+    Bilevel, GrayPalette, ImageProcessing, MixedRasterContent, PageClassification, ParallelOptimization, PdfOutput
+)
+
+
+def optimize_page(data: Union[bytes, Any], image_format: str = "PNG", jpeg_quality: int = 90,
+                  color: bool = False, max_width: Optional[int] = None,
+                  resampler: str = ImageProcessing.RESAMPLER,
+                  policy: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[bytes, Optional[Any]]:
+    """
+    Optimize one captured page (convert to grayscale, resize, change format)
+
+    "G4" thresholds the page to 1 bit (see bilevel.py) at up to
+    Bilevel.MAX_WIDTH pixels and stores the resolution so the PDF page has
+    the same size as a PNG/JPEG page would. "MRC" stores a G4 text mask at
+    the same resolution over a downsampled JPEG background (see mrc.py),
+    or a plain JPEG page if there is hardly any text or the text is not in
+    one ink colour. "GRAY16"/"GRAY4"
+    quantize to 16/4 gray levels and store a 4/2-bit PNG (see
+    gray_palette.py). "AUTO" classifies the page (see page_classifier.py)
+    and encodes it with the codec the policy (PageClassification.POLICY by
+    default) assigns to its class. Pages are scaled with the resampler
+    engine (see resampler.py).
+
+    Args:
+        data: Captured page (frame file or any image format Pillow reads), or
+            its pixels as a NumPy array (grayscale, BGRA or RGB) to skip decoding
+        image_format: "PNG", "JPEG", "GRAY16", "GRAY4", "G4", "MRC" or "AUTO"
+        jpeg_quality: JPEG quality (0-100) if using JPEG format
+        color: Keep colour (PNG/JPEG/MRC)
+        max_width: Page width limit instead of ImageProcessing.MAX_IMAGE_WIDTH
+            (1-bit layers scale along); not part of encoding_params()
+        resampler: One of resampler.RESAMPLERS
+        policy: Codec per page class for "AUTO" (defaults to PageClassification.POLICY)
+
+    Returns:
+        (encoded optimized page, PageClass for "AUTO" else None)
+    """
+    # Imported here so worker processes only load what they need
+    import io
+    from PIL import Image
+    from src.automation.bilevel import binarize, encode_g4
+    from src.automation.gray_palette import encode_gray_png, quantize_gray
+    from src.automation.mrc import encode_mrc
+    from src.automation.resampler import decode_pixels, resample
+    from src.page_classifier import classify
+
+    if max_width is None:
+        max_width = ImageProcessing.MAX_IMAGE_WIDTH
+    bilevel_width = round(Bilevel.MAX_WIDTH * max_width / ImageProcessing.MAX_IMAGE_WIDTH)
+
+    page_class = None
+    upper = image_format.upper()
+    pixels = decode_pixels(data, min_width=bilevel_width if upper in ("AUTO", "G4", "MRC") else max_width,
+                           resampler=resampler)
+    if upper == "AUTO":
+        page_class = classify(pixels)
+        codec = (policy or PageClassification.POLICY)[page_class.label]
+        image_format = codec["format"]
+        jpeg_quality = codec.get("quality", jpeg_quality)
+        color = codec.get("color", False)
+
+    bilevel = image_format.upper() == "G4"
+    layered = image_format.upper() == "MRC"
+    gray_levels = GrayPalette.FORMATS.get(image_format.upper())
+    # Convert to grayscale for smaller file size (unless colour is kept)
+    keep_color = color and not (bilevel or gray_levels) and pixels.ndim == 3
+    source_width = pixels.shape[1]
+
+    # Resize if too large (preserve aspect ratio)
+    page = resample(pixels, bilevel_width if bilevel or layered else max_width, keep_color, resampler)
+
+    if bilevel or layered:
+        # Same physical page size as a page scaled to max_width at the default dpi
+        dpi = PdfOutput.DEFAULT_DPI * page.shape[1] / min(source_width, max_width)
+        if bilevel:
+            return encode_g4(binarize(page), (dpi, dpi)), page_class
+        encoded, text_fraction = encode_mrc(page, (dpi, dpi))
+        if encoded is not None and text_fraction >= MixedRasterContent.MIN_TEXT_FRACTION:
+            return encoded, page_class
+        # Hardly any text to lift out (a plain JPEG page is smaller), or text
+        # in several colours that one ink colour would flatten
+        page = resample(page, max_width, keep_color, resampler)
+        image_format = "JPEG"
+
+    if gray_levels:
+        indices = quantize_gray(page, gray_levels)
+        return encode_gray_png(indices, gray_levels), page_class
+
+    # Save with specified format
+    buffer = io.BytesIO()
+    img = Image.fromarray(page)
+    if image_format.upper() == "JPEG":
+        img.save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+    else:  # PNG
+        img.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue(), page_class
+
+
+def encoding_params(image_format: str, jpeg_quality: int, color: bool = False,
+                    policy: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Parameters that determine optimize_page's output (EncodedPageCache key)"""
+    return dict(_format_params(image_format, jpeg_quality, color, policy), resampler=ImageProcessing.RESAMPLER)
+
+
+def _format_params(image_format: str, jpeg_quality: int, color: bool,
+                   policy: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    bilevel = {
+        "max_width": Bilevel.MAX_WIDTH,
+        "mode": "1",
+        "threshold": [Bilevel.METHOD, Bilevel.SAUVOLA_WINDOW, Bilevel.SAUVOLA_K, Bilevel.SAUVOLA_R],
+    }
+    if image_format.upper() == "AUTO":
+        return {
+            "format": "AUTO",
+            "policy": policy or PageClassification.POLICY,
+            "classifier": [PageClassification.SAMPLE_WIDTH, PageClassification.SATURATION_MIN,
+                           PageClassification.COLOR_FRACTION, PageClassification.BIMODALITY_MIN,
+                           PageClassification.MIDTONE_MARGIN, PageClassification.MIDTONE_MAX,
+                           PageClassification.EDGE_THRESHOLD, PageClassification.EDGE_MIN],
+            "bilevel": bilevel,
+            "max_width": ImageProcessing.MAX_IMAGE_WIDTH,
+        }
+    if image_format.upper() == "G4":
+        return dict(bilevel, format="G4")
+    if image_format.upper() in GrayPalette.FORMATS:
+        return {
+            "format": image_format.upper(),
+            "max_width": ImageProcessing.MAX_IMAGE_WIDTH,
+            "levels": GrayPalette.FORMATS[image_format.upper()],
+            "dither": GrayPalette.DITHER,
+        }
+    if image_format.upper() == "MRC":
+        return dict(
+            bilevel, format="MRC", mode="RGB" if color else "L", quality=jpeg_quality,
+            layers=[MixedRasterContent.BACKGROUND_KERNEL, MixedRasterContent.TEXT_CONTRAST,
+                    MixedRasterContent.TEXT_MAX_LEVEL, MixedRasterContent.BACKGROUND_SCALE,
+                    MixedRasterContent.BACKGROUND_QUALITY, MixedRasterContent.MIN_TEXT_FRACTION,
+                    MixedRasterContent.INK_TOLERANCE, MixedRasterContent.MAX_OFF_INK_FRACTION],
+        )
+    return {
+        "format": image_format.upper(),
+        "quality": jpeg_quality if image_format.upper() == "JPEG" else None,
+        "max_width": ImageProcessing.MAX_IMAGE_WIDTH,
+        "mode": "RGB" if color else "L",
+    }
+
+
+def _optimize_chunk(pages: List[bytes], image_format: str, jpeg_quality: int,
+                    policy: Optional[Dict[str, Dict[str, Any]]] = None
+                    ) -> List[Tuple[Optional[bytes], Optional[str], Optional[Any]]]:
+    """Worker entry point: (optimized bytes, None, PageClass) or (None, error message, None) per page"""
+    results = []
+    for data in pages:
+        try:
+            optimized, page_class = optimize_page(data, image_format, jpeg_quality, policy=policy)
+            results.append((optimized, None, page_class))
+        except Exception as e:
+            results.append((None, str(e), None))
+    return results
+
+
+class ParallelPageOptimizer:
+    """
+    Ordered page optimization on a process pool.
+
+    Pages are sent to the workers in chunks of chunk_size, with at most
+    CHUNKS_IN_FLIGHT_PER_WORKER chunks per worker outstanding so memory
+    stays bounded; results are yielded strictly in input order. With an
+    EncodedPageCache, hits are answered in this process and only misses
+    are sent to the pool.
+
+    The pool is not used in frozen (PyInstaller) builds, on single-core
+    machines, or for fewer than MIN_PAGES pages; map() then optimizes in
+    this process with the same results. Several optimizers may share one
+    executor (e.g. volumes built at the same time).
+
+    image_format, jpeg_quality, policy and cache may be changed while map()
+    runs (e.g. by a storage fallback); each page uses the values current
+    when map() reads it.
+    """
+
+    def __init__(self, image_format: str = "PNG", jpeg_quality: int = 90,
+                 workers: int = ParallelOptimization.WORKERS,
+                 chunk_size: int = ParallelOptimization.CHUNK_SIZE,
+                 cache=None, executor: Optional[Executor] = None,
+                 policy: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Args:
+            image_format: "PNG", "JPEG", "GRAY16", "GRAY4", "G4", "MRC" or "AUTO"
+            jpeg_quality: JPEG quality (0-100) if using JPEG format
+            workers: Worker processes (0 = one per CPU core, minus one for this process)
+            chunk_size: Pages per work item sent to a worker
+            cache: Optional EncodedPageCache
+            executor: Process pool to use instead of starting one per map() call
+                (left running by map())
+            policy: Codec per page class for "AUTO" (None = PageClassification.POLICY)
+        """
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.policy = policy
+        self.workers = self.resolve_workers(workers)
+        self.chunk_size = max(1, int(chunk_size))
+        self.cache = cache
+        self.executor = executor
+
+    @staticmethod
+    def resolve_workers(requested: int) -> int:
+        """
+        Number of worker processes to use
+
+        Returns:
+            0 if pages should be optimized serially in this process
+        """
+        if getattr(sys, "frozen", False):
+            # Spawned workers would re-run the frozen executable's entry point
+            return 0
+        cpus = os.cpu_count() or 1
+        if cpus <= 1:
+            return 0
+        workers = requested if requested > 0 else cpus - 1
+        return max(0, min(workers, cpus))
+
+    def _settings(self) -> Tuple[str, int, Optional[Dict[str, Dict[str, Any]]]]:
+        """(image_format, jpeg_quality, policy) for the next page read"""
+        return self.image_format, self.jpeg_quality, self.policy
+
+    def _cache_key(self, data: bytes, settings: Tuple) -> Optional[str]:
+        if self.cache is None:
+            return None
+        image_format, jpeg_quality, policy = settings
+        return self.cache.make_key(data, encoding_params(image_format, jpeg_quality, policy=policy))
+
+    def _lookup(self, key: Optional[str]) -> Optional[bytes]:
+        cache = self.cache
+        return cache.get(key) if key is not None and cache is not None else None
+
+    def _store(self, key: Optional[str], optimized: Optional[bytes]) -> None:
+        cache = self.cache
+        if key is not None and optimized is not None and cache is not None:
+            try:
+                cache.put(key, optimized)
+            except OSError:
+                # A full or read-only cache must never fail the build
+                pass
+
+    def map(self, pages: Iterable[Tuple[str, bytes]],
+            page_count: Optional[int] = None) -> Iterator[Tuple[str, bytes, Optional[bytes], Optional[str], Optional[Any]]]:
+        """
+        Optimize pages, yielding results in input order
+
+        Args:
+            pages: (name, captured bytes) pairs; consumed lazily
+            page_count: Number of pages, if known (decides whether the pool pays off)
+
+        Yields:
+            (name, captured bytes, optimized bytes or None, error message or None,
+            PageClass or None); the PageClass is only known for "AUTO" pages
+            that were encoded in this run (not for cache hits)
+        """
+        if self.workers == 0 or (page_count is not None and page_count < ParallelOptimization.MIN_PAGES):
+            yield from self._map_serial(pages)
+        else:
+            yield from self._map_parallel(pages)
+
+    def _map_serial(self, pages):
+        for name, data in pages:
+            settings = self._settings()
+            key = self._cache_key(data, settings)
+            optimized = self._lookup(key)
+            if optimized is not None:
+                yield name, data, optimized, None, None
+                continue
+            optimized, error, page_class = _optimize_chunk([data], *settings)[0]
+            self._store(key, optimized)
+            yield name, data, optimized, error, page_class
+
+    def _map_parallel(self, pages):
+        max_in_flight = self.workers * ParallelOptimization.CHUNKS_IN_FLIGHT_PER_WORKER
+        # Cache hits queued behind a pending page also count against the bound
+        max_queued = max_in_flight * self.chunk_size
+        # Entries in input order: [name, data, key, result]; result None until known
+        queue = deque()
+        chunk = []
+        chunk_settings = None
+        futures = deque()  # (entries, future) in submission order
+
+        def submit():
+            futures.append((list(chunk), pool.submit(
+                _optimize_chunk, [entry[1] for entry in chunk], *chunk_settings
+            )))
+            chunk.clear()
+
+        def collect_oldest():
+            entries, future = futures.popleft()
+            for entry, result in zip(entries, future.result()):
+                self._store(entry[2], result[0])
+                entry[3] = result
+
+        def ready_head():
+            while queue and queue[0][3] is not None:
+                name, data, _, (optimized, error, page_class) = queue.popleft()
+                yield name, data, optimized, error, page_class
+
+        with ExitStack() as stack:
+            pool = self.executor or stack.enter_context(ProcessPoolExecutor(max_workers=self.workers))
+            for name, data in pages:
+                settings = self._settings()
+                key = self._cache_key(data, settings)
+                cached = self._lookup(key)
+                entry = [name, data, key, (cached, None, None) if cached is not None else None]
+                queue.append(entry)
+                if cached is None:
+                    if chunk and settings != chunk_settings:
+                        # The pages of a work item share their settings
+                        submit()
+                    chunk_settings = settings
+                    chunk.append(entry)
+                    if len(chunk) >= self.chunk_size:
+                        submit()
+                while len(futures) >= max_in_flight:
+                    collect_oldest()
+                if len(queue) > max_queued:
+                    # The head is in the oldest chunk; flush a partial chunk so it can complete
+                    if chunk:
+                        submit()
+                    if futures:
+                        collect_oldest()
+                # Pages may arrive slowly (a live capture); pass on what is already done
+                while futures and futures[0][1].done():
+                    collect_oldest()
+                yield from ready_head()
+            if chunk:
+                submit()
+            while futures:
+                collect_oldest()
+                yield from ready_head()
+            yield from ready_head()
@@ -1,81 +1,316 @@
-import img2pdf
-from PIL import Image
 import os
-import time
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from src.callback_utils import get_callback_or_default
+from src.automation.pdf_merge import merge_pdfs
+from src.automation.pdf_writer import PdfWriteError, StreamingPdfWriter
+from src.automation.encoding_cache import EncodedPageCache
+from src.automation.parallel_optimizer import ParallelPageOptimizer
+from src.automation.volume_planner import detect_chapter_starts, plan_volumes, profile_pages, volume_filename
+from src.constants import EncodingCache, PageClassification, ParallelOptimization, PdfOutput, VolumeSplit
 
-class PdfConverter:
-    def __init__(self, status_callback=None):
-        self.status_callback = get_callback_or_default(status_callback, "Status")
 
-    def optimize_image(self, image_path, output_path, image_format="PNG", jpeg_quality=90):
-        """Optimize a single image (convert to grayscale, resize, change format)"""
+class IncrementalPdfBuild:
+    """
+    Builds the PDF on a background thread while pages are still being captured.
+
+    Pages may be added in any order from any thread (e.g. FrameWriterPool
+    callbacks); the builder optimizes and appends them strictly in page
+    order as soon as the next page is available. finish() is called once
+    every page has been added; it writes the remaining pages and finalizes
+    the file, and fails if a page is missing.
+
+    Pages are optimized on the same bounded process pool as
+    create_pdf_from_images (see ParallelPageOptimizer), one page per work
+    item, and handed to the PDF writer as bytes in page order; no optimized
+    copies are written. With a frame_store, pages are added by name and
+    released from the store once they are in the PDF.
+    """
+
+    def __init__(self, converter, pdf_path, image_format="PNG", jpeg_quality=90,
+                 frame_store=None, optimize_images=True):
+        """
+        Args:
+            converter: PdfConverter providing the worker count, page cache and status messages
+            pdf_path: Output PDF path
+            image_format: Format of optimized pages (ImageProcessing.SUPPORTED_FORMATS)
+            jpeg_quality: JPEG quality (0-100) if using JPEG format
+            frame_store: FrameStore the added page names refer to, or None for file paths
+            optimize_images: Whether to optimize pages
+
+        image_format, jpeg_quality and policy (the "AUTO" codec per page
+        class, None = PageClassification.POLICY) may be changed while the
+        PDF is built; they apply to the pages optimized after the change.
+        So do cache (the EncodedPageCache, or None) and linearize, which
+        decides on finish() whether the PDF is linearized.
+        """
+        self.converter = converter
+        self.pdf_path = pdf_path
+        self.frame_store = frame_store
+        self.optimize_images = optimize_images
+        self._optimizer = ParallelPageOptimizer(
+            image_format, jpeg_quality, workers=converter.optimize_workers,
+            chunk_size=ParallelOptimization.INCREMENTAL_CHUNK_SIZE, cache=converter._get_encoding_cache()
+        )
+
+        self._writer = StreamingPdfWriter(pdf_path, linearize=converter.linearize,
+                                          status_callback=converter.status_callback)
+        self._pending = {}
+        self._next_index = 1
+        self._last_index = None
+        self._error = None
+        self._cancelled = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="pdf-builder", daemon=True)
+        self._thread.start()
+
+    @property
+    def image_format(self):
+        return self._optimizer.image_format
+
+    @image_format.setter
+    def image_format(self, value):
+        self._optimizer.image_format = value
+
+    @property
+    def jpeg_quality(self):
+        return self._optimizer.jpeg_quality
+
+    @jpeg_quality.setter
+    def jpeg_quality(self, value):
+        self._optimizer.jpeg_quality = value
+
+    @property
+    def policy(self):
+        return self._optimizer.policy
+
+    @policy.setter
+    def policy(self, value):
+        self._optimizer.policy = value
+
+    @property
+    def cache(self):
+        return self._optimizer.cache
+
+    @cache.setter
+    def cache(self, value):
+        self._optimizer.cache = value
+
+    @property
+    def linearize(self):
+        return self._writer.linearize
+
+    @linearize.setter
+    def linearize(self, value):
+        self._writer.linearize = value
+
+    @property
+    def pages_written(self):
+        return self._writer.page_count
+
+    @property
+    def bytes_written(self):
+        return self._writer.bytes_written
+
+    def add(self, index, image_path):
+        """
+        Queue a captured page
+
+        Args:
+            index: 1-based page number (pages are written in this order)
+            image_path: Path of the captured image (page name with a frame_store)
+        """
+        with self._condition:
+            self._pending[index] = image_path
+            self._condition.notify_all()
+
+    def _pages(self):
+        """Added pages in page order as (name, captured bytes), waiting for each one"""
+        while True:
+            with self._condition:
+                while (not self._cancelled and self._next_index not in self._pending and
+                       self._last_index is None):
+                    self._condition.wait()
+                if self._cancelled or (self._last_index is not None and
+                                       self._next_index > self._last_index):
+                    return
+                if self._next_index not in self._pending:
+                    # finish() was called and no more pages will be added
+                    raise PdfWriteError(f"Page {self._next_index} was never added to the PDF")
+                image_path = self._pending.pop(self._next_index)
+                self._next_index += 1
+            yield image_path, PdfConverter._read_page(image_path, self.frame_store)
+
+    def _run(self):
         try:
-            with Image.open(image_path) as img:
-                # Convert to grayscale for smaller file size
-                img_gray = img.convert("L")
-
-                # Resize if too large (preserve aspect ratio)
-                if img_gray.width > 1200:
-                    width_percent = (1200 / float(img_gray.width))
-                    new_height = int((float(img_gray.height) * float(width_percent)))
-                    img_gray = img_gray.resize((1200, new_height), Image.LANCZOS)
-
-                # Save with specified format
-                if image_format.upper() == "JPEG":
-                    img_gray.save(output_path, "JPEG", quality=jpeg_quality, optimize=True)
-                else:  # PNG
-                    img_gray.save(output_path, "PNG", optimize=True)
-
-                return output_path
+            if not self.optimize_images:
+                for name, data in self._pages():
+                    self._append(name, data)
+                return
+            results = self._optimizer.map(self._pages())
+            try:
+                for name, data, optimized, error, page_class in results:
+                    if self._cancelled:
+                        return
+                    if optimized is None:
+                        # Embed the original if optimization fails
+                        self.converter.status_callback(
+                            f"Warning: Could not optimize {os.path.basename(name)}: {error}"
+                        )
+                    elif self.image_format.upper() == "AUTO":
+                        self.converter._report_page_class(name, page_class, self.policy)
+                    self._append(name, optimized or data)
+            finally:
+                results.close()
         except Exception as e:
-            self.status_callback(f"Warning: Could not optimize {os.path.basename(image_path)}: {e}")
-            # Return original if optimization fails
-            return image_path
+            with self._condition:
+                self._error = e
+                self._condition.notify_all()
+
+    def _append(self, name, data):
+        self._writer.add_image_bytes(data)
+        if self.frame_store is not None:
+            self.frame_store.release(name)
+
+    def finish(self, page_count):
+        """
+        Write the remaining pages 1..page_count and finalize the PDF
+
+        Call it after the last add(); a page that has not been added by then
+        is reported as missing instead of being waited for.
+
+        Args:
+            page_count: Number of pages the PDF should contain
+
+        Returns:
+            Path of the finished PDF
+
+        Raises:
+            PdfWriteError: If one of the pages was never added
+            Exception: The first error raised while appending a page
+        """
+        with self._condition:
+            self._last_index = page_count
+            self._condition.notify_all()
+        self._thread.join()
+        try:
+            if self._error is not None:
+                raise self._error
+            self.converter._report_cache_stats()
+            self.converter._report_page_classes()
+            self.converter.status_callback(f"Finalizing PDF ({self._writer.page_count} pages)...")
+            self.converter._report_linearization(self.linearize)
+            return self._writer.close()
+        except Exception:
+            self._writer.abort()
+            raise
+
+    def abort(self):
+        """Stop building and discard the partial PDF"""
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._writer.abort()
+
+
+class PdfConverter:
+    def __init__(self, status_callback=None, encoding_cache=None,
+                 optimize_workers=ParallelOptimization.WORKERS,
+                 linearize=PdfOutput.LINEARIZE):
+        """
+        Args:
+            status_callback: Function for status messages
+            encoding_cache: EncodedPageCache for optimized pages (defaults to the
+                per-user cache if EncodingCache.ENABLED)
+            optimize_workers: Worker processes for page optimization, also while an
+                incremental PDF is built (0 = one per CPU core minus one; serial in frozen builds)
+            linearize: Write linearized ("fast web view") PDFs
+        """
+        self.status_callback = get_callback_or_default(status_callback, "Status")
+        self.optimize_workers = optimize_workers
+        self.linearize = linearize
+        self._encoding_cache = encoding_cache
+        self._cache_lock = threading.Lock()
+        self._page_classes = Counter()
+
+    def _get_encoding_cache(self):
+        """Open the shared page cache on first use; None if disabled or unavailable"""
+        with self._cache_lock:
+            if self._encoding_cache is None and EncodingCache.ENABLED:
+                try:
+                    self._encoding_cache = EncodedPageCache()
+                except OSError as e:
+                    self.status_callback(f"Warning: Page cache unavailable: {e}")
+                    self._encoding_cache = False
+            return self._encoding_cache or None
+
+    def _report_page_class(self, name, page_class, policy=None):
+        """Log the codec chosen for an "AUTO" page (page_class is None for a cache hit)"""
+        if page_class is None:
+            self._page_classes["cached"] += 1
+            self.status_callback(f"{os.path.basename(name)}: reused cached encoding")
+            return
+        self._page_classes[page_class.label] += 1
+        codec_policy = (policy or PageClassification.POLICY)[page_class.label]
+        codec = codec_policy["format"]
+        if "quality" in codec_policy:
+            codec += f" quality {codec_policy['quality']}"
+        if codec_policy.get("color"):
+            codec += " colour"
+        self.status_callback(f"{os.path.basename(name)}: {page_class.describe()} -> {codec}")
+
+    def _report_page_classes(self):
+        """Report how many pages went to each codec class and reset the counts"""
+        if self._page_classes:
+            counts = ", ".join(f"{count} {label}" for label, count in sorted(self._page_classes.items()))
+            self.status_callback(f"Page classes: {counts}")
+            self._page_classes.clear()
+
+    def _report_linearization(self, linearize=None):
+        if linearize is None:
+            linearize = self.linearize
+        if linearize:
+            self.status_callback("Linearizing PDF for fast web view...")
+
+    def _report_cache_stats(self):
+        """Report page cache hit/miss counters"""
+        cache = self._encoding_cache
+        if cache:
+            stats = cache.stats()
+            if stats["hits"] + stats["misses"]:
+                self.status_callback(
+                    f"Page cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%}), {stats['bytes'] / (1024 * 1024):.1f} MB"
+                )
 
     def create_pdf_from_images(self, image_files, output_folder, output_filename,
-                               optimize_images=True, image_format="PNG", jpeg_quality=90):
+                               optimize_images=True, image_format="PNG", jpeg_quality=90,
+                               frame_store=None):
         """
         Create PDF from image files
 
+        Pages are optimized on a process pool (see ParallelPageOptimizer) and
+        appended to the PDF in order as their results arrive.
+
         Args:
-            image_files: List of image file paths
+            image_files: List of image file paths (page names with a frame_store)
             output_folder: Output directory
             output_filename: PDF filename
             optimize_images: Whether to optimize images (grayscale, resize)
-            image_format: "PNG" or "JPEG"
+            image_format: One of ImageProcessing.SUPPORTED_FORMATS ("AUTO" = per page)
             jpeg_quality: JPEG quality (0-100) if using JPEG format
+            frame_store: FrameStore holding the pages
         """
         self.status_callback("Creating PDF from captured images...")
         os.makedirs(output_folder, exist_ok=True)
         pdf_path = os.path.join(output_folder, output_filename)
 
-        images_to_convert = []
-        temp_optimized_dir = None
-
-        if optimize_images:
-            self.status_callback(f"Optimizing images (format: {image_format}, quality: {jpeg_quality})...")
-            temp_optimized_dir = os.path.join(output_folder, f"temp_optimized_{int(time.time())}")
-            os.makedirs(temp_optimized_dir, exist_ok=True)
-
-            for i, image_file in enumerate(image_files, 1):
-                self.status_callback(f"Optimizing image {i}/{len(image_files)}: {os.path.basename(image_file)}")
-
-                # Determine output extension
-                ext = ".jpg" if image_format.upper() == "JPEG" else ".png"
-                output_name = os.path.splitext(os.path.basename(image_file))[0] + ext
-                output_path = os.path.join(temp_optimized_dir, output_name)
-
-                optimized_path = self.optimize_image(image_file, output_path, image_format, jpeg_quality)
-                images_to_convert.append(optimized_path)
-        else:
-            images_to_convert = image_files
-
         try:
-            self.status_callback(f"Converting {len(images_to_convert)} images to PDF...")
-            with open(pdf_path, "wb") as f:
-                f.write(img2pdf.convert(images_to_convert))
-
+            self._write_pdf(pdf_path, image_files, optimize_images, image_format, jpeg_quality, frame_store)
+            self._report_cache_stats()
+            self._report_page_classes()
             self.status_callback(f"PDF created successfully: {pdf_path}")
             return pdf_path
 
@@ -83,13 +318,204 @@ class PdfConverter:
             self.status_callback(f"Error creating PDF: {e}")
             raise
 
+    def _write_pdf(self, pdf_path, image_files, optimize_images, image_format, jpeg_quality,
+                   frame_store, executor=None, label=""):
+        """
+        Optimize pages and stream them into one PDF (see create_pdf_from_images)
+
+        Args:
+            executor: Shared process pool for the optimizer, or None to start one
+            label: Prefix for per-page status messages (e.g. the volume name)
+        """
+        def read_pages():
+            for image_file in image_files:
+                yield image_file, self._read_page(image_file, frame_store)
+
+        with StreamingPdfWriter(pdf_path, linearize=self.linearize,
+                                status_callback=self.status_callback) as writer:
+            if optimize_images:
+                optimizer = ParallelPageOptimizer(
+                    image_format, jpeg_quality, workers=self.optimize_workers,
+                    cache=self._get_encoding_cache(), executor=executor
+                )
+                mode = f"{optimizer.workers} worker processes" if optimizer.workers else "serial"
+                self.status_callback(
+                    f"{label}Optimizing images (format: {image_format}, quality: {jpeg_quality}, {mode})..."
+                )
+                results = optimizer.map(read_pages(), page_count=len(image_files))
+                for i, (name, data, optimized, error, page_class) in enumerate(results, 1):
+                    self.status_callback(f"{label}Optimized image {i}/{len(image_files)}: {os.path.basename(name)}")
+                    if image_format.upper() == "AUTO" and optimized is not None:
+                        self._report_page_class(name, page_class)
+                    if optimized is None:
+                        # Embed the original if optimization fails
+                        self.status_callback(f"Warning: Could not optimize {os.path.basename(name)}: {error}")
+                    writer.add_image_bytes(optimized or data)
+                    if frame_store is not None:
+                        frame_store.release(name)
+            else:
+                self.status_callback(f"{label}Converting {len(image_files)} images to PDF...")
+                for name, data in read_pages():
+                    writer.add_image_bytes(data)
+                    if frame_store is not None:
+                        frame_store.release(name)
+            self._report_linearization()
+
+    @staticmethod
+    def _read_page(image_file, frame_store):
+        if frame_store is not None:
+            return frame_store.get(image_file)
+        with open(image_file, "rb") as f:
+            return f.read()
+
+    def _estimate_page_sizes(self, image_files, optimize_images, image_format, jpeg_quality,
+                             frame_store, executor):
+        """
+        Estimated output bytes per page: captured size times the output/captured
+        ratio of VolumeSplit.SIZE_SAMPLE_PAGES pages spread over the book
+
+        The sample is encoded through the page cache, so with the cache
+        enabled those pages are not encoded again when the volumes are built.
+        """
+        def captured_size(name):
+            path = frame_store.path(name) if frame_store is not None else name
+            if path is not None and os.path.exists(path):
+                return os.path.getsize(path)
+            return len(self._read_page(name, frame_store))
+
+        sizes = [captured_size(name) for name in image_files]
+        if not optimize_images or not image_files:
+            return sizes
+        step = max(1, len(image_files) // VolumeSplit.SIZE_SAMPLE_PAGES)
+        sample = image_files[step // 2::step][:VolumeSplit.SIZE_SAMPLE_PAGES]
+        optimizer = ParallelPageOptimizer(
+            image_format, jpeg_quality, workers=self.optimize_workers,
+            cache=self._get_encoding_cache(), executor=executor
+        )
+        captured = encoded = 0
+        for _, data, optimized, _, _ in optimizer.map(
+                ((name, self._read_page(name, frame_store)) for name in sample), page_count=len(sample)):
+            captured += len(data)
+            encoded += len(optimized or data)
+        ratio = encoded / captured if captured else 1.0
+        return [int(size * ratio) for size in sizes]
+
+    def create_pdf_volumes(self, image_files, output_folder, output_filename,
+                           optimize_images=True, image_format="PNG", jpeg_quality=90,
+                           frame_store=None, max_pages=VolumeSplit.MAX_PAGES,
+                           max_bytes=VolumeSplit.MAX_BYTES,
+                           split_at_chapters=VolumeSplit.SPLIT_AT_CHAPTERS,
+                           merge=VolumeSplit.MERGE,
+                           parallel_volumes=VolumeSplit.PARALLEL_VOLUMES):
+        """
+        Create the book as volume PDFs (book_vol01.pdf, book_vol02.pdf, ...)
+
+        Volumes are planned up front (see volume_planner.py) and built
+        parallel_volumes at a time, sharing one optimizer process pool. A
+        volume that fails does not stop the others; the volumes that were
+        written are kept and PdfWriteError names the failed ones. With
+        merge, the volumes' pages are then copied into output_filename
+        without re-encoding (see pdf_merge.py).
+
+        Args:
+            image_files: List of image file paths (page names with a frame_store)
+            output_folder: Output directory
+            output_filename: PDF filename of the whole book (volume names derive from it)
+            optimize_images: Whether to optimize images (grayscale, resize)
+            image_format: One of ImageProcessing.SUPPORTED_FORMATS ("AUTO" = per page)
+            jpeg_quality: JPEG quality (0-100) if using JPEG format
+            frame_store: FrameStore holding the pages
+            max_pages: Pages per volume (0 = no limit)
+            max_bytes: Estimated bytes per volume (0 = no limit)
+            split_at_chapters: Cut at detected chapter starts (alone: one volume per chapter)
+            merge: Also write output_filename with every page
+            parallel_volumes: Volumes built at the same time
+
+        Returns:
+            Paths of the volume PDFs, preceded by the merged PDF if merge
+
+        Raises:
+            PdfWriteError: If a volume could not be written
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        workers = ParallelPageOptimizer.resolve_workers(self.optimize_workers)
+        use_pool = optimize_images and workers and len(image_files) >= ParallelOptimization.MIN_PAGES
+        executor = ProcessPoolExecutor(max_workers=workers) if use_pool else None
+        try:
+            page_sizes = [0] * len(image_files)
+            if max_bytes:
+                self.status_callback("Estimating volume sizes...")
+                page_sizes = self._estimate_page_sizes(
+                    image_files, optimize_images, image_format, jpeg_quality, frame_store, executor
+                )
+            chapter_starts = None
+            if split_at_chapters:
+                self.status_callback("Detecting chapter starts...")
+                chapter_starts = detect_chapter_starts(
+                    profile_pages(lambda name: self._read_page(name, frame_store), image_files)
+                )
+                self.status_callback(f"{len(chapter_starts)} chapter starts detected.")
+            volumes = plan_volumes(page_sizes, max_pages, max_bytes, chapter_starts)
+            volume_paths = [os.path.join(output_folder, volume_filename(output_filename, number, len(volumes)))
+                            for number in range(1, len(volumes) + 1)]
+            self.status_callback(
+                f"Creating {len(volumes)} volumes: " +
+                ", ".join(f"{os.path.basename(path)} (pages {pages.start + 1}-{pages.stop})"
+                          for path, pages in zip(volume_paths, volumes))
+            )
+
+            def build(path, pages):
+                self._write_pdf(path, image_files[pages.start:pages.stop], optimize_images, image_format,
+                                jpeg_quality, frame_store, executor=executor,
+                                label=f"{os.path.basename(path)}: ")
+                self.status_callback(f"Volume created: {path}")
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=max(1, parallel_volumes)) as pool:
+                futures = [(path, pool.submit(build, path, pages)) for path, pages in zip(volume_paths, volumes)]
+                for path, future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.status_callback(f"Error creating {os.path.basename(path)}: {e}")
+                        failed.append(os.path.basename(path))
         finally:
-            # Cleanup temporary optimized images
-            if temp_optimized_dir and os.path.exists(temp_optimized_dir):
-                self.status_callback("Cleaning up temporary optimized images...")
-                try:
-                    for f in os.listdir(temp_optimized_dir):
-                        os.remove(os.path.join(temp_optimized_dir, f))
-                    os.rmdir(temp_optimized_dir)
-                except Exception as e:
-                    self.status_callback(f"Warning: Could not cleanup temp directory: {e}")
+            if executor is not None:
+                executor.shutdown()
+
+        self._report_cache_stats()
+        self._report_page_classes()
+        if failed:
+            raise PdfWriteError(f"{len(failed)} of {len(volumes)} volumes failed: {', '.join(failed)}")
+
+        if not merge:
+            return volume_paths
+        pdf_path = os.path.join(output_folder, output_filename)
+        self.status_callback(f"Merging {len(volumes)} volumes into {pdf_path}...")
+        self._report_linearization()
+        merge_pdfs(volume_paths, pdf_path, linearize=self.linearize, status_callback=self.status_callback)
+        self.status_callback(f"PDF created successfully: {pdf_path}")
+        return [pdf_path] + volume_paths
+
+    def start_incremental_pdf(self, output_folder, output_filename,
+                              optimize_images=True, image_format="PNG", jpeg_quality=90,
+                              frame_store=None):
+        """
+        Start building a PDF that pages can be added to while capture is running
+
+        Args:
+            output_folder: Output directory
+            output_filename: PDF filename
+            optimize_images: Whether to optimize images (grayscale, resize)
+            image_format: One of ImageProcessing.SUPPORTED_FORMATS ("AUTO" = per page)
+            jpeg_quality: JPEG quality (0-100) if using JPEG format
+            frame_store: FrameStore the added page names refer to (None for file paths)
+
+        Returns:
+            IncrementalPdfBuild; call add() per page, then finish() or abort()
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        pdf_path = os.path.join(output_folder, output_filename)
+        self.status_callback(f"Building PDF incrementally: {pdf_path}")
+        return IncrementalPdfBuild(self, pdf_path, image_format, jpeg_quality,
+                                   frame_store=frame_store, optimize_images=optimize_images)
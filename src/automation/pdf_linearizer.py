@@ -0,0 +1,298 @@
+"""
+PDF linearization ("fast web view") module.
+Rewrites a finished StreamingPdfWriter file so that the first page, its
+objects and the hint tables come first. A viewer reading the file from the
+start (a tablet, a network share, a browser) can then show page 1 after
+reading only the first page's bytes, instead of seeking to the xref table
+at the end of a file of several hundred MB.
+
+The writer already knows every object's offset and which objects belong
+to which page, so no PDF parsing is needed: image and content streams are
+copied byte for byte with a new object number, and only the small page,
+page tree and catalog dictionaries have their references renumbered.
+
+Layout (PDF 1.7 Annex F):
+    header, linearization dictionary, first-page xref and trailer,
+    catalog, primary hint stream, first page (page object first),
+    remaining pages (page object first), page tree, main xref and trailer
+"""
+
+import hashlib
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.constants import PdfOutput
+
+_HEADER = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+
+
+class _Object:
+    """One object of the linearized file: new bytes, or a renumbered span of the source"""
+
+    __slots__ = ("number", "data", "source_start", "source_end", "header")
+
+    def __init__(self, number: int, data: Optional[bytes] = None,
+                 source_start: int = 0, source_end: int = 0):
+        self.number = number
+        self.data = data
+        self.source_start = source_start
+        self.source_end = source_end
+        self.header = b"%d 0 obj\n" % number
+
+    def __len__(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        return len(self.header) + self.source_end - self.source_start
+
+
+def _bits(value: int) -> int:
+    """Bits needed to store 0..value"""
+    return value.bit_length()
+
+
+class _BitWriter:
+    """Big-endian bit packer for the hint tables"""
+
+    def __init__(self):
+        self._bytes = bytearray()
+        self._value = 0
+        self._count = 0
+
+    def write(self, value: int, bits: int) -> None:
+        if bits == 0:
+            return
+        self._value = (self._value << bits) | value
+        self._count += bits
+        while self._count >= 8:
+            self._count -= 8
+            self._bytes.append((self._value >> self._count) & 0xFF)
+        self._value &= (1 << self._count) - 1
+
+    def align(self) -> None:
+        """Pad to a byte boundary (every hint table item column starts on one)"""
+        if self._count:
+            self.write(0, 8 - self._count)
+
+    def getvalue(self) -> bytes:
+        self.align()
+        return bytes(self._bytes)
+
+
+def _hint_stream_data(page_lengths: Sequence[int], page_object_counts: Sequence[int],
+                      first_page_offset: int, first_page_object_lengths: Sequence[int]) -> Tuple[bytes, int]:
+    """
+    Page offset and shared object hint tables
+
+    Pages share no objects (each page has its own image and content
+    stream), so the shared object table only lists the first page's
+    objects, as the specification requires. Content stream offsets are
+    not tracked; like qpdf, the content length is given as the page length.
+
+    Args:
+        page_lengths: Byte length of each page's objects
+        page_object_counts: Number of objects of each page
+        first_page_offset: Offset of the first page object, excluding the hint stream
+        first_page_object_lengths: Length of each object of the first page
+
+    Returns:
+        (uncompressed hint stream data, offset of the shared object table)
+    """
+    writer = _BitWriter()
+    min_objects, max_objects = min(page_object_counts), max(page_object_counts)
+    min_length, max_length = min(page_lengths), max(page_lengths)
+    objects_bits = _bits(max_objects - min_objects)
+    length_bits = _bits(max_length - min_length)
+
+    # Page offset hint table header
+    writer.write(min_objects, 32)
+    writer.write(first_page_offset, 32)
+    writer.write(objects_bits, 16)
+    writer.write(min_length, 32)
+    writer.write(length_bits, 16)
+    writer.write(0, 32)  # least content stream offset
+    writer.write(0, 16)
+    writer.write(min_length, 32)  # least content stream length
+    writer.write(length_bits, 16)
+    writer.write(0, 16)  # bits for the number of shared object references
+    writer.write(0, 16)  # bits for a shared object identifier
+    writer.write(0, 16)  # bits for a fraction numerator
+    writer.write(4, 16)  # fraction denominator (unused)
+    # Per-page entries, one column per item: object count, page length,
+    # shared references (none), content offset (zero bits), content length
+    for count in page_object_counts:
+        writer.write(count - min_objects, objects_bits)
+    writer.align()
+    for length in page_lengths:
+        writer.write(length - min_length, length_bits)
+    writer.align()
+    for length in page_lengths:
+        writer.write(length - min_length, length_bits)
+    writer.align()
+    page_table = writer.getvalue()
+
+    # Shared object hint table: one group per first page object
+    writer = _BitWriter()
+    min_group, max_group = min(first_page_object_lengths), max(first_page_object_lengths)
+    group_bits = _bits(max_group - min_group)
+    writer.write(0, 32)  # first object of the shared objects section (none)
+    writer.write(0, 32)  # its offset
+    writer.write(len(first_page_object_lengths), 32)
+    writer.write(len(first_page_object_lengths), 32)
+    writer.write(0, 16)  # bits for objects per group (always one)
+    writer.write(min_group, 32)
+    writer.write(group_bits, 16)
+    for length in first_page_object_lengths:
+        writer.write(length - min_group, group_bits)
+    writer.align()
+    for _ in first_page_object_lengths:
+        writer.write(0, 1)  # no MD5 signature
+    writer.align()
+    return page_table + writer.getvalue(), len(page_table)
+
+
+def _xref_entries(objects: Sequence[_Object], offsets: Dict[int, int]) -> bytes:
+    return b"".join(b"%010d 00000 n \n" % offsets[obj.number] for obj in objects)
+
+
+def linearize_pdf(source_path: str, target_path: str, offsets: Sequence[int],
+                  pages: Sequence[Tuple[int, int]], catalog: int, page_tree: int,
+                  end_offset: int) -> None:
+    """
+    Write a linearized copy of a PDF written by StreamingPdfWriter
+
+    Args:
+        source_path: Finished (non-linearized) PDF
+        target_path: Path of the linearized PDF
+        offsets: Offset of object n at index n - 1
+        pages: (first object, page object) of each page; a page's objects are
+            numbered consecutively and its page object is the last of them
+        catalog: Object number of the catalog
+        page_tree: Object number of the page tree root (its only node)
+        end_offset: Offset of the source's xref table (end of the last object)
+    """
+    # Each object ends where the next one written after it starts
+    starts = sorted(offsets)
+    ends = {start: end for start, end in zip(starts, starts[1:] + [end_offset])}
+    dictionaries = {catalog, page_tree}
+    dictionaries.update(page for _, page in pages)
+
+    # Renumber: remaining pages and the page tree first (main xref section),
+    # then the linearization dictionary, catalog, hint stream and first page
+    def page_order(first: int, page: int) -> List[int]:
+        return [page] + list(range(first, page))
+
+    main_order = [number for first, page in pages[1:] for number in page_order(first, page)]
+    main_order.append(page_tree)
+    first_page_order = page_order(*pages[0])
+    renumber = {old: new for new, old in enumerate(main_order, 1)}
+    main_count = len(main_order)
+    linearization_number = main_count + 1
+    renumber[catalog] = main_count + 2
+    hint_number = main_count + 3
+    renumber.update((old, new) for new, old in enumerate(first_page_order, main_count + 4))
+    size = main_count + 4 + len(first_page_order)
+
+    with open(source_path, "rb") as source:
+        def build(old: int) -> _Object:
+            new = renumber[old]
+            start = offsets[old - 1] + len(b"%d 0 obj\n" % old)
+            end = ends[offsets[old - 1]]
+            if old not in dictionaries:
+                return _Object(new, source_start=start, source_end=end)
+            source.seek(start)
+            body = _REFERENCE.sub(lambda m: b"%d 0 R" % renumber[int(m.group(1))],
+                                  source.read(end - start))
+            return _Object(new, data=b"%d 0 obj\n" % new + body)
+
+        main_objects = [build(old) for old in main_order]
+        catalog_object = build(catalog)
+        first_page_objects = [build(old) for old in first_page_order]
+
+        # Part sizes before the hint stream do not depend on any value
+        # written into them: numbers in the dictionary and trailer are padded
+        file_id = hashlib.md5(b"%s %d %f" % (os.path.basename(target_path).encode("utf-8"),
+                                             end_offset, time.time())).hexdigest().encode("ascii")
+        id_entry = b"/ID [<%s> <%s>]" % (file_id, file_id)
+
+        def linearization_dictionary(length: int, hint: Tuple[int, int], first_page_end: int,
+                                     main_xref_entry: int) -> bytes:
+            return (b"%d 0 obj\n<< /Linearized 1 /L %010d /H [ %010d %010d ] /O %d /E %010d "
+                    b"/N %d /T %010d >>\nendobj\n" % (
+                        linearization_number, length, hint[0], hint[1],
+                        renumber[pages[0][1]], first_page_end, len(pages), main_xref_entry))
+
+        def first_page_xref(entry_offsets: Dict[int, int], main_xref: int) -> bytes:
+            entries = _xref_entries([_Object(linearization_number), catalog_object,
+                                     _Object(hint_number)] + first_page_objects, entry_offsets)
+            return (b"xref\n%d %d\n%s" % (linearization_number, size - linearization_number, entries) +
+                    b"trailer\n<< /Size %d /Root %d 0 R /Prev %010d %s >>\nstartxref\n0\n%%%%EOF\n" % (
+                        size, renumber[catalog], main_xref, id_entry))
+
+        linearization_offset = len(_HEADER)
+        first_xref_offset = linearization_offset + len(linearization_dictionary(0, (0, 0), 0, 0))
+        placeholder_offsets = dict.fromkeys(range(linearization_number, size), 0)
+        catalog_offset = first_xref_offset + len(first_page_xref(placeholder_offsets, 0))
+        hint_offset = catalog_offset + len(catalog_object)
+
+        # Hint tables give offsets as if the hint stream were absent
+        page_lengths = [sum(len(obj) for obj in first_page_objects)]
+        page_object_counts = [len(first_page_objects)]
+        position = 0
+        for first, page in pages[1:]:
+            count = page - first + 1
+            page_object_counts.append(count)
+            page_lengths.append(sum(len(obj) for obj in main_objects[position:position + count]))
+            position += count
+        hint_data, shared_table_offset = _hint_stream_data(
+            page_lengths, page_object_counts, hint_offset, [len(obj) for obj in first_page_objects]
+        )
+        hint_stream = zlib.compress(hint_data, PdfOutput.FLATE_LEVEL)
+        hint_object = (b"%d 0 obj\n<< /Filter /FlateDecode /S %d /Length %d >>\nstream\n" % (
+            hint_number, shared_table_offset, len(hint_stream)) + hint_stream + b"\nendstream\nendobj\n")
+
+        object_offsets = {linearization_number: linearization_offset,
+                          renumber[catalog]: catalog_offset, hint_number: hint_offset}
+        position = hint_offset + len(hint_object)
+        for obj in first_page_objects:
+            object_offsets[obj.number] = position
+            position += len(obj)
+        first_page_end = position
+        for obj in main_objects:
+            object_offsets[obj.number] = position
+            position += len(obj)
+        main_xref_offset = position
+        main_xref_head = b"xref\n0 %d" % (main_count + 1)
+        main_xref = (main_xref_head + b"\n0000000000 65535 f \n" + _xref_entries(main_objects, object_offsets) +
+                     b"trailer\n<< /Size %d %s >>\nstartxref\n%d\n%%%%EOF\n" % (
+                         main_count + 1, id_entry, first_xref_offset))
+        length = main_xref_offset + len(main_xref)
+
+        with open(target_path, "wb") as target:
+            target.write(_HEADER)
+            target.write(linearization_dictionary(
+                length, (hint_offset, len(hint_object)), first_page_end,
+                main_xref_offset + len(main_xref_head)
+            ))
+            target.write(first_page_xref(object_offsets, main_xref_offset))
+            target.write(catalog_object.data)
+            target.write(hint_object)
+            for obj in first_page_objects + main_objects:
+                if obj.data is not None:
+                    target.write(obj.data)
+                    continue
+                target.write(obj.header)
+                source.seek(obj.source_start)
+                remaining = obj.source_end - obj.source_start
+                while remaining:
+                    chunk = source.read(min(remaining, PdfOutput.COPY_CHUNK_SIZE))
+                    if not chunk:
+                        raise EOFError(f"{source_path} ends inside object {obj.number}")
+                    target.write(chunk)
+                    remaining -= len(chunk)
+            target.write(main_xref)
+            if target.tell() != length:
+                raise RuntimeError(f"Linearized PDF length mismatch ({target.tell()} != {length})")
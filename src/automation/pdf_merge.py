@@ -0,0 +1,172 @@
+"""
+PDF merge module.
+Concatenates PDFs written by StreamingPdfWriter (plain or linearized), e.g.
+the volumes of a long book, into one PDF. Each page's image and content
+streams are copied as they are, so merging costs about as much as copying
+the files: nothing is decoded or re-encoded.
+
+Only the structure StreamingPdfWriter writes is read (a flat page tree of
+pages that draw image XObjects, classic xref tables); other PDFs are
+rejected with PdfWriteError.
+"""
+
+import re
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.automation.pdf_writer import PdfWriteError, StreamingPdfWriter
+from src.constants import PdfOutput
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_XREF_ENTRY = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+_READ_SIZE = 64 * 1024
+
+# (width, height) in points, [(XObject dictionary, stream data)], content stream
+CopiedPage = Tuple[Tuple[float, float], List[Tuple[bytes, bytes]], str]
+
+
+def _read_until(f: BinaryIO, offset: int, marker: bytes) -> bytes:
+    """Bytes from offset up to and including the first marker"""
+    f.seek(offset)
+    data = b""
+    while True:
+        chunk = f.read(_READ_SIZE)
+        data += chunk
+        end = data.find(marker)
+        if end >= 0:
+            return data[:end + len(marker)]
+        if not chunk:
+            raise PdfWriteError(f"Unexpected end of file looking for {marker!r}")
+
+
+def _read_xref(f: BinaryIO) -> Tuple[Dict[int, int], int]:
+    """(offset of every object, catalog object number) from the xref sections"""
+    f.seek(0, 2)
+    size = f.tell()
+    f.seek(max(0, size - 1024))
+    found = _STARTXREF.findall(f.read())
+    if not found:
+        raise PdfWriteError("No startxref found")
+    offset: Optional[int] = int(found[-1])
+    offsets: Dict[int, int] = {}
+    root = None
+    while offset is not None:
+        section = _read_until(f, offset, b"startxref")
+        if not section.startswith(b"xref"):
+            raise PdfWriteError("Only classic xref tables are supported")
+        table, _, trailer = section.partition(b"trailer")
+        number = None
+        for line in table.splitlines()[1:]:
+            entry = _XREF_ENTRY.match(line)
+            if entry is None:
+                first, _ = line.split()
+                number = int(first)
+                continue
+            if entry.group(3) == b"n":
+                # Sections read later are older; the newest entry wins
+                offsets.setdefault(number, int(entry.group(1)))
+            number += 1
+        root_match = re.search(rb"/Root (\d+) 0 R", trailer)
+        if root is None and root_match:
+            root = int(root_match.group(1))
+        prev = re.search(rb"/Prev (\d+)", trailer)
+        offset = int(prev.group(1)) if prev else None
+    if root is None:
+        raise PdfWriteError("No /Root in the trailer")
+    return offsets, root
+
+
+def _read_object(f: BinaryIO, offsets: Dict[int, int], number: int) -> Tuple[bytes, Optional[bytes]]:
+    """(dictionary, stream data or None) of an object"""
+    if number not in offsets:
+        raise PdfWriteError(f"Object {number} is missing from the xref table")
+    header = b"%d 0 obj\n" % number
+    start = offsets[number] + len(header)
+    f.seek(offsets[number])
+    if f.read(len(header)) != header:
+        raise PdfWriteError(f"Object {number} is not at its xref offset")
+    data = b""
+    while True:
+        chunk = f.read(_READ_SIZE)
+        data += chunk
+        stream = data.find(b"\nstream\n")
+        end = data.find(b"\nendobj")
+        if stream >= 0 and (end < 0 or stream < end):
+            dictionary = data[:stream]
+            length = re.search(rb"/Length (\d+)", dictionary)
+            if length is None:
+                raise PdfWriteError(f"Stream object {number} has no direct /Length")
+            f.seek(start + stream + len(b"\nstream\n"))
+            return dictionary, f.read(int(length.group(1)))
+        if end >= 0:
+            return data[:end], None
+        if not chunk:
+            raise PdfWriteError(f"Object {number} has no endobj")
+
+
+def read_pdf_pages(pdf_path: str) -> Iterator[CopiedPage]:
+    """
+    Pages of a PDF written by StreamingPdfWriter, in order
+
+    Args:
+        pdf_path: PDF to read
+
+    Yields:
+        (page size, [(XObject dictionary, stream data)] in /Im0, /Im1, ... order,
+        content stream), as StreamingPdfWriter.add_copied_page() takes them
+
+    Raises:
+        PdfWriteError: If the file does not have the structure StreamingPdfWriter writes
+    """
+    with open(pdf_path, "rb") as f:
+        offsets, root = _read_xref(f)
+        catalog, _ = _read_object(f, offsets, root)
+        pages_ref = re.search(rb"/Pages (\d+) 0 R", catalog)
+        if pages_ref is None:
+            raise PdfWriteError(f"{pdf_path}: catalog has no /Pages")
+        pages, _ = _read_object(f, offsets, int(pages_ref.group(1)))
+        kids = re.search(rb"/Kids \[([^\]]*)\]", pages)
+        if kids is None:
+            raise PdfWriteError(f"{pdf_path}: page tree has no /Kids")
+
+        for kid in _REFERENCE.findall(kids.group(1)):
+            page, _ = _read_object(f, offsets, int(kid))
+            media_box = re.search(rb"/MediaBox \[0 0 ([\d.]+) ([\d.]+)\]", page)
+            contents_ref = re.search(rb"/Contents (\d+) 0 R", page)
+            if not page.startswith(b"<< /Type /Page ") or media_box is None or contents_ref is None:
+                raise PdfWriteError(f"{pdf_path}: page object {int(kid)} was not written by StreamingPdfWriter")
+            images = []
+            for _, image_ref in sorted((int(index), int(ref)) for index, ref in
+                                       re.findall(rb"/Im(\d+) (\d+) 0 R", page)):
+                dictionary, data = _read_object(f, offsets, image_ref)
+                if data is None:
+                    raise PdfWriteError(f"{pdf_path}: XObject {image_ref} is not a stream")
+                images.append((dictionary, data))
+            _, contents = _read_object(f, offsets, int(contents_ref.group(1)))
+            yield ((float(media_box.group(1)), float(media_box.group(2))), images,
+                   (contents or b"").decode("latin-1"))
+
+
+def merge_pdfs(pdf_paths: Sequence[str], output_path: str,
+               linearize: bool = PdfOutput.LINEARIZE,
+               status_callback: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Concatenate the pages of PDFs written by StreamingPdfWriter
+
+    Args:
+        pdf_paths: PDFs in page order
+        output_path: Path of the merged PDF
+        linearize: Write the merged PDF linearized
+        status_callback: Function for status messages
+
+    Returns:
+        output_path
+
+    Raises:
+        PdfWriteError: If an input cannot be read (no partial output is left)
+    """
+    with StreamingPdfWriter(output_path, linearize=linearize, status_callback=status_callback) as writer:
+        for pdf_path in pdf_paths:
+            for page_size, images, contents in read_pdf_pages(pdf_path):
+                writer.add_copied_page(page_size, images, contents)
+    return output_path
@@ -0,0 +1,428 @@
+"""
+Streaming PDF writer.
+Appends one image page at a time to the output file and keeps only the
+object offsets in memory, so memory use does not grow with the book length.
+MRC pages (see mrc.py) are written as a background image with a stencil
+mask painted over it. With linearize, the finished file is rewritten for
+fast web view (see pdf_linearizer.py).
+"""
+
+import io
+import os
+import struct
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image, TiffImagePlugin
+
+from src.automation.mrc import MrcLayers, is_mrc_data, unpack_layers
+from src.automation.pdf_linearizer import linearize_pdf
+from src.callback_utils import get_callback_or_default
+from src.constants import PdfOutput
+from src.frame_file import decode_frame, is_frame_data
+
+
+class PdfWriteError(Exception):
+    """Raised when a page cannot be embedded or the PDF cannot be written"""
+    pass
+
+
+class PdfImage:
+    """An image ready to be embedded as a PDF image XObject"""
+
+    def __init__(self, width: int, height: int, color_space: str, bits: int,
+                 filter_name: str, data: bytes, decode_parms: Optional[str] = None,
+                 dpi: Tuple[float, float] = (PdfOutput.DEFAULT_DPI, PdfOutput.DEFAULT_DPI)):
+        """
+        Args:
+            width, height: Size in pixels
+            color_space: PDF color space (e.g. "/DeviceGray" or an /Indexed array)
+            bits: BitsPerComponent
+            filter_name: Stream filter (e.g. "/DCTDecode", "/FlateDecode")
+            data: Encoded stream data
+            decode_parms: Optional DecodeParms dictionary
+            dpi: Resolution used to size the page
+        """
+        self.width = width
+        self.height = height
+        self.color_space = color_space
+        self.bits = bits
+        self.filter_name = filter_name
+        self.data = data
+        self.decode_parms = decode_parms
+        self.dpi = dpi
+
+    @staticmethod
+    def _dpi(img: Image.Image) -> Tuple[float, float]:
+        dpi = img.info.get("dpi")
+        if not dpi or not dpi[0] or not dpi[1]:
+            return (PdfOutput.DEFAULT_DPI, PdfOutput.DEFAULT_DPI)
+        return (float(dpi[0]), float(dpi[1]))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PdfImage":
+        """
+        Wrap an encoded image, passing JPEG and PNG data through without re-encoding
+
+        JPEG is embedded as DCTDecode. Non-interlaced PNG is embedded by copying
+        its IDAT stream with PNG predictor DecodeParms. Single-strip CCITT G4
+        TIFF is embedded as CCITTFaxDecode. Anything else (including
+        intermediate frame files) is decoded and stored as a raw Flate stream.
+
+        Args:
+            data: Encoded image file contents
+
+        Returns:
+            PdfImage
+        """
+        if data[:2] == b"\xff\xd8":
+            with Image.open(io.BytesIO(data)) as img:
+                color_space = {"L": "/DeviceGray", "RGB": "/DeviceRGB"}.get(img.mode)
+                if color_space is not None:
+                    return cls(img.width, img.height, color_space, 8, "/DCTDecode", data,
+                               dpi=cls._dpi(img))
+        elif data[:8] == b"\x89PNG\r\n\x1a\n":
+            image = cls._from_png(data)
+            if image is not None:
+                return image
+        elif data[:4] in (b"II*\x00", b"MM\x00*"):
+            image = cls._from_tiff_g4(data)
+            if image is not None:
+                return image
+        elif is_frame_data(data):
+            return cls.from_pil(decode_frame(data))
+
+        with Image.open(io.BytesIO(data)) as img:
+            return cls.from_pil(img)
+
+    @classmethod
+    def _from_png(cls, data: bytes) -> Optional["PdfImage"]:
+        """IDAT passthrough for PNG layouts PDF's Flate predictor can express"""
+        pos = 8
+        header = None
+        palette = None
+        idat = []
+        dpi = (PdfOutput.DEFAULT_DPI, PdfOutput.DEFAULT_DPI)
+        while pos + 8 <= len(data):
+            length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+            body = data[pos + 8:pos + 8 + length]
+            pos += 12 + length
+            if chunk_type == b"IHDR":
+                header = struct.unpack(">IIBBBBB", body)
+            elif chunk_type == b"PLTE":
+                palette = body
+            elif chunk_type == b"IDAT":
+                idat.append(body)
+            elif chunk_type == b"pHYs":
+                ppu_x, ppu_y, unit = struct.unpack(">IIB", body)
+                if unit == 1 and ppu_x and ppu_y:
+                    dpi = (ppu_x * 0.0254, ppu_y * 0.0254)
+            elif chunk_type == b"IEND":
+                break
+        if header is None or not idat:
+            return None
+
+        width, height, bits, color_type, _, _, interlace = header
+        if interlace or bits == 16:
+            return None
+        if color_type == 0:
+            color_space, colors = "/DeviceGray", 1
+        elif color_type == 2:
+            color_space, colors = "/DeviceRGB", 3
+        elif color_type == 3 and palette:
+            color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+            colors = 1
+        else:
+            # Alpha channels cannot be passed through
+            return None
+        decode_parms = (f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bits} "
+                        f"/Columns {width} >>")
+        return cls(width, height, color_space, bits, "/FlateDecode", b"".join(idat),
+                   decode_parms=decode_parms, dpi=dpi)
+
+    @classmethod
+    def _from_tiff_g4(cls, data: bytes) -> Optional["PdfImage"]:
+        """Strip passthrough for single-strip bilevel TIFF with Group 4 compression"""
+        with Image.open(io.BytesIO(data)) as img:
+            tags = img.tag_v2
+            offsets = tags.get(TiffImagePlugin.STRIPOFFSETS)
+            counts = tags.get(TiffImagePlugin.STRIPBYTECOUNTS)
+            photometric = tags.get(TiffImagePlugin.PHOTOMETRIC_INTERPRETATION)
+            if (tags.get(TiffImagePlugin.COMPRESSION) != 4 or img.mode != "1" or
+                    not offsets or len(offsets) != 1 or photometric not in (0, 1) or
+                    tags.get(TiffImagePlugin.FILLORDER, 1) != 1):
+                return None
+            width, height = img.size
+            dpi = cls._dpi(img)
+        strip = data[offsets[0]:offsets[0] + counts[0]]
+        # CCITT codes "white" runs as 0 bits; libtiff inverts them for BlackIsZero (1)
+        black_is_1 = "true" if photometric == 1 else "false"
+        decode_parms = f"<< /K -1 /Columns {width} /Rows {height} /BlackIs1 {black_is_1} >>"
+        return cls(width, height, "/DeviceGray", 1, "/CCITTFaxDecode", strip,
+                   decode_parms=decode_parms, dpi=dpi)
+
+    @classmethod
+    def from_pil(cls, img: Image.Image) -> "PdfImage":
+        """
+        Store a PIL image as a raw Flate stream
+
+        Args:
+            img: Image in any mode (converted to L or RGB)
+        """
+        dpi = cls._dpi(img)
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("L" if img.mode in ("1", "LA", "I", "I;16", "F") else "RGB")
+        color_space = "/DeviceGray" if img.mode == "L" else "/DeviceRGB"
+        data = zlib.compress(img.tobytes(), PdfOutput.FLATE_LEVEL)
+        return cls(img.width, img.height, color_space, 8, "/FlateDecode", data, dpi=dpi)
+
+
+class StreamingPdfWriter:
+    """
+    Writes an image-per-page PDF incrementally.
+
+    Every add_*() call appends the page's image XObject, content stream and
+    page object to the file immediately; only the byte offset of each object
+    and the page object numbers are kept. close() writes the page tree, xref table and trailer. The file
+    is written under a ".part" name and renamed into place on close(), so an
+    interrupted run never leaves a truncated file under the final name.
+
+    A page's objects are numbered consecutively and its page object is the
+    last of them, which is all the linearization pass needs to know.
+    """
+
+    # Object 1 is the catalog, object 2 the page tree; pages use the following objects
+    _CATALOG = 1
+    _PAGES = 2
+
+    def __init__(self, pdf_path: str, linearize: bool = False,
+                 status_callback: Optional[Callable[[str], None]] = None):
+        """
+        Open the output file and write the PDF header
+
+        Args:
+            pdf_path: Final path of the PDF
+            linearize: Rewrite the file for fast web view on close()
+            status_callback: Function for status messages
+        """
+        self.pdf_path = pdf_path
+        self.temp_path = pdf_path + ".part"
+        self.linearize = linearize
+        self.status_callback = get_callback_or_default(status_callback, "PDF")
+        self._file = open(self.temp_path, "wb")
+        self._offsets: List[int] = []  # offset of object n at index n - 1
+        self._page_objects: List[int] = []
+        self._page_first_objects: List[int] = []
+        self.page_count = 0
+        self.bytes_written = 0
+        self._closed = False
+
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(self._CATALOG, b"<< /Type /Catalog /Pages 2 0 R >>")
+        # Placeholder slot; the page tree is written by close()
+        self._offsets.append(0)
+
+    def _write_object(self, number: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        if number == len(self._offsets) + 1:
+            self._offsets.append(self._file.tell())
+        else:
+            self._offsets[number - 1] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number)
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def _next_object(self) -> int:
+        return len(self._offsets) + 1
+
+    def _write_xobject(self, body: bytes, data: bytes) -> int:
+        """Write an XObject stream of the current page and return its object number"""
+        number = self._next_object()
+        if len(self._page_first_objects) == self.page_count:
+            self._page_first_objects.append(number)
+        self._write_object(number, body, data)
+        return number
+
+    def _write_image(self, image: PdfImage, mask: bool = False) -> int:
+        """Write an image XObject (a stencil mask if mask) and return its object number"""
+        xobject = f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+        if mask:
+            xobject += "/ImageMask true /BitsPerComponent 1 "
+        else:
+            xobject += f"/ColorSpace {image.color_space} /BitsPerComponent {image.bits} "
+        xobject += f"/Filter {image.filter_name} "
+        if image.decode_parms:
+            xobject += f"/DecodeParms {image.decode_parms} "
+        xobject += f"/Length {len(image.data)} >>"
+        return self._write_xobject(xobject.encode("latin-1"), image.data)
+
+    def _write_page(self, page_size: Tuple[float, float], images: List[int], contents: str) -> None:
+        """Write the content stream and page object using images as /Im0, /Im1, ..."""
+        contents_number = self._next_object()
+        data = contents.encode("latin-1")
+        self._write_object(contents_number, b"<< /Length %d >>" % len(data), data)
+
+        page_number = self._next_object()
+        xobjects = " ".join(f"/Im{i} {number} 0 R" for i, number in enumerate(images))
+        page = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_size[0]:.4f} {page_size[1]:.4f}] "
+                f"/Resources << /XObject << {xobjects} >> >> "
+                f"/Contents {contents_number} 0 R >>")
+        self._write_object(page_number, page.encode("latin-1"))
+        self._page_objects.append(page_number)
+        self.page_count += 1
+        self.bytes_written = self._file.tell()
+
+    def add_image(self, image: PdfImage) -> None:
+        """
+        Append a page showing one image at its native size
+
+        Args:
+            image: Encoded image from PdfImage
+
+        Raises:
+            PdfWriteError: If the writer is closed
+        """
+        if self._closed:
+            raise PdfWriteError("PDF writer is already closed")
+        page_width = image.width * 72.0 / image.dpi[0]
+        page_height = image.height * 72.0 / image.dpi[1]
+        image_number = self._write_image(image)
+        self._write_page(
+            (page_width, page_height), [image_number],
+            f"q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q"
+        )
+
+    def add_layered_page(self, layers: MrcLayers) -> None:
+        """
+        Append an MRC page: the background stretched over the page, then the
+        text mask painted in the text colour
+
+        The page is sized from the mask, which has the full resolution.
+
+        Args:
+            layers: Layers from mrc.unpack_layers()
+
+        Raises:
+            PdfWriteError: If the writer is closed or the mask is not single-strip G4
+        """
+        if self._closed:
+            raise PdfWriteError("PDF writer is already closed")
+        mask = PdfImage._from_tiff_g4(layers.mask)
+        if mask is None:
+            raise PdfWriteError("MRC text mask is not a single-strip G4 TIFF")
+        background = PdfImage.from_bytes(layers.background)
+        page_width = mask.width * 72.0 / mask.dpi[0]
+        page_height = mask.height * 72.0 / mask.dpi[1]
+
+        background_number = self._write_image(background)
+        mask_number = self._write_image(mask, mask=True)
+        red, green, blue = (component / 255.0 for component in layers.color)
+        placement = f"{page_width:.4f} 0 0 {page_height:.4f} 0 0 cm"
+        self._write_page(
+            (page_width, page_height), [background_number, mask_number],
+            f"q {placement} /Im0 Do Q q {red:.3f} {green:.3f} {blue:.3f} rg {placement} /Im1 Do Q"
+        )
+
+    def add_copied_page(self, page_size: Tuple[float, float], images: List[Tuple[bytes, bytes]],
+                        contents: str) -> None:
+        """
+        Append a page copied from another PDF (see pdf_merge.py) without re-encoding
+
+        Args:
+            page_size: (width, height) in points
+            images: (XObject dictionary, stream data) of /Im0, /Im1, ...
+            contents: Content stream drawing them
+
+        Raises:
+            PdfWriteError: If the writer is closed
+        """
+        if self._closed:
+            raise PdfWriteError("PDF writer is already closed")
+        numbers = [self._write_xobject(body, data) for body, data in images]
+        self._write_page(page_size, numbers, contents)
+
+    def add_image_bytes(self, data: bytes) -> None:
+        """Append a page from encoded image bytes (JPEG/PNG passthrough, MRC layers)"""
+        if is_mrc_data(data):
+            self.add_layered_page(unpack_layers(data))
+        else:
+            self.add_image(PdfImage.from_bytes(data))
+
+    def close(self) -> str:
+        """
+        Write the page tree, xref table and trailer, then move the file into
+        place (linearized if the writer was created with linearize)
+
+        Returns:
+            Path of the finished PDF
+
+        Raises:
+            PdfWriteError: If no page was added
+        """
+        if self._closed:
+            return self.pdf_path
+        if self.page_count == 0:
+            self.abort()
+            raise PdfWriteError("Cannot write a PDF without pages")
+
+        kids = " ".join(f"{number} 0 R" for number in self._page_objects)
+        self._write_object(
+            self._PAGES,
+            f"<< /Type /Pages /Kids [{kids}] /Count {self.page_count} >>".encode("latin-1")
+        )
+
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n" % (len(self._offsets) + 1))
+        self._file.write(b"0000000000 65535 f \n")
+        for offset in self._offsets:
+            self._file.write(b"%010d 00000 n \n" % offset)
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(self._offsets) + 1))
+        self._file.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+        self._file.close()
+        self._closed = True
+        if self.linearize:
+            self._linearize(xref_offset)
+        else:
+            os.replace(self.temp_path, self.pdf_path)
+        return self.pdf_path
+
+    def _linearize(self, xref_offset: int) -> None:
+        """
+        Write the linearized copy next to the ".part" file, then swap it into place.
+        If that fails, the finished non-linearized file is kept instead.
+        """
+        linearized_path = self.pdf_path + ".linearized.part"
+        try:
+            linearize_pdf(
+                self.temp_path, linearized_path, self._offsets,
+                list(zip(self._page_first_objects, self._page_objects)),
+                self._CATALOG, self._PAGES, xref_offset
+            )
+        except Exception as e:
+            if os.path.exists(linearized_path):
+                os.remove(linearized_path)
+            os.replace(self.temp_path, self.pdf_path)
+            self.status_callback(f"Warning: Could not linearize {self.pdf_path}, kept the plain PDF: {e}")
+            return
+        os.replace(linearized_path, self.pdf_path)
+        os.remove(self.temp_path)
+
+    def abort(self) -> None:
+        """Discard the partial file"""
+        if not self._closed:
+            self._closed = True
+            self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,118 @@
+"""
+Page resampling module.
+Decodes a captured page into a NumPy array and scales it to the page
+width, converting to grayscale in the same step. Three engines are
+available (ImageProcessing.RESAMPLER):
+
+    "lanczos"  Pillow LANCZOS on the full-resolution page (reference quality)
+    "reduce"   Pillow reduce() by the integer part of the scale (box filter),
+               then a light BICUBIC pass for the remainder
+    "area"     OpenCV INTER_AREA on the NumPy array
+
+"reduce" and "area" convert to grayscale after downscaling, so only the
+small page is converted. Frame files are read straight into an array
+without building a PIL image. JPEG input is decoded at reduced size
+(Pillow draft mode) when the page is scaled down anyway.
+benchmarks/resampling.py measures their speed and quality against LANCZOS.
+"""
+
+import io
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.constants import ImageProcessing
+from src.frame_file import decode_frame_array, is_frame_data
+
+RESAMPLERS = ("lanczos", "reduce", "area")
+
+
+def decode_pixels(data: Union[bytes, np.ndarray], min_width: Optional[int] = None,
+                  resampler: str = ImageProcessing.RESAMPLER) -> np.ndarray:
+    """
+    Captured page as a uint8 array
+
+    Args:
+        data: Frame file, any image format Pillow reads, or an already decoded
+            array (returned as is)
+        min_width: Width the page will be scaled to; JPEG input is decoded at
+            the smallest draft size at least this wide (not with "lanczos")
+        resampler: One of RESAMPLERS
+
+    Returns:
+        (height, width) grayscale, (height, width, 4) BGRA or (height, width, 3) RGB
+    """
+    if isinstance(data, np.ndarray):
+        return data
+    if is_frame_data(data):
+        return decode_frame_array(data)
+    with Image.open(io.BytesIO(data)) as img:
+        if min_width and resampler != "lanczos" and img.format == "JPEG" and img.width > min_width:
+            img.draft(img.mode, (min_width, img.height * min_width // img.width))
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("L" if img.mode in ("1", "LA", "I", "I;16", "F") else "RGB")
+        return np.asarray(img)
+
+
+def _to_image(pixels: np.ndarray) -> Image.Image:
+    if pixels.ndim == 2:
+        return Image.fromarray(pixels)
+    if pixels.shape[2] == 4:
+        height, width = pixels.shape[:2]
+        return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(pixels), "raw", "BGRX", 0, 1)
+    return Image.fromarray(pixels)
+
+
+def _convert(pixels: np.ndarray, color: bool) -> np.ndarray:
+    """Grayscale plane, or RGB array if color"""
+    if pixels.ndim == 2:
+        return pixels
+    if pixels.shape[2] == 4:
+        return cv2.cvtColor(pixels, cv2.COLOR_BGRA2RGB if color else cv2.COLOR_BGRA2GRAY)
+    return pixels if color else cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+
+
+def target_size(width: int, height: int, max_width: int) -> Tuple[int, int]:
+    """(width, height) scaled down to at most max_width wide, keeping the aspect ratio"""
+    if width <= max_width:
+        return width, height
+    return max_width, int(height * (max_width / float(width)))
+
+
+def resample(pixels: np.ndarray, max_width: int, color: bool = False,
+             resampler: str = ImageProcessing.RESAMPLER) -> np.ndarray:
+    """
+    Scale a page down to at most max_width pixels wide and convert it
+
+    Args:
+        pixels: Array from decode_pixels()
+        max_width: Width limit
+        color: Return RGB instead of grayscale
+        resampler: One of RESAMPLERS
+
+    Returns:
+        uint8 grayscale plane, or (height, width, 3) RGB array if color
+    """
+    height, width = pixels.shape[:2]
+    size = target_size(width, height, max_width)
+    if resampler == "lanczos":
+        img = _to_image(pixels).convert("RGB" if color else "L")
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+        return np.asarray(img)
+    if size == (width, height):
+        return _convert(pixels, color)
+    if resampler == "reduce":
+        img = _to_image(pixels)
+        factor = width // size[0]
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.convert("RGB" if color else "L")
+        if img.size != size:
+            img = img.resize(size, Image.BICUBIC)
+        return np.asarray(img)
+    if resampler == "area":
+        return _convert(cv2.resize(pixels, size, interpolation=cv2.INTER_AREA), color)
+    raise ValueError(f"Unknown resampler: {resampler}")
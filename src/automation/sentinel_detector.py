@@ -0,0 +1,262 @@
+"""
+Sentinel-patch page change detector.
+Polls a few small, text-dense patches of the book region instead of the whole
+region, and grabs the full region only once those patches have changed and
+settled.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.constants import PageDetection, SentinelDetection
+from src.frame import Frame
+from src.image_hasher import ImageHasher
+
+# (x, y, width, height) relative to the book region
+PatchRect = Tuple[int, int, int, int]
+
+
+def choose_sentinels(
+    gray: np.ndarray,
+    count: int = SentinelDetection.PATCH_COUNT,
+    patch_width: int = SentinelDetection.PATCH_WIDTH,
+    patch_height: int = SentinelDetection.PATCH_HEIGHT,
+    min_stddev: float = SentinelDetection.MIN_PATCH_STDDEV
+) -> List[PatchRect]:
+    """
+    Pick the most text-dense patches of a page from its variance map
+
+    The plane is tiled into patch-sized cells and the highest-variance cells
+    are picked, at most one per row of cells so the sentinels spread over
+    the page height.
+
+    Args:
+        gray: Grayscale plane of the book region
+        count: Number of patches
+        patch_width: Patch width in pixels (clamped to the plane)
+        patch_height: Patch height in pixels (clamped to the plane)
+        min_stddev: Cells flatter than this are only used if nothing else is left
+
+    Returns:
+        List of (x, y, width, height) rects relative to the plane
+    """
+    height, width = gray.shape
+    patch_width = max(1, min(patch_width, width))
+    patch_height = max(1, min(patch_height, height))
+    rows, cols = height // patch_height, width // patch_width
+    tiles = gray[:rows * patch_height, :cols * patch_width].astype(np.float32)
+    tiles = tiles.reshape(rows, patch_height, cols, patch_width)
+    stddev = tiles.std(axis=(1, 3))
+
+    order = np.argsort(stddev, axis=None)[::-1]
+    chosen: List[PatchRect] = []
+    used_rows = set()
+    fallback: List[PatchRect] = []
+    for flat in order:
+        row, col = divmod(int(flat), cols)
+        rect = (col * patch_width, row * patch_height, patch_width, patch_height)
+        if row in used_rows:
+            continue
+        if stddev[row, col] < min_stddev:
+            fallback.append(rect)
+            continue
+        chosen.append(rect)
+        used_rows.add(row)
+        if len(chosen) == count:
+            break
+    chosen.extend(fallback[:count - len(chosen)])
+    return chosen
+
+
+def _patch_diff(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference of two patches in gray levels"""
+    return cv2.mean(cv2.absdiff(a, b))[0]
+
+
+class SentinelChangeDetector:
+    """
+    Page change detector that samples sentinel patches at a high rate.
+
+    A page counts as turning once any sentinel patch differs from the
+    previous page by more than change_threshold gray levels; it has settled
+    once all patches stay within settle_threshold for settle_samples samples.
+    Only then is the full region grabbed and hashed.
+
+    Changes outside the sentinels are caught by a full-region check every
+    full_check_interval samples, and a full grab at the timeout, so the
+    worst case matches PageTurnWaiter. wait() has the same signature and
+    statistics as PageTurnWaiter.wait(), so it can be used in its place.
+    """
+
+    def __init__(
+        self,
+        grab_func: Callable[[Dict[str, int]], Frame],
+        region: Dict[str, int],
+        hash_func: Callable[[Any], Tuple[float, int]] = ImageHasher.hash_image,
+        poll_interval: float = SentinelDetection.POLL_INTERVAL,
+        settle_samples: int = SentinelDetection.SETTLE_SAMPLES,
+        timeout: float = SentinelDetection.TIMEOUT,
+        change_threshold: float = SentinelDetection.CHANGE_THRESHOLD,
+        settle_threshold: float = SentinelDetection.SETTLE_THRESHOLD,
+        hash_change_threshold: float = PageDetection.HASH_DIFF_THRESHOLD,
+        full_check_interval: int = SentinelDetection.FULL_CHECK_INTERVAL,
+        patch_count: int = SentinelDetection.PATCH_COUNT,
+        stop_event=None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            grab_func: Function capturing a region dict (e.g. FrameSource.grab)
+            region: Book region ('left', 'top', 'width', 'height')
+            hash_func: Function hashing the full-region capture
+            poll_interval: Seconds between sentinel samples
+            settle_samples: Consecutive unchanged samples required after the change
+            timeout: Maximum seconds to wait before giving up
+            change_threshold: Patch difference (gray levels) that counts as a change
+            settle_threshold: Patch difference below which two samples are identical
+            hash_change_threshold: Hash diff used by the full-region checks
+            full_check_interval: Samples between full-region checks (0 disables)
+            patch_count: Number of sentinel patches
+            stop_event: Optional threading.Event that aborts the wait when set
+            clock: Time function
+            sleep: Sleep function
+        """
+        self.grab_func = grab_func
+        self.region = dict(region)
+        self.hash_func = hash_func
+        self.poll_interval = poll_interval
+        self.settle_samples = max(1, int(settle_samples))
+        self.timeout = timeout
+        self.change_threshold = change_threshold
+        self.settle_threshold = settle_threshold
+        self.hash_change_threshold = hash_change_threshold
+        self.full_check_interval = max(0, int(full_check_interval))
+        self.patch_count = patch_count
+        self.stop_event = stop_event
+        self.clock = clock
+        self.sleep = sleep
+
+        self.sentinels: List[PatchRect] = []
+        self._references: List[np.ndarray] = []
+
+        # Statistics of the last wait
+        self.last_elapsed = 0.0
+        self.last_samples = 0
+        self.last_timed_out = False
+        self.last_full_grabs = 0
+
+    def calibrate(self, frame: Frame) -> List[PatchRect]:
+        """
+        Choose sentinel patches from a full-region capture and use it as reference
+
+        Args:
+            frame: Capture of the book region
+
+        Returns:
+            The chosen patch rects
+        """
+        self.sentinels = choose_sentinels(frame.gray, count=self.patch_count)
+        self._set_reference(frame)
+        return self.sentinels
+
+    def _set_reference(self, frame: Frame) -> None:
+        gray = frame.gray
+        patches = [gray[y:y + h, x:x + w] for (x, y, w, h) in self.sentinels]
+        if not patches or all(float(p.std()) < SentinelDetection.MIN_PATCH_STDDEV for p in patches):
+            # The sentinels landed on blank space of this page - pick new ones
+            self.sentinels = choose_sentinels(gray, count=self.patch_count)
+            patches = [gray[y:y + h, x:x + w] for (x, y, w, h) in self.sentinels]
+        self._references = [np.ascontiguousarray(p) for p in patches]
+
+    def _grab_patches(self) -> List[np.ndarray]:
+        left, top = self.region["left"], self.region["top"]
+        return [
+            self.grab_func({"left": left + x, "top": top + y, "width": w, "height": h}).gray
+            for (x, y, w, h) in self.sentinels
+        ]
+
+    def _full_grab(self) -> Tuple[Frame, Tuple[float, int]]:
+        frame = self.grab_func(self.region)
+        self.last_full_grabs += 1
+        return frame, self.hash_func(frame)
+
+    def _hash_changed(self, previous_hash, current_hash) -> bool:
+        return (previous_hash is None or
+                ImageHasher.compare_hashes(previous_hash, current_hash) > self.hash_change_threshold)
+
+    def wait(self, previous_hash: Optional[Tuple[float, int]]) -> Tuple[Frame, Tuple[float, int], bool]:
+        """
+        Wait until the page differs from the previous page and has settled.
+
+        Args:
+            previous_hash: Hash of the page shown before the key press
+
+        Returns:
+            Tuple of (capture, hash, changed) like PageTurnWaiter.wait()
+
+        Raises:
+            RuntimeError: If calibrate() was never called
+        """
+        if not self._references:
+            raise RuntimeError("calibrate() must be called with the current page before wait()")
+        start = self.clock()
+        deadline = start + self.timeout
+        self.last_full_grabs = 0
+
+        changed = False
+        stable_count = 0
+        last_patches = None
+        samples = 0
+
+        while True:
+            sample_start = self.clock()
+            patches = self._grab_patches()
+            samples += 1
+
+            if not changed:
+                if any(_patch_diff(p, ref) > self.change_threshold
+                       for p, ref in zip(patches, self._references)):
+                    changed = True
+                    stable_count = 0
+            elif all(_patch_diff(p, last) <= self.settle_threshold
+                     for p, last in zip(patches, last_patches)):
+                stable_count += 1
+            else:
+                stable_count = 0
+            last_patches = patches
+
+            if changed and stable_count >= self.settle_samples:
+                break
+
+            now = self.clock()
+            if now >= deadline or (self.stop_event is not None and self.stop_event.is_set()):
+                break
+
+            if (not changed and self.full_check_interval and
+                    samples % self.full_check_interval == 0):
+                # The page may have changed only outside the sentinels
+                _, full_hash = self._full_grab()
+                if self._hash_changed(previous_hash, full_hash):
+                    changed = True
+                    stable_count = 0
+
+            remaining = self.poll_interval - (self.clock() - sample_start)
+            if remaining > 0:
+                self.sleep(min(remaining, max(0.0, deadline - self.clock())))
+
+        settled = changed and stable_count >= self.settle_samples
+        frame, current_hash = self._full_grab()
+        if not changed:
+            changed = self._hash_changed(previous_hash, current_hash)
+        self._set_reference(frame)
+
+        self.last_elapsed = self.clock() - start
+        self.last_samples = samples
+        self.last_timed_out = not settled
+        return frame, current_hash, changed
@@ -0,0 +1,196 @@
+"""
+Capture session recorder.
+Logs every sampled frame and every key event of a capture run so that
+page-change and end-of-book detection can be tuned offline (see session_replay).
+
+Recording layout (one directory per session):
+    session.jsonl   header line followed by one JSON event per line
+    samples.bin     concatenated downsampled grayscale planes (uint8)
+    ref_NNNN.png    full-frame reference of each captured page
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.constants import SessionRecording
+from src.frame import Frame
+from src.image_hasher import ImageHasher
+from src.automation.frame_source import FrameSource
+
+
+class SessionRecorder:
+    """Writes a capture session recording to a directory"""
+
+    def __init__(self, session_dir: str, sample_width: int = SessionRecording.SAMPLE_WIDTH,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 hash_func: Callable[[Frame], Tuple[float, int]] = ImageHasher.hash_image):
+        """
+        Create a new recording
+
+        Args:
+            session_dir: Directory to write the recording to (created if missing)
+            sample_width: Width of the downsampled grayscale copy of every sample
+            metadata: Optional settings stored in the header (thresholds, delays, ...)
+            hash_func: Hash the live capture loop compares (FingerprintEngine.hot_hash),
+                recorded with every sample
+        """
+        self.session_dir = session_dir
+        self.sample_width = sample_width
+        self.hash_func = hash_func
+        os.makedirs(session_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._events = open(os.path.join(session_dir, SessionRecording.EVENTS_FILENAME), "w", encoding="utf-8")
+        self._samples = open(os.path.join(session_dir, SessionRecording.SAMPLES_FILENAME), "wb")
+        self._sample_count = 0
+        self._last_capture = None
+        self._last_sample_index = None
+
+        self._write({
+            "type": "header",
+            "version": SessionRecording.FORMAT_VERSION,
+            "sample_width": sample_width,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "metadata": metadata or {},
+        })
+
+    def _now(self) -> float:
+        return round(time.monotonic() - self._start, 6)
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        self._events.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def downsample(frame: Frame, sample_width: int) -> np.ndarray:
+        """
+        Convert a capture to a small grayscale plane
+
+        Args:
+            frame: Captured Frame (its cached grayscale plane is reused)
+            sample_width: Target width in pixels (never upscales)
+
+        Returns:
+            2D uint8 array
+        """
+        gray = frame.gray
+        if gray.shape[1] > sample_width:
+            height = max(1, round(gray.shape[0] * sample_width / gray.shape[1]))
+            gray = cv2.resize(gray, (sample_width, height), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(gray)
+
+    def record_sample(self, frame: Frame, region: Dict[str, int], truth: Optional[Dict] = None) -> int:
+        """
+        Record one sampled frame
+
+        Args:
+            frame: Frame that was grabbed
+            region: Region it was grabbed from
+            truth: Optional ground-truth viewer state (synthetic sources only)
+
+        Returns:
+            Index of the sample in the recording
+        """
+        gray = self.downsample(frame, self.sample_width)
+        # Full-resolution hash as seen live; replays may use it or re-hash the plane
+        mean_value, sample_hash = self.hash_func(frame)
+        with self._lock:
+            offset = self._samples.tell()
+            self._samples.write(gray.tobytes())
+            index = self._sample_count
+            self._sample_count += 1
+            event = {
+                "type": "sample",
+                "t": self._now(),
+                "index": index,
+                "offset": offset,
+                "shape": list(gray.shape),
+                "size": list(frame.size),
+                "region": [region["left"], region["top"], region["width"], region["height"]],
+                "hash": [mean_value, sample_hash],
+            }
+            if truth is not None:
+                event["truth"] = truth
+            self._write(event)
+            self._last_capture = frame
+            self._last_sample_index = index
+        return index
+
+    def record_key(self, key: str) -> None:
+        """Record a key event sent to Kindle"""
+        with self._lock:
+            self._write({"type": "key", "t": self._now(), "key": key})
+
+    def mark_capture(self, page_num: int, page_hash: Tuple[float, int]) -> None:
+        """
+        Record that the most recent sample was kept as a page, with a full-frame reference
+
+        Args:
+            page_num: Page number assigned by the capture loop
+            page_hash: Hash the live detector computed for the page
+        """
+        with self._lock:
+            frame = self._last_capture
+            sample_index = self._last_sample_index
+            reference = None
+            if frame is not None:
+                reference = f"{SessionRecording.REFERENCE_PREFIX}{page_num:04d}.png"
+                frame.to_image().save(os.path.join(self.session_dir, reference), compress_level=1)
+            self._write({
+                "type": "capture",
+                "t": self._now(),
+                "page": page_num,
+                "sample": sample_index,
+                "hash": [page_hash[0], page_hash[1]],
+                "reference": reference,
+            })
+
+    def mark_end(self, reason: str) -> None:
+        """Record why the live run stopped capturing (end detected, page limit, stop)"""
+        with self._lock:
+            self._write({"type": "end", "t": self._now(), "reason": reason})
+
+    def close(self) -> None:
+        """Flush and close the recording files"""
+        with self._lock:
+            for f in (self._events, self._samples):
+                try:
+                    f.close()
+                except Exception:
+                    pass
+
+
+class RecordingFrameSource(FrameSource):
+    """FrameSource wrapper that logs every grab and key press to a SessionRecorder"""
+
+    def __init__(self, inner: FrameSource, recorder: SessionRecorder):
+        """
+        Args:
+            inner: Frame source that does the actual capture and input
+            recorder: Recorder receiving samples and key events
+        """
+        self.inner = inner
+        self.recorder = recorder
+
+    @property
+    def monitors(self):
+        return self.inner.monitors
+
+    def grab(self, region: Dict[str, int]):
+        frame = self.inner.grab(region)
+        self.recorder.record_sample(frame, region, truth=self.inner.ground_truth())
+        return frame
+
+    def press_key(self, key: str) -> None:
+        self.inner.press_key(key)
+        # Logged after key-up, which is when the capture loop starts waiting
+        self.recorder.record_key(key)
+
+    def ground_truth(self):
+        return self.inner.ground_truth()
@@ -0,0 +1,320 @@
+"""
+Offline replay of recorded capture sessions.
+Feeds a SessionRecorder recording back through ImageHasher, PageTurnWaiter and
+EndOfBookDetector faster than real time, so detector settings can be evaluated
+over many recorded books without a live Kindle.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.constants import AdaptiveWait, PageDetection, SessionRecording
+from src.image_hasher import ImageHasher
+from src.automation.end_of_book import EndOfBookDetector
+from src.automation.page_turn_waiter import PageTurnWaiter
+
+
+class RecordedSession:
+    """Read-only view of a session recording directory"""
+
+    def __init__(self, session_dir: str):
+        """
+        Load a recording
+
+        Args:
+            session_dir: Directory written by SessionRecorder
+
+        Raises:
+            ValueError: If the directory does not contain a valid recording
+        """
+        self.session_dir = session_dir
+        self.header: Dict[str, Any] = {}
+        self.samples: List[Dict[str, Any]] = []
+        self.keys: List[Dict[str, Any]] = []
+        self.captures: List[Dict[str, Any]] = []
+        self.end: Optional[Dict[str, Any]] = None
+
+        events_path = os.path.join(session_dir, SessionRecording.EVENTS_FILENAME)
+        with open(events_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                event = json.loads(line)
+                event_type = event.get("type")
+                if event_type == "header":
+                    self.header = event
+                elif event_type == "sample":
+                    self.samples.append(event)
+                elif event_type == "key":
+                    self.keys.append(event)
+                elif event_type == "capture":
+                    self.captures.append(event)
+                elif event_type == "end":
+                    self.end = event
+
+        if self.header.get("version") != SessionRecording.FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version in {session_dir}: {self.header.get('version')}")
+
+        samples_path = os.path.join(session_dir, SessionRecording.SAMPLES_FILENAME)
+        if os.path.getsize(samples_path) > 0:
+            self._data = np.memmap(samples_path, dtype=np.uint8, mode="r")
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+        self._hashes: Dict[int, tuple] = {}
+
+    @property
+    def has_truth(self) -> bool:
+        """True if samples carry ground-truth labels (synthetic recordings)"""
+        return bool(self.samples) and "truth" in self.samples[0]
+
+    def sample_plane(self, index: int) -> np.ndarray:
+        """Downsampled grayscale plane of a sample"""
+        event = self.samples[index]
+        height, width = event["shape"]
+        start = event["offset"]
+        return self._data[start:start + height * width].reshape(height, width)
+
+    def sample_hash(self, index: int, rehash: bool = False) -> tuple:
+        """
+        Hash of a sample (cached)
+
+        Args:
+            index: Sample index
+            rehash: Hash the downsampled plane instead of using the full-resolution
+                hash recorded live (needed when evaluating a different hasher)
+        """
+        event = self.samples[index]
+        if not rehash and "hash" in event:
+            return tuple(event["hash"])
+        cached = self._hashes.get(index)
+        if cached is None:
+            cached = ImageHasher.hash_gray(np.asarray(self.sample_plane(index)))
+            self._hashes[index] = cached
+        return cached
+
+    def rehash_all(self) -> None:
+        """
+        Hash every recorded plane up front with ImageHasher.hash_batch()
+
+        Samples are grouped by plane shape (the region can change between
+        calibration and capture), and each group is hashed in one batch.
+        sample_hash(rehash=True) then only looks up the cache.
+        """
+        by_shape: Dict[tuple, List[int]] = {}
+        for index, event in enumerate(self.samples):
+            if index not in self._hashes:
+                by_shape.setdefault(tuple(event["shape"]), []).append(index)
+        for indices in by_shape.values():
+            stack = np.stack([self.sample_plane(i) for i in indices])
+            means, dhashes = ImageHasher.hash_batch(stack)
+            for i, mean_value, dhash in zip(indices, means.tolist(), dhashes.tolist()):
+                self._hashes[i] = (mean_value, dhash)
+
+
+class SessionReplayer:
+    """
+    Replays recordings through the live page-change and end-of-book logic.
+
+    Every key event starts a PageTurnWaiter whose grab function returns the
+    samples recorded after that key, with a clock driven by the recorded
+    timestamps and a no-op sleep. The page it settles on is checked with
+    EndOfBookDetector exactly like the capture loop does.
+
+    Note that the replay can only see samples the live run took: if the
+    replayed settings need more samples than the live waiter recorded, the
+    wait ends early and is counted in 'exhausted_waits'.
+    """
+
+    def __init__(
+        self,
+        change_threshold: float = PageDetection.HASH_DIFF_THRESHOLD,
+        settle_samples: int = AdaptiveWait.SETTLE_SAMPLES,
+        settle_threshold: float = AdaptiveWait.SETTLE_DIFF_THRESHOLD,
+        timeout: float = AdaptiveWait.TIMEOUT,
+        consecutive_matches: int = PageDetection.DEFAULT_END_DETECTION_SENSITIVITY,
+        end_threshold: float = PageDetection.HASH_DIFF_THRESHOLD,
+        rehash: bool = False
+    ):
+        """
+        Initialize the replayer with the detector settings to evaluate
+
+        Args:
+            change_threshold: PageTurnWaiter change threshold
+            settle_samples: PageTurnWaiter settle sample count
+            settle_threshold: PageTurnWaiter settle threshold
+            timeout: PageTurnWaiter timeout (seconds of recorded time)
+            consecutive_matches: EndOfBookDetector sensitivity
+            end_threshold: EndOfBookDetector similarity threshold
+            rehash: Re-hash the recorded planes instead of using the live hashes
+        """
+        self.change_threshold = change_threshold
+        self.settle_samples = settle_samples
+        self.settle_threshold = settle_threshold
+        self.timeout = timeout
+        self.consecutive_matches = consecutive_matches
+        self.end_threshold = end_threshold
+        self.rehash = rehash
+
+    def settings(self) -> Dict[str, Any]:
+        """Detector settings used for this replay"""
+        return {
+            "change_threshold": self.change_threshold,
+            "settle_samples": self.settle_samples,
+            "settle_threshold": self.settle_threshold,
+            "timeout": self.timeout,
+            "consecutive_matches": self.consecutive_matches,
+            "end_threshold": self.end_threshold,
+            "rehash": self.rehash,
+        }
+
+    def replay(self, session: RecordedSession) -> Dict[str, Any]:
+        """
+        Replay one recording
+
+        Args:
+            session: Loaded recording
+
+        Returns:
+            Report dict with page counts, detection errors and decision latencies
+        """
+        report = {
+            "session": session.session_dir,
+            "has_truth": session.has_truth,
+            "live_pages": len(session.captures),
+            "live_end_reason": session.end["reason"] if session.end else None,
+            "pages": 0,
+            "end_detected": False,
+            "false_end_detections": 0,
+            "missed_turns": 0,
+            "spurious_turns": 0,
+            "torn_captures": 0,
+            "duplicate_pages": 0,
+            "exhausted_waits": 0,
+            "latencies": [],
+        }
+        if not session.samples:
+            return report
+
+        samples = session.samples
+        if self.rehash:
+            session.rehash_all()
+        detector = EndOfBookDetector(self.consecutive_matches, self.end_threshold)
+        state = {"t": 0.0}
+
+        def sample_hash(index):
+            return session.sample_hash(index, rehash=self.rehash)
+
+        def truth_of(index):
+            return samples[index].get("truth") if index is not None else None
+
+        # The first page is the last sample grabbed before the first key press
+        first_key_t = session.keys[0]["t"] if session.keys else float("inf")
+        current = 0
+        for i, sample in enumerate(samples):
+            if sample["t"] > first_key_t:
+                break
+            current = i
+        current_hash = sample_hash(current)
+        captured_truth_pages = []
+
+        for key_number in range(len(session.keys) + 1):
+            if detector.is_end(current_hash):
+                report["end_detected"] = True
+                truth = truth_of(current)
+                if truth is not None and not truth.get("at_end"):
+                    report["false_end_detections"] += 1
+                break
+            detector.add(current_hash)
+            report["pages"] += 1
+
+            truth = truth_of(current)
+            if truth is not None:
+                if truth.get("animating"):
+                    report["torn_captures"] += 1
+                elif truth["page"] in captured_truth_pages[-1:]:
+                    report["duplicate_pages"] += 1
+                captured_truth_pages.append(truth["page"])
+
+            if key_number == len(session.keys):
+                break
+
+            key_t = session.keys[key_number]["t"]
+            next_key_t = (session.keys[key_number + 1]["t"]
+                          if key_number + 1 < len(session.keys) else float("inf"))
+            segment = [i for i in range(current + 1, len(samples))
+                       if key_t <= samples[i]["t"] < next_key_t]
+            if not segment:
+                report["exhausted_waits"] += 1
+                continue
+
+            segment_iter = iter(segment)
+            last = {"index": current}
+
+            def grab():
+                try:
+                    index = next(segment_iter)
+                    state["t"] = samples[index]["t"]
+                    last["index"] = index
+                except StopIteration:
+                    # No more recorded samples: force the waiter's deadline
+                    state["t"] = float("inf")
+                return last["index"]
+
+            state["t"] = key_t
+            waiter = PageTurnWaiter(
+                grab,
+                hash_func=sample_hash,
+                settle_samples=self.settle_samples,
+                timeout=self.timeout,
+                change_threshold=self.change_threshold,
+                settle_threshold=self.settle_threshold,
+                clock=lambda: state["t"],
+                sleep=lambda seconds: None
+            )
+            previous = current
+            current, current_hash, changed = waiter.wait(current_hash)
+            if state["t"] == float("inf"):
+                report["exhausted_waits"] += 1
+            else:
+                report["latencies"].append(samples[current]["t"] - key_t)
+
+            before, after = truth_of(previous), truth_of(current)
+            if before is not None and after is not None:
+                segment_end = truth_of(segment[-1])
+                really_turned = segment_end["page"] != before["page"]
+                if really_turned and (not changed or after["page"] == before["page"]):
+                    report["missed_turns"] += 1
+                elif changed and not really_turned:
+                    report["spurious_turns"] += 1
+
+        latencies = report["latencies"]
+        report["latency_mean"] = float(np.mean(latencies)) if latencies else None
+        report["latency_p95"] = float(np.percentile(latencies, 95)) if latencies else None
+        report["latency_max"] = float(np.max(latencies)) if latencies else None
+        return report
+
+    def replay_many(self, session_dirs: List[str]) -> Dict[str, Any]:
+        """
+        Replay several recordings and aggregate the results
+
+        Args:
+            session_dirs: Recording directories
+
+        Returns:
+            Dict with per-session reports and summed totals
+        """
+        reports = [self.replay(RecordedSession(d)) for d in session_dirs]
+        totals = {
+            key: sum(r[key] for r in reports)
+            for key in ("pages", "live_pages", "false_end_detections", "missed_turns",
+                        "spurious_turns", "torn_captures", "duplicate_pages", "exhausted_waits")
+        }
+        all_latencies = [lat for r in reports for lat in r["latencies"]]
+        totals["sessions"] = len(reports)
+        totals["latency_mean"] = float(np.mean(all_latencies)) if all_latencies else None
+        totals["latency_p95"] = float(np.percentile(all_latencies, 95)) if all_latencies else None
+        return {"settings": self.settings(), "totals": totals, "sessions": reports}
@@ -0,0 +1,209 @@
+"""
+Storage budget module.
+Projects the disk space a capture run still needs from the sizes of the
+pages captured so far, watches the free space of the output volume and
+degrades the run step by step before the disk fills up.
+"""
+
+import shutil
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from src.callback_utils import get_callback_or_default
+from src.constants import Storage
+
+
+class StorageBudgetManager:
+    """
+    Online disk budget for one capture run.
+
+    Until Storage.MIN_SAMPLES pages have been measured, the per-page sizes
+    come from the capture region and the per-pixel priors in Storage; after
+    that they are exponential moving averages of the measured intermediate
+    frames and PDF output. A linearized PDF needs room for a second copy of
+    the whole file when it is finished, and an enabled page cache grows by
+    each newly encoded page up to its size limit; both are part of the
+    projection while they are on. check() compares the projected need with the free
+    space (minus Storage.MIN_FREE_BYTES) and applies the registered
+    degradation steps in order while the projection does not fit.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        total_pages: int,
+        region_pixels: int,
+        keeps_intermediates: bool = True,
+        linearizes: bool = False,
+        cache_bytes: int = 0,
+        pages_done: int = 0,
+        output_probe: Optional[Callable[[], Tuple[int, int]]] = None,
+        reserve_bytes: int = Storage.MIN_FREE_BYTES,
+        check_interval: float = Storage.CHECK_INTERVAL,
+        status_callback: Optional[Callable[[str], None]] = None,
+        disk_usage: Callable = shutil.disk_usage
+    ):
+        """
+        Args:
+            folder: Directory on the volume that receives the PDF and intermediates
+            total_pages: Maximum number of pages the run captures
+            region_pixels: Pixels per captured page (for the initial estimate)
+            keeps_intermediates: Whether captured pages stay on this volume until the run ends
+            linearizes: Whether the PDF is linearized (copied once more) when it is finished
+            cache_bytes: Bytes the page cache may still grow by on this volume (0 = no cache)
+            pages_done: Pages already captured (resumed run)
+            output_probe: Function returning (pages_written, bytes_written) of the PDF
+            reserve_bytes: Free space that is never planned for
+            check_interval: Minimum seconds between free space queries
+            status_callback: Function for status messages
+            disk_usage: shutil.disk_usage compatible function (injectable for tests)
+        """
+        self.folder = folder
+        self.total_pages = total_pages
+        self.keeps_intermediates = keeps_intermediates
+        self.linearizes = linearizes
+        self.cache_bytes = cache_bytes
+        self.output_probe = output_probe
+        self.reserve_bytes = reserve_bytes
+        self.check_interval = check_interval
+        self.status_callback = get_callback_or_default(status_callback, "Storage")
+        self._disk_usage = disk_usage
+
+        self._lock = threading.Lock()
+        self.pages_captured = pages_done
+        self.intermediate_bytes_per_page = region_pixels * Storage.INTERMEDIATE_BYTES_PER_PIXEL
+        self.output_bytes_per_page = region_pixels * Storage.OUTPUT_BYTES_PER_PIXEL
+        self._intermediate_samples = 0
+        self._output_samples = 0
+        self._output_pages = 0
+        self._output_bytes = 0
+
+        self._degradations: List[Tuple[str, Callable[[], None]]] = []
+        self.applied: List[str] = []
+        self._free: Optional[int] = None
+        self._checked_at: Optional[float] = None
+
+    def add_degradation(self, description: str, action: Callable[[], None]) -> None:
+        """
+        Register the next fallback step, applied when space runs short
+
+        Args:
+            description: Status text shown when the step is applied
+            action: Function that applies the step
+        """
+        self._degradations.append((description, action))
+
+    @staticmethod
+    def _average(current: float, sample: float, samples: int) -> float:
+        if samples < Storage.MIN_SAMPLES:
+            # Running mean replaces the prior as soon as the first page is measured
+            return (current * (samples - 1) + sample) / samples if samples > 1 else sample
+        return current + Storage.SIZE_SMOOTHING * (sample - current)
+
+    def record_intermediate(self, nbytes: int) -> None:
+        """Account one captured page of nbytes (thread-safe; called from the frame writers)"""
+        with self._lock:
+            self.pages_captured += 1
+            self._intermediate_samples += 1
+            self.intermediate_bytes_per_page = self._average(
+                self.intermediate_bytes_per_page, nbytes, self._intermediate_samples
+            )
+
+    def _poll_output(self) -> None:
+        """Fold the pages appended to the PDF since the last call into the average"""
+        if self.output_probe is None:
+            return
+        pages, total_bytes = self.output_probe()
+        if pages <= self._output_pages:
+            return
+        with self._lock:
+            new_pages = pages - self._output_pages
+            per_page = (total_bytes - self._output_bytes) / new_pages
+            self._output_samples += 1
+            self.output_bytes_per_page = self._average(
+                self.output_bytes_per_page, per_page, self._output_samples
+            )
+            self._output_pages = pages
+            self._output_bytes = total_bytes
+
+    def projected_need(self) -> int:
+        """Bytes the rest of the run is expected to write to the volume"""
+        with self._lock:
+            remaining = max(0, self.total_pages - self.pages_captured)
+            output_per_page = self.output_bytes_per_page * Storage.PDF_OVERHEAD_FACTOR
+            per_page = output_per_page
+            if self.keeps_intermediates:
+                per_page += self.intermediate_bytes_per_page
+            # Captured pages that are not in the PDF yet still need their output bytes
+            pending_output = max(0, self.pages_captured - self._output_pages)
+            need = remaining * per_page + pending_output * output_per_page
+            if self.cache_bytes:
+                need += min(self.cache_bytes, (remaining + pending_output) * self.output_bytes_per_page)
+            if self.linearizes:
+                # The linearized copy is written before the plain file is removed
+                need += self.total_pages * output_per_page
+            return int(need)
+
+    def free_bytes(self, force: bool = False) -> Optional[int]:
+        """
+        Free space of the volume, queried at most every check_interval seconds
+
+        Returns:
+            Free bytes, or None if the query is not due yet
+        """
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return None
+        self._checked_at = now
+        self._free = self._disk_usage(self.folder).free
+        return self._free
+
+    def available_bytes(self) -> int:
+        """Free space minus the reserve as of the last query"""
+        return (self._free or 0) - self.reserve_bytes
+
+    def check(self, force: bool = False) -> bool:
+        """
+        Re-project the need and degrade the run if it no longer fits
+
+        One degradation step is applied per check so its effect shows up in
+        the measurements before the next step; once the free space falls
+        below the reserve, all remaining steps are applied at once.
+
+        Args:
+            force: Query the free space even if check_interval has not passed
+
+        Returns:
+            False if the free space is below the reserve and the run must stop
+        """
+        free = self.free_bytes(force)
+        if free is None:
+            return True
+        self._poll_output()
+
+        critical = free < self.reserve_bytes
+        while self._degradations and (critical or self.projected_need() > self.available_bytes()):
+            description, action = self._degradations.pop(0)
+            self.status_callback(
+                f"Disk space low ({free / (1024 ** 2):.0f} MB free, about "
+                f"{self.projected_need() / (1024 ** 2):.0f} MB still needed): {description}"
+            )
+            action()
+            self.applied.append(description)
+            if not critical:
+                break
+        return not critical
+
+    def describe(self) -> str:
+        """One-line summary of the current projection"""
+        return (
+            f"Free space {(self._free or 0) / (1024 ** 3):.2f} GB, projected need "
+            f"{self.projected_need() / (1024 ** 3):.2f} GB "
+            f"({self.output_bytes_per_page / 1024:.0f} KB/page PDF"
+            + (f", {self.intermediate_bytes_per_page / 1024:.0f} KB/page captured"
+               if self.keeps_intermediates else "")
+            + (", linearized copy" if self.linearizes else "")
+            + (f", page cache up to {self.cache_bytes / (1024 ** 2):.0f} MB" if self.cache_bytes else "")
+            + ")"
+        )
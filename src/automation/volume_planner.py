@@ -0,0 +1,155 @@
+"""
+Volume planning module.
+Decides where a long book is cut into volume PDFs: after a number of
+pages, before an estimated byte size is exceeded, and/or at detected
+chapter starts, so each volume can be built (and fail) on its own.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.constants import VolumeSplit
+from src.frame_file import decode_page_image
+
+
+class PageProfile(NamedTuple):
+    """Where the ink on a page starts, for chapter detection"""
+    top: float  # First inked row as a fraction of the page height (1.0 = blank)
+    ink: float  # Fraction of inked pixels
+
+
+def page_profile(data: bytes) -> PageProfile:
+    """
+    Ink profile of a captured page
+
+    Args:
+        data: Captured page (frame file or any image format Pillow reads)
+
+    Returns:
+        PageProfile
+    """
+    with decode_page_image(data) as img:
+        gray = np.asarray(img.convert("L"))
+    step = max(1, gray.shape[1] // VolumeSplit.SAMPLE_WIDTH)
+    inked = gray[::step, ::step] < VolumeSplit.INK_LEVEL
+    rows = np.flatnonzero(np.count_nonzero(inked, axis=1) >= VolumeSplit.MIN_ROW_INK)
+    ink = float(np.count_nonzero(inked)) / inked.size
+    if rows.size == 0 or ink < VolumeSplit.BLANK_INK:
+        return PageProfile(1.0, ink)
+    return PageProfile(float(rows[0]) / inked.shape[0], ink)
+
+
+def profile_pages(read_page: Callable[[str], bytes], names: Sequence[str],
+                  workers: int = 0) -> List[PageProfile]:
+    """
+    Profile every page on a thread pool (page decoding releases the GIL)
+
+    Pages are read in windows of a few pages per thread, so only a window
+    of captured pages is held in memory at a time.
+
+    Args:
+        read_page: Returns the captured bytes of a page name
+        names: Page names in book order
+        workers: Threads (0 = one per CPU core)
+
+    Returns:
+        PageProfile per page
+    """
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4
+    profiles = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(names), window):
+            profiles.extend(pool.map(lambda name: page_profile(read_page(name)),
+                                     names[start:start + window]))
+    return profiles
+
+
+def detect_chapter_starts(profiles: Sequence[PageProfile]) -> List[int]:
+    """
+    Pages that start a chapter
+
+    A chapter opening page has its first line pushed well below where text
+    usually starts (a sunk chapter title), or follows a blank page.
+
+    Args:
+        profiles: PageProfile per page
+
+    Returns:
+        Sorted 0-based page indices (never 0)
+    """
+    tops = [profile.top for profile in profiles if profile.top < 1.0]
+    if not tops:
+        return []
+    usual_top = float(np.median(tops))
+    starts = []
+    for index in range(1, len(profiles)):
+        profile = profiles[index]
+        if profile.top >= 1.0:
+            continue
+        if (profile.top - usual_top >= VolumeSplit.CHAPTER_DROP or
+                profiles[index - 1].top >= 1.0):
+            starts.append(index)
+    return starts
+
+
+def plan_volumes(page_sizes: Sequence[int], max_pages: int = 0, max_bytes: int = 0,
+                 chapter_starts: Optional[Sequence[int]] = None,
+                 min_pages: int = VolumeSplit.MIN_PAGES) -> List[range]:
+    """
+    Split pages into volumes
+
+    With a page or byte limit, a volume ends before the page that would
+    exceed it, or at the last chapter start before that page if one leaves
+    at least min_pages pages. With chapter starts and no limit, every
+    chapter start at least min_pages after the volume start begins a volume.
+
+    Args:
+        page_sizes: Estimated output bytes per page
+        max_pages: Pages per volume (0 = no limit)
+        max_bytes: Estimated bytes per volume (0 = no limit)
+        chapter_starts: Page indices from detect_chapter_starts(), or None
+        min_pages: Shortest volume a chapter cut may leave
+
+    Returns:
+        Page index ranges in book order
+    """
+    starts = sorted(chapter_starts or [])
+    starts_set = set(starts)
+    limited = max_pages > 0 or max_bytes > 0
+    volumes = []
+    start = 0
+    size = 0
+    for index, page_size in enumerate(page_sizes):
+        count = index - start
+        if count and not limited and index in starts_set and count >= min_pages:
+            volumes.append(range(start, index))
+            start, size = index, 0
+        elif count and ((max_pages and count + 1 > max_pages) or (max_bytes and size + page_size > max_bytes)):
+            cut = index
+            candidates = [page for page in starts if start + min_pages <= page <= index]
+            if candidates:
+                cut = candidates[-1]
+            volumes.append(range(start, cut))
+            start, size = cut, sum(page_sizes[cut:index])
+        size += page_size
+    if start < len(page_sizes):
+        volumes.append(range(start, len(page_sizes)))
+    return volumes
+
+
+def volume_filename(output_filename: str, number: int, volume_count: int) -> str:
+    """
+    Volume PDF name, e.g. "book_vol01.pdf"
+
+    Args:
+        output_filename: Filename of the whole book
+        number: 1-based volume number
+        volume_count: Number of volumes (sets the zero padding)
+    """
+    stem, extension = os.path.splitext(output_filename)
+    digits = max(2, len(str(volume_count)))
+    return f"{stem}{VolumeSplit.FILENAME_SUFFIX}{number:0{digits}d}{extension or '.pdf'}"
@@ -33,6 +33,35 @@ class Delays:
     KEY_PRESS = 0.1
     FOCUS_WAIT = 0.5
 
+# ============================================================================
+# ADAPTIVE PAGE TURN WAIT
+# ============================================================================
+class AdaptiveWait:
+    """Polling parameters for waiting on a page turn instead of fixed sleeps"""
+    ENABLED = True
+    POLL_INTERVAL = 0.05  # Seconds between samples of the capture region
+    SETTLE_SAMPLES = 3  # Consecutive unchanged samples required after the change
+    SETTLE_DIFF_THRESHOLD = 2.0  # Max hash diff between samples to count as "unchanged"
+    # Worst case: fall back to the old fixed wait (PAGE_TURN + PAGE_STABILIZATION)
+    TIMEOUT = Delays.PAGE_TURN + Delays.PAGE_STABILIZATION
+
+# ============================================================================
+# SENTINEL PATCH CHANGE DETECTION
+# ============================================================================
+class SentinelDetection:
+    """Page turn detection from a few small patches of the book region"""
+    ENABLED = True  # Used instead of full-region polling when adaptive wait is on
+    PATCH_COUNT = 4
+    PATCH_WIDTH = 128  # Pixels; wide, short strips catch lines of text
+    PATCH_HEIGHT = 24
+    MIN_PATCH_STDDEV = 12.0  # Flatter patches (blank paper) are not used as sentinels
+    POLL_INTERVAL = 0.02  # Seconds between sentinel samples
+    SETTLE_SAMPLES = AdaptiveWait.SETTLE_SAMPLES
+    CHANGE_THRESHOLD = 6.0  # Mean absolute patch difference (gray levels) of a page turn
+    SETTLE_THRESHOLD = 1.0  # Max patch difference between samples to count as "unchanged"
+    FULL_CHECK_INTERVAL = 10  # Full-region hash check every N samples while unchanged
+    TIMEOUT = AdaptiveWait.TIMEOUT
+
 # ============================================================================
 # PYAUTOGUI CONFIGURATION
 # ============================================================================
@@ -69,6 +98,21 @@ class RegionDetection:
     GAUSSIAN_BLUR_KERNEL = (5, 5)
     GAUSSIAN_BLUR_SIGMA = 0
 
+# ============================================================================
+# CONTENT CROP
+# ============================================================================
+class ContentCrop:
+    """Narrowing the capture region to the page content (see automation/content_bounds.py)"""
+    # Off by default: the bounds are measured once, on the first pages (often cover and
+    # title pages), and content later in the book outside them would be cut off.
+    # Not used for resumed runs or recorded sessions.
+    ENABLED = False
+    CALIBRATION_PAGES = 5  # Pages held back while the content bounds are measured
+    VARIATION_THRESHOLD = 24  # Gray levels a pixel must change between pages to count as content
+    MIN_LINE_PIXELS = 3  # Rows/columns with fewer varying pixels are noise
+    PADDING = 24  # Pixels kept around the content on every side
+    MIN_SAVING = 0.05  # Keep the full region unless the crop removes at least this much area
+
 # ============================================================================
 # PAGE TURN DETECTION
 # ============================================================================
@@ -90,10 +134,20 @@ class PageDetection:
 # STORAGE AND FILE OPERATIONS
 # ============================================================================
 class Storage:
-    """Storage-related constants"""
-    ESTIMATED_BYTES_PER_PAGE = 2 * 1024 * 1024  # 2 MB per page
+    """Storage-related constants (see automation/storage_budget.py)"""
     PDF_OVERHEAD_FACTOR = 1.1  # 10% overhead for PDF structure
 
+    # Priors per captured pixel, used until pages have been measured
+    OUTPUT_BYTES_PER_PIXEL = 0.15  # Optimized page in the PDF
+    INTERMEDIATE_BYTES_PER_PIXEL = 0.15  # Captured frame file
+    MIN_SAMPLES = 3  # Pages averaged before switching to the moving average
+    SIZE_SMOOTHING = 0.2  # Weight of the newest page in the moving average
+
+    MIN_FREE_BYTES = 200 * 1024 * 1024  # Free space never planned for; capture stops below it
+    CHECK_INTERVAL = 2.0  # Seconds between free space queries
+    DEGRADED_JPEG_QUALITY = 80  # Lossy fallback when the projection does not fit
+    DEGRADED_AUTO_JPEG_QUALITY = 60  # Same for the JPEG (grayscale and colour) pages of "AUTO"
+
     # Default paths
     @staticmethod
     def get_default_output_dir():
@@ -112,6 +166,108 @@ class Storage:
     DEFAULT_FILENAME = None  # Will be set dynamically
     CONFIG_FILENAME = "config.json"
 
+# ============================================================================
+# CAPTURE PIPELINE
+# ============================================================================
+class CapturePipeline:
+    """Background encoding/writing of captured frames"""
+    WRITER_WORKERS = 2  # Threads encoding and saving frames
+    MAX_PENDING_FRAMES = 8  # Queue size before the capture thread blocks (backpressure)
+
+# ============================================================================
+# INTERMEDIATE FRAME FILES
+# ============================================================================
+class FrameFile:
+    """Raw page files in the temp screenshots folder (see frame_file.py)"""
+    EXTENSION = ".kfr"
+    VERSION = 1
+    MODE = "L"  # "L" stores the grayscale plane (pages are optimized to grayscale), "BGRA" keeps colour
+    ZLIB_LEVEL = 1  # Fast zlib level; 0 writes the pixels uncompressed
+
+# ============================================================================
+# FRAME STORE
+# ============================================================================
+class FrameStorage:
+    """Where captured pages wait for the PDF builder (see automation/frame_store.py)"""
+    # "memory": RAM with spill to the local temp dir (no resume)
+    # "disk": journaled temp screenshots folder next to the output (resumable)
+    # "auto": memory if the estimated book fits MEMORY_BUDGET, otherwise disk
+    # Disk by default so an interrupted run can always be resumed
+    MODE = "disk"
+    MEMORY_BUDGET = 512 * 1024 * 1024  # Bytes of encoded pages held in RAM before spilling
+    ESTIMATED_BYTES_PER_PIXEL = 0.25  # Conservative encoded frame size for the "auto" estimate
+    SPILL_PREFIX = "kindle_frames_"
+
+# ============================================================================
+# CAPTURE JOURNAL (RESUME)
+# ============================================================================
+class Journal:
+    """Crash-safe page journal kept in the screenshots folder"""
+    FILENAME = "journal.jsonl"
+    HEADER_FILENAME = "journal_header.json"
+    FORMAT_VERSION = 1
+    FSYNC = True  # fsync every page record (survives power loss, costs ~ms per page)
+
+# ============================================================================
+# VIRTUAL KINDLE (SYNTHETIC FRAME SOURCE)
+# ============================================================================
+class VirtualKindle:
+    """Defaults for the synthetic frame source used in headless runs"""
+    PAGE_COUNT = 300
+    PAGE_SIZE = (800, 1100)  # (width, height) in pixels
+    BOOK_ORIGIN = (100, 40)  # (left, top) of the page on the virtual desktop
+    SCREEN_SIZE = (1920, 1200)
+    RENDER_LATENCY = 0.15  # Seconds before the page starts changing
+    ANIMATION_FRAMES = 4  # Intermediate frames during a page transition
+    ANIMATION_DURATION = 0.1  # Seconds the transition lasts
+    BACKGROUND_GRAY = 128
+    PAGE_CACHE_SIZE = 8  # Rendered pages kept in memory
+
+# ============================================================================
+# SESSION RECORDING AND REPLAY
+# ============================================================================
+class SessionRecording:
+    """Capture session recorder used to tune page-change detection offline"""
+    SAMPLE_WIDTH = 256  # Width of the downsampled grayscale copy of every sample
+    EVENTS_FILENAME = "session.jsonl"
+    SAMPLES_FILENAME = "samples.bin"
+    REFERENCE_PREFIX = "ref_"  # Full-frame PNG references of captured pages
+    FORMAT_VERSION = 1
+
+# ============================================================================
+# PAGE FINGERPRINTS
+# ============================================================================
+class Fingerprint:
+    """Perceptual fingerprint engine settings (see src/fingerprint.py)"""
+    BASE_SIZE = 32  # Every fingerprint is computed from one BASE_SIZE x BASE_SIZE plane
+
+    # Hash used while polling for page turns; "dhash" is ImageHasher's (mean, 8x8 dHash)
+    HOT_ALGORITHM = "dhash"
+
+    # Stronger hashes used to confirm decisions (e.g. an end-of-book candidate)
+    CONFIRM_ALGORITHMS = ("phash", "whash", "dhash16")
+    COMBINER = "all"  # "all" (every algorithm must agree the pages match), "any", "majority"
+    CONFIRM_END_OF_BOOK = True
+
+    # Max Hamming distance (bits) at which two pages still count as the same page
+    THRESHOLDS = {
+        "dhash": 6,      # 64 bits
+        "ahash": 6,      # 64 bits
+        "phash": 10,     # 64 bits
+        "whash": 8,      # 256 bits (coarse blocks, few bits flip between pages)
+        "dhash16": 24,   # 256 bits
+    }
+
+# ============================================================================
+# DUPLICATE PAGE DETECTION
+# ============================================================================
+class DuplicateDetection:
+    """Handling of captures that repeat an earlier page (see automation/page_index.py)"""
+    FLAG = "flag"  # Report the repeat and keep the page
+    SKIP = "skip"  # Report the repeat and drop the page (confirmed by fingerprints)
+    POLICY = FLAG
+    MAX_CONSECUTIVE_SKIPS = 20  # Keep pages again after this many skips in a row
+
 # ============================================================================
 # IMAGE PROCESSING
 # ============================================================================
@@ -120,11 +276,137 @@ class ImageProcessing:
     DEFAULT_JPEG_QUALITY = 90  # 0-100 scale
 
     # Supported formats
-    SUPPORTED_FORMATS = ["PNG", "JPEG"]
+    # GRAY16/GRAY4 = 4/2-bit grayscale PNG, G4 = 1-bit CCITT Group 4 (text pages),
+    # MRC = text mask over a JPEG background, AUTO = codec chosen per page (PageClassification)
+    SUPPORTED_FORMATS = ["PNG", "JPEG", "GRAY16", "GRAY4", "G4", "MRC", "AUTO"]
 
     # Image resizing
     MAX_IMAGE_WIDTH = 1200  # Maximum width for optimized images
-    LANCZOS_RESAMPLING = True  # High-quality downsampling
+    # Downscaling engine (see automation/resampler.py): "lanczos", "reduce" or "area"
+    RESAMPLER = "area"
+
+# ============================================================================
+# BILEVEL (G4) PAGES
+# ============================================================================
+class Bilevel:
+    """1-bit CCITT Group 4 page encoding (see automation/bilevel.py)"""
+    METHOD = "sauvola"  # "sauvola" (local, handles shading) or "otsu" (global)
+    MAX_WIDTH = 2400  # 1-bit pages keep more pixels so text edges stay smooth
+    SAUVOLA_WINDOW = 31  # Odd neighbourhood size in pixels
+    SAUVOLA_K = 0.2
+    SAUVOLA_R = 128.0
+
+# ============================================================================
+# LOW-BIT-DEPTH GRAYSCALE PAGES
+# ============================================================================
+class GrayPalette:
+    """2/4-bit grayscale PNG pages (see automation/gray_palette.py)"""
+    FORMATS = {"GRAY16": 16, "GRAY4": 4}  # image_format -> number of gray levels
+    DITHER = False  # Ordered (Bayer 4x4) dithering: smoother gradients, larger files
+    ZLIB_LEVEL = 9
+
+# ============================================================================
+# MIXED RASTER CONTENT (MRC) PAGES
+# ============================================================================
+class MixedRasterContent:
+    """Text mask + background layer pages (see automation/mrc.py)"""
+    BACKGROUND_KERNEL = 15  # Closing kernel (pixels); wider than the thickest text stroke
+    TEXT_CONTRAST = 48  # Gray levels a text pixel is darker than its local background
+    TEXT_MAX_LEVEL = 160  # Text pixels are at most this bright
+    BACKGROUND_SCALE = 3  # The background layer is stored at 1/N resolution
+    BACKGROUND_QUALITY = 50  # JPEG quality of the background layer
+    MIN_TEXT_FRACTION = 0.002  # Pages with less text are stored as plain JPEG
+    # Pages whose solid text pixels do not share one ink colour are stored as plain JPEG
+    INK_TOLERANCE = 48  # Gray levels (per channel) a pixel may differ from the median ink
+    MAX_OFF_INK_FRACTION = 0.10  # Fraction of solid text pixels allowed beyond INK_TOLERANCE
+
+# ============================================================================
+# PAGE CLASSIFICATION
+# ============================================================================
+class PageClassification:
+    """Per-page codec routing for image_format "AUTO" (see page_classifier.py)"""
+    TEXT = "text"
+    GRAYSCALE = "grayscale"
+    COLOR = "color"
+
+    SAMPLE_WIDTH = 256  # Signals are computed on a plane subsampled to about this width
+
+    # Colour: pixels whose channel spread (max - min) is at least SATURATION_MIN
+    SATURATION_MIN = 48
+    COLOR_FRACTION = 0.02  # Fraction of such pixels that makes a colour page
+
+    # Text: a two-level histogram with few midtones and sharp edges
+    BIMODALITY_MIN = 0.80  # Otsu between-class / total variance
+    MIDTONE_MARGIN = 0.2  # Midtones lie this fraction of the class-mean gap inside both means
+    MIDTONE_MAX = 0.06
+    EDGE_THRESHOLD = 96  # Sobel |dx| + |dy| counted as an edge
+    EDGE_MIN = 0.005  # Fraction of edge pixels
+
+    # Codec per class; "quality" applies to JPEG, "color" keeps RGB
+    POLICY = {
+        TEXT: {"format": "G4"},
+        GRAYSCALE: {"format": "JPEG", "quality": 85},
+        COLOR: {"format": "JPEG", "quality": 85, "color": True},
+    }
+
+# ============================================================================
+# PARALLEL PAGE OPTIMIZATION
+# ============================================================================
+class ParallelOptimization:
+    """Process pool for PdfConverter page optimization (see automation/parallel_optimizer.py)"""
+    WORKERS = 0  # 0 = one per CPU core minus one; frozen builds always run serially
+    CHUNK_SIZE = 4  # Pages per work item sent to a worker
+    CHUNKS_IN_FLIGHT_PER_WORKER = 2  # Bounds the pages held in memory
+    MIN_PAGES = 8  # Fewer pages are optimized serially (pool startup is not worth it)
+    INCREMENTAL_CHUNK_SIZE = 1  # Pages per work item while the PDF is built during capture
+
+# ============================================================================
+# ENCODED PAGE CACHE
+# ============================================================================
+class EncodingCache:
+    """Content-addressed cache of optimized page encodings (see automation/encoding_cache.py)"""
+    ENABLED = False  # Opt-in: keeps a copy of every encoded page in the per-user cache directory
+    MAX_BYTES = 512 * 1024 * 1024  # LRU eviction above this total blob size
+    DIRNAME = "page_cache"
+    KEY_VERSION = 2  # Bump when the optimization output changes for the same parameters
+
+    @staticmethod
+    def get_default_dir():
+        """Per-user cache directory (%LOCALAPPDATA% on Windows, ~/.cache elsewhere)"""
+        import os
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(base, "kindle-to-pdf", EncodingCache.DIRNAME)
+
+# ============================================================================
+# PDF OUTPUT
+# ============================================================================
+class PdfOutput:
+    """Streaming PDF writer settings (see automation/pdf_writer.py)"""
+    DEFAULT_DPI = 96  # Used when an image has no resolution info (same as img2pdf)
+    FLATE_LEVEL = 6  # zlib level for images that cannot be passed through
+    LINEARIZE = True  # Rewrite the finished PDF for fast web view (first page up front)
+    COPY_CHUNK_SIZE = 1024 * 1024  # Read size when copying streams into the linearized file
+
+# ============================================================================
+# VOLUME SPLITTING
+# ============================================================================
+class VolumeSplit:
+    """Building long books as volume PDFs (see PdfConverter.create_pdf_volumes)"""
+    MAX_PAGES = 500  # Pages per volume (0 = no page limit)
+    MAX_BYTES = 0  # Estimated bytes per volume (0 = no size limit)
+    SPLIT_AT_CHAPTERS = False  # Prefer cutting at detected chapter starts
+    MIN_PAGES = 20  # A chapter cut never leaves a shorter volume
+    PARALLEL_VOLUMES = 2  # Volumes built at the same time (sharing one optimizer process pool)
+    MERGE = False  # Also write the whole book as one PDF by copying the volumes' pages
+    FILENAME_SUFFIX = "_vol"  # book.pdf -> book_vol01.pdf, book_vol02.pdf, ...
+    SIZE_SAMPLE_PAGES = 12  # Pages encoded to estimate output bytes per captured byte
+
+    # Chapter detection (see volume_planner.py)
+    SAMPLE_WIDTH = 256  # Pages are profiled on a plane subsampled to about this width
+    INK_LEVEL = 128  # Darker pixels are ink
+    MIN_ROW_INK = 2  # Inked pixels that make a row part of the text
+    BLANK_INK = 0.001  # Pages with a smaller inked fraction are blank
+    CHAPTER_DROP = 0.15  # Text starting this fraction of the page height below usual opens a chapter
 
 # ============================================================================
 # SYSTEM POWER MANAGEMENT
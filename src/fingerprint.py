@@ -0,0 +1,188 @@
+"""
+Perceptual fingerprint engine for page-change decisions.
+Complements ImageHasher's (mean, 8x8 dHash) with aHash, pHash, a Haar
+wavelet (block-mean) hash and a 16x16 dHash, all derived from one small
+grayscale plane, and combines their per-algorithm verdicts.
+"""
+
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from src.constants import Fingerprint
+from src.frame import Frame
+from src.image_hasher import ImageHasher
+
+
+def _pack(bits: np.ndarray) -> int:
+    """Pack a boolean array (first element = least significant bit) into an int"""
+    return int.from_bytes(np.packbits(bits.reshape(-1), bitorder="little").tobytes(), "little")
+
+
+def _ahash(plane: np.ndarray) -> int:
+    """8x8 average hash: block means above the overall mean"""
+    small = cv2.resize(plane, (8, 8), interpolation=cv2.INTER_AREA)
+    return _pack(small > small.mean())
+
+
+def _phash(plane: np.ndarray) -> int:
+    """DCT hash: lowest 8x8 frequencies above their median"""
+    low = cv2.dct(plane)[:8, :8]
+    return _pack(low > np.median(low))
+
+
+def _whash(plane: np.ndarray) -> int:
+    """Haar wavelet hash: 16x16 approximation band (2x2 block means) above its median"""
+    approx = cv2.resize(plane, (16, 16), interpolation=cv2.INTER_AREA)
+    return _pack(approx > np.median(approx))
+
+
+def _dhash16(plane: np.ndarray) -> int:
+    """16x16 difference hash: horizontal gradient signs of a 17x16 resize"""
+    small = cv2.resize(plane, (17, 16), interpolation=cv2.INTER_AREA)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+def _dhash(plane: np.ndarray) -> int:
+    """8x8 difference hash of the base plane (same layout as ImageHasher's dHash)"""
+    small = cv2.resize(plane, (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+# name -> (hash function of the base plane, hash length in bits)
+ALGORITHMS: Dict[str, Tuple[Callable[[np.ndarray], int], int]] = {
+    "dhash": (_dhash, 64),
+    "ahash": (_ahash, 64),
+    "phash": (_phash, 64),
+    "whash": (_whash, 256),
+    "dhash16": (_dhash16, 256),
+}
+
+# Combiners turn per-algorithm "same page" votes into one verdict
+COMBINERS: Dict[str, Callable[[Dict[str, bool]], bool]] = {
+    "all": lambda votes: all(votes.values()),
+    "any": lambda votes: any(votes.values()),
+    "majority": lambda votes: sum(votes.values()) * 2 > len(votes),
+}
+
+
+class FingerprintEngine:
+    """
+    Computes and compares multi-algorithm page fingerprints.
+
+    The hot path (hot_hash) returns the (mean, hash) tuple ImageHasher uses,
+    so PageTurnWaiter and EndOfBookDetector work unchanged; with the default
+    "dhash" it is ImageHasher.hash_image itself. The stronger algorithms are
+    only computed by fingerprint() when a decision needs confirmation,
+    e.g. before accepting an end-of-book candidate.
+
+    A fingerprint is a dict of algorithm name -> hash int. Two fingerprints
+    show the same page when the combiner accepts the per-algorithm votes,
+    each vote being "Hamming distance <= threshold for that algorithm".
+    """
+
+    def __init__(
+        self,
+        algorithms: Iterable[str] = Fingerprint.CONFIRM_ALGORITHMS,
+        combiner: Union[str, Callable[[Dict[str, bool]], bool]] = Fingerprint.COMBINER,
+        thresholds: Optional[Dict[str, int]] = None,
+        hot_algorithm: str = Fingerprint.HOT_ALGORITHM,
+        base_size: int = Fingerprint.BASE_SIZE
+    ):
+        """
+        Initialize the engine
+
+        Args:
+            algorithms: Confirmation algorithms (keys of ALGORITHMS)
+            combiner: Name in COMBINERS, or a function taking {name: same_page}
+                votes and returning True if the pages are the same
+            thresholds: Per-algorithm Hamming thresholds overriding Fingerprint.THRESHOLDS
+            hot_algorithm: 64-bit algorithm used on the polling path
+            base_size: Side of the square plane every hash is derived from
+
+        Raises:
+            ValueError: If an algorithm or combiner name is unknown
+        """
+        self.algorithms = tuple(algorithms)
+        for name in self.algorithms + (hot_algorithm,):
+            if name not in ALGORITHMS:
+                raise ValueError(f"Unknown fingerprint algorithm: {name}")
+        if ALGORITHMS[hot_algorithm][1] != 64:
+            raise ValueError(f"Hot path algorithm must be a 64-bit hash: {hot_algorithm}")
+        if isinstance(combiner, str):
+            if combiner not in COMBINERS:
+                raise ValueError(f"Unknown fingerprint combiner: {combiner}")
+            combiner = COMBINERS[combiner]
+        self.combiner = combiner
+        self.thresholds = dict(Fingerprint.THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.hot_algorithm = hot_algorithm
+        self.base_size = base_size
+
+    def base_plane(self, image) -> np.ndarray:
+        """
+        Downsample an image to the shared float32 plane all hashes are computed from
+
+        Args:
+            image: Frame, 2D grayscale array or PIL Image
+        """
+        if isinstance(image, Frame):
+            gray = image.gray
+        elif isinstance(image, np.ndarray):
+            gray = image
+        else:
+            gray = np.asarray(image.convert("L"))
+        size = (self.base_size, self.base_size)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def hot_hash(self, image) -> Tuple[float, int]:
+        """
+        Cheap (mean, 64-bit hash) tuple for the polling path
+
+        Compatible with ImageHasher.compare_hashes/compare_many.
+        """
+        if self.hot_algorithm == "dhash":
+            return ImageHasher.hash_image(image)
+        gray = image.gray if isinstance(image, Frame) else image
+        plane = self.base_plane(gray)
+        return cv2.mean(gray)[0], ALGORITHMS[self.hot_algorithm][0](plane)
+
+    def fingerprint(self, image) -> Dict[str, int]:
+        """
+        Compute all confirmation hashes from one downsampled plane
+
+        Args:
+            image: Frame, 2D grayscale array or PIL Image
+
+        Returns:
+            Dict of algorithm name -> hash int
+        """
+        plane = self.base_plane(image)
+        return {name: ALGORITHMS[name][0](plane) for name in self.algorithms}
+
+    @staticmethod
+    def distances(fp1: Dict[str, int], fp2: Dict[str, int]) -> Dict[str, int]:
+        """Hamming distance per algorithm present in both fingerprints"""
+        return {name: bin(fp1[name] ^ fp2[name]).count('1') for name in fp1 if name in fp2}
+
+    def votes(self, fp1: Dict[str, int], fp2: Dict[str, int]) -> Dict[str, bool]:
+        """Per-algorithm "same page" votes"""
+        return {
+            name: distance <= self.thresholds[name]
+            for name, distance in self.distances(fp1, fp2).items()
+        }
+
+    def same_page(self, fp1: Dict[str, int], fp2: Dict[str, int]) -> bool:
+        """
+        Decide whether two fingerprints show the same page
+
+        Args:
+            fp1, fp2: Fingerprints from fingerprint()
+
+        Returns:
+            True if the combiner accepts the per-algorithm votes
+        """
+        votes = self.votes(fp1, fp2)
+        return bool(votes) and bool(self.combiner(votes))
@@ -0,0 +1,117 @@
+"""
+Captured frame container.
+Wraps one BGRA capture buffer so the hasher, the PNG encoder and the preview
+all read the same pixels without intermediate copies or format round-trips.
+"""
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class Frame:
+    """
+    A captured frame backed by a BGRA NumPy view.
+
+    Frame.from_screenshot() wraps mss's raw BGRA buffer without copying (mss's
+    .rgb property is a slow pure-Python byte shuffle). The grayscale plane is
+    computed once on first access with COLOR_BGRA2GRAY and shared by every
+    consumer afterwards.
+    """
+
+    __slots__ = ("bgra", "left", "top", "_gray")
+
+    def __init__(self, bgra: np.ndarray, left: int = 0, top: int = 0,
+                 gray: Optional[np.ndarray] = None):
+        """
+        Args:
+            bgra: uint8 array of shape (height, width, 4) in BGRA order
+            left: Screen x of the frame's top-left corner
+            top: Screen y of the frame's top-left corner
+            gray: Optional precomputed grayscale plane (height, width)
+        """
+        self.bgra = bgra
+        self.left = left
+        self.top = top
+        self._gray = gray
+
+    @classmethod
+    def from_screenshot(cls, sct_img) -> "Frame":
+        """
+        Wrap an mss ScreenShot without copying its pixels
+
+        Args:
+            sct_img: Object returned by mss.grab()
+
+        Returns:
+            Frame viewing sct_img.raw
+        """
+        width, height = sct_img.size
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(height, width, 4)
+        return cls(bgra, sct_img.left, sct_img.top)
+
+    @property
+    def width(self) -> int:
+        return self.bgra.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.bgra.shape[0]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height), same layout as mss ScreenShot.size"""
+        return self.bgra.shape[1], self.bgra.shape[0]
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale plane (computed once, then cached)"""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2GRAY)
+        return self._gray
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "Frame":
+        """
+        View of a sub-rectangle (shares the pixels, and the grayscale plane if computed)
+
+        Args:
+            x, y: Top-left corner relative to this frame
+            width, height: Size in pixels
+
+        Returns:
+            Frame positioned at the rectangle's screen coordinates
+        """
+        gray = self._gray[y:y + height, x:x + width] if self._gray is not None else None
+        return Frame(self.bgra[y:y + height, x:x + width], self.left + x, self.top + y, gray)
+
+    def to_image(self, mode: str = "RGB") -> Image.Image:
+        """
+        Convert to a PIL image
+
+        Args:
+            mode: "RGB" (colour, BGRA swizzled in C by Pillow) or "L" (grayscale plane)
+
+        Returns:
+            PIL Image
+        """
+        if mode == "L":
+            return Image.fromarray(self.gray)
+        bgra = np.ascontiguousarray(self.bgra)
+        return Image.frombuffer("RGB", self.size, bgra, "raw", "BGRX", 0, 1)
+
+    def thumbnail(self, max_width: int, max_height: int) -> Image.Image:
+        """
+        Small RGB preview image, downscaled straight from the BGRA buffer
+
+        Args:
+            max_width: Maximum width in pixels
+            max_height: Maximum height in pixels
+
+        Returns:
+            PIL Image no larger than max_width x max_height
+        """
+        scale = min(max_width / self.width, max_height / self.height, 1.0)
+        size = (max(1, int(self.width * scale)), max(1, int(self.height * scale)))
+        small = cv2.resize(self.bgra, size, interpolation=cv2.INTER_AREA)
+        return Image.frombuffer("RGB", size, small, "raw", "BGRX", 0, 1)
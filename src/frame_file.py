@@ -0,0 +1,198 @@
+"""
+Intermediate frame file format.
+Captured pages only live in the temp screenshots folder until the PDF is
+built, so they are stored as raw pixel planes with a small header and a fast
+zlib level instead of fully compressed PNG.
+
+File layout (big-endian):
+    magic      4s   b"KFRM"
+    version    B
+    channels   B    1 = grayscale, 4 = BGRA
+    codec      B    0 = uncompressed, 1 = zlib
+    reserved   B
+    width      I
+    height     I
+    length     I    payload length in bytes
+    crc32      I    CRC-32 of the uncompressed pixels
+    payload
+"""
+import io
+import struct
+import zlib
+from typing import Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from src.constants import FrameFile
+from src.frame import Frame
+
+MAGIC = b"KFRM"
+_HEADER = struct.Struct(">4sBBBxIIII")
+_CODEC_RAW = 0
+_CODEC_ZLIB = 1
+
+
+class FrameFileError(Exception):
+    """Raised when a frame file is truncated, corrupt or of an unknown version"""
+    pass
+
+
+def is_frame_data(data: bytes) -> bool:
+    """True if data starts with a frame file header"""
+    return data[:4] == MAGIC
+
+
+def encode_frame(frame: Frame, mode: str = FrameFile.MODE,
+                 level: int = FrameFile.ZLIB_LEVEL) -> bytes:
+    """
+    Encode a captured frame
+
+    Args:
+        frame: Captured frame
+        mode: "L" (grayscale plane) or "BGRA" (full colour buffer)
+        level: zlib level, 0 stores the pixels uncompressed
+
+    Returns:
+        Frame file contents
+    """
+    if mode == "L":
+        pixels = np.ascontiguousarray(frame.gray)
+        channels = 1
+    elif mode == "BGRA":
+        pixels = np.ascontiguousarray(frame.bgra)
+        channels = 4
+    else:
+        raise ValueError(f"Unsupported frame file mode: {mode}")
+
+    raw = pixels.data
+    crc = zlib.crc32(raw)
+    if level > 0:
+        payload = zlib.compress(raw, level)
+        codec = _CODEC_ZLIB
+    else:
+        payload = raw.tobytes()
+        codec = _CODEC_RAW
+    header = _HEADER.pack(MAGIC, FrameFile.VERSION, channels, codec,
+                          frame.width, frame.height, len(payload), crc)
+    return header + payload
+
+
+def _decode_pixels(data: bytes) -> Tuple[int, int, int, Union[bytes, memoryview]]:
+    """Validate a frame file and return (channels, width, height, pixels)
+
+    Uncompressed pixels are returned as a view of data.
+    """
+    if len(data) < _HEADER.size or not is_frame_data(data):
+        raise FrameFileError("Not a frame file")
+    _, version, channels, codec, width, height, length, crc = _HEADER.unpack_from(data)
+    if version != FrameFile.VERSION:
+        raise FrameFileError(f"Unsupported frame file version {version}")
+    if channels not in (1, 4):
+        raise FrameFileError(f"Unsupported channel count {channels}")
+    payload = memoryview(data)[_HEADER.size:]
+    if len(payload) != length:
+        raise FrameFileError(f"Truncated frame file ({len(payload)}/{length} bytes)")
+
+    if codec == _CODEC_ZLIB:
+        try:
+            pixels = zlib.decompress(payload)
+        except zlib.error as e:
+            raise FrameFileError(f"Corrupt frame data: {e}") from e
+    elif codec == _CODEC_RAW:
+        pixels = payload
+    else:
+        raise FrameFileError(f"Unknown frame codec {codec}")
+
+    if len(pixels) != width * height * channels or zlib.crc32(pixels) != crc:
+        raise FrameFileError("Frame data does not match its header")
+    return channels, width, height, pixels
+
+
+def decode_frame_array(data: bytes) -> np.ndarray:
+    """
+    Pixels of a frame file as a NumPy array, without building an image
+
+    Args:
+        data: Frame file contents
+
+    Returns:
+        Read-only uint8 array: (height, width) grayscale or (height, width, 4)
+        BGRA; a view of data for uncompressed frames
+
+    Raises:
+        FrameFileError: If the data is truncated or corrupt
+    """
+    channels, width, height, pixels = _decode_pixels(data)
+    array = np.frombuffer(pixels, dtype=np.uint8)
+    return array.reshape(height, width) if channels == 1 else array.reshape(height, width, 4)
+
+
+def decode_frame(data: bytes) -> Image.Image:
+    """
+    Decode frame file contents
+
+    Args:
+        data: Frame file contents
+
+    Returns:
+        PIL Image ("L" for grayscale frames, "RGB" for BGRA frames)
+
+    Raises:
+        FrameFileError: If the data is truncated or corrupt
+    """
+    channels, width, height, pixels = _decode_pixels(data)
+    if channels == 1:
+        return Image.frombytes("L", (width, height), pixels)
+    return Image.frombytes("RGB", (width, height), pixels, "raw", "BGRX")
+
+
+def read_frame_file(path: str) -> Image.Image:
+    """
+    Read a frame file
+
+    Raises:
+        FrameFileError: If the file is not a valid frame file
+    """
+    with open(path, "rb") as f:
+        return decode_frame(f.read())
+
+
+def decode_page_image(data: bytes) -> Image.Image:
+    """
+    Decode a captured page, either a frame file or any format Pillow reads
+    (pages captured by older versions were written as PNG)
+
+    Args:
+        data: Page file contents
+
+    Returns:
+        Loaded PIL Image
+    """
+    if is_frame_data(data):
+        return decode_frame(data)
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def verify_page_file(path: str) -> None:
+    """
+    Check that a captured page file is intact
+
+    Raises:
+        Exception: FrameFileError or a Pillow error if the file is damaged
+    """
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC))
+    if is_frame_data(head):
+        read_frame_file(path)
+    else:
+        with Image.open(path) as img:
+            img.verify()
+
+
+def page_file_name(page_num: int) -> str:
+    """File name of a captured page in the screenshots folder"""
+    return f"page_{page_num:04d}{FrameFile.EXTENSION}"
+
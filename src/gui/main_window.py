@@ -332,10 +332,10 @@ class MainWindow(ctk.CTkFrame):
             self.progress_bar.set(progress)
             self.progress_label.configure(text=f"Page: {current}/{total}")
 
-    def update_preview(self, image_path):
-        """Update preview image"""
+    def update_preview(self, image):
+        """Update preview image (a PIL Image from the capture pipeline, or a file path)"""
         try:
-            img = Image.open(image_path)
+            img = image.copy() if isinstance(image, Image.Image) else Image.open(image)
             img.thumbnail((GUI.PREVIEW_WIDTH, GUI.PREVIEW_HEIGHT), Image.Resampling.LANCZOS)
             photo = ImageTk.PhotoImage(img)
             self.preview_image_ref = photo
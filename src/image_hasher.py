@@ -2,9 +2,15 @@
 Image hashing utilities for detecting page changes.
 Shared by automation_coordinator and kindle_controller.
 """
+from typing import Sequence, Tuple, Union
+
 import cv2
 import numpy as np
-from PIL import Image
+
+from src.frame import Frame
+
+# Bit count of every byte value (popcount fallback for NumPy < 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
 
 
 class ImageHasher:
@@ -16,30 +22,133 @@ class ImageHasher:
         Calculate hash of an image.
 
         Args:
-            img_data: mss screenshot object or PIL Image
+            img_data: Frame, mss screenshot object or PIL Image
             is_mss_screenshot: True if img_data is from mss.grab(), False if PIL Image
+                (ignored for Frame objects)
 
         Returns:
             tuple: (mean_value, dhash)
         """
+        if isinstance(img_data, Frame):
+            # Reuses (or fills) the frame's cached grayscale plane
+            return ImageHasher.hash_gray(img_data.gray)
+
         if is_mss_screenshot:
-            img = Image.frombytes("RGB", img_data.size, img_data.rgb)
-        else:
-            img = img_data
+            return ImageHasher.hash_gray(Frame.from_screenshot(img_data).gray)
 
-        img_np = np.array(img)
+        img_np = np.array(img_data.convert("RGB"))
         gray_img = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+        return ImageHasher.hash_gray(gray_img)
 
+    @staticmethod
+    def hash_gray(gray_img):
+        """
+        Calculate hash of a grayscale plane.
+
+        Args:
+            gray_img: 2D uint8 NumPy array
+
+        Returns:
+            tuple: (mean_value, dhash)
+        """
         # Mean value
         mean_value = cv2.mean(gray_img)[0]
 
-        # dHash (difference hash)
+        # dHash (difference hash): bit i is set when pixel i+1 is brighter than pixel i
         resized = cv2.resize(gray_img, (9, 8), interpolation=cv2.INTER_AREA)
         diff = resized[:, 1:] > resized[:, :-1]
-        hash_value = sum([2 ** i for (i, v) in enumerate(diff.flatten()) if v])
+        hash_value = int(ImageHasher._pack_bits(diff.reshape(1, 64))[0])
 
         return (mean_value, hash_value)
 
+    @staticmethod
+    def _pack_bits(bits):
+        """Pack rows of 64 booleans (first element = least significant bit) into uint64"""
+        packed = np.packbits(bits, axis=1, bitorder="little")
+        return np.ascontiguousarray(packed).view("<u8").reshape(-1)
+
+    @staticmethod
+    def _gray_stack(frames) -> np.ndarray:
+        if isinstance(frames, np.ndarray):
+            if frames.ndim == 2:
+                return frames[np.newaxis]
+            if frames.ndim != 3:
+                raise ValueError(f"Expected a (count, height, width) stack, got shape {frames.shape}")
+            return frames
+        planes = [f.gray if isinstance(f, Frame) else np.asarray(f) for f in frames]
+        return np.stack(planes)
+
+    @staticmethod
+    def hash_batch(frames: Union[np.ndarray, Sequence]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate hashes of many same-sized frames in one call.
+
+        Only the 9x8 area resize runs per frame (straight into a shared
+        buffer); the mean, the difference bits and the bit packing are done
+        for the whole stack at once.
+
+        Args:
+            frames: (count, height, width) uint8 array, or a sequence of
+                Frames / 2D grayscale arrays of the same size
+
+        Returns:
+            tuple: (means, dhashes) - float64 and uint64 arrays of length count,
+                equal element-wise to hash_gray() of each frame
+        """
+        stack = ImageHasher._gray_stack(frames)
+        count = stack.shape[0]
+        # Exact integer sums scaled like cv2.mean does, so means match hash_gray() bit for bit
+        pixel_count = stack.shape[1] * stack.shape[2]
+        sums = stack.sum(axis=(1, 2), dtype=np.uint64).astype(np.float64)
+        means = sums * (1.0 / pixel_count) if pixel_count else np.zeros(count)
+        resized = np.empty((count, 8, 9), dtype=np.uint8)
+        for i in range(count):
+            cv2.resize(stack[i], (9, 8), dst=resized[i], interpolation=cv2.INTER_AREA)
+        diff = resized[:, :, 1:] > resized[:, :, :-1]
+        hashes = ImageHasher._pack_bits(diff.reshape(count, 64))
+        return means, hashes
+
+    @staticmethod
+    def popcount(values: np.ndarray) -> np.ndarray:
+        """
+        Count set bits of every element of a uint64 array
+
+        Args:
+            values: uint64 array
+
+        Returns:
+            Array of bit counts with the same shape
+        """
+        values = np.asarray(values, dtype=np.uint64)
+        bitwise_count = getattr(np, "bitwise_count", None)
+        if bitwise_count is not None:
+            return bitwise_count(values)
+        as_bytes = np.ascontiguousarray(values).view(np.uint8).reshape(values.shape + (8,))
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+    @staticmethod
+    def compare_many(hash1, hash_array) -> np.ndarray:
+        """
+        Compare one hash against many and return all difference scores.
+
+        Args:
+            hash1: tuple of (mean_value, dhash)
+            hash_array: tuple of (means, dhashes) arrays as returned by hash_batch(),
+                or a sequence of (mean_value, dhash) tuples
+
+        Returns:
+            float64 array of difference scores, same formula as compare_hashes()
+        """
+        if isinstance(hash_array, tuple) and len(hash_array) == 2 and isinstance(hash_array[0], np.ndarray):
+            means, hashes = hash_array
+        else:
+            pairs = list(hash_array)
+            means = np.array([h[0] for h in pairs], dtype=np.float64)
+            hashes = np.array([h[1] for h in pairs], dtype=np.uint64)
+        xor = np.asarray(hashes, dtype=np.uint64) ^ np.uint64(hash1[1])
+        hamming_dist = ImageHasher.popcount(xor)
+        return np.abs(np.asarray(means, dtype=np.float64) - hash1[0]) + hamming_dist * 2.0
+
     @staticmethod
     def compare_hashes(hash1, hash2):
         """
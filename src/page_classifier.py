@@ -0,0 +1,118 @@
+"""
+Page content classifier.
+Labels a page as text, grayscale image or colour image from a few cheap
+signals on a subsampled plane, so each page can be routed to the smallest
+codec that keeps it legible (see PageClassification.POLICY).
+"""
+
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from src.constants import PageClassification
+
+
+class PageClass(NamedTuple):
+    """Classifier decision and the signals it was based on"""
+    label: str
+    bimodality: float  # Otsu between-class / total variance (1.0 = two clean levels)
+    midtones: float  # Fraction of pixels between the Otsu class means
+    color_fraction: float  # Fraction of saturated pixels
+    edge_density: float  # Fraction of pixels with a strong gradient
+
+    def describe(self) -> str:
+        return (f"{self.label} (bimodality {self.bimodality:.2f}, midtones {self.midtones:.1%}, "
+                f"colour {self.color_fraction:.1%}, edges {self.edge_density:.1%})")
+
+
+def _subsample(pixels: np.ndarray) -> np.ndarray:
+    """Strided view about SAMPLE_WIDTH pixels wide (keeps the pixel value distribution)"""
+    step = max(1, pixels.shape[1] // PageClassification.SAMPLE_WIDTH)
+    return pixels[::step, ::step]
+
+
+def color_fraction(pixels: np.ndarray) -> float:
+    """
+    Fraction of saturated pixels
+
+    Args:
+        pixels: uint8 array (height, width, 3 or 4) in RGB, BGR or BGRA order,
+            or (height, width) grayscale
+
+    Returns:
+        0.0 for grayscale input
+    """
+    if pixels.ndim == 2:
+        return 0.0
+    sample = _subsample(pixels)[..., :3].astype(np.int16)
+    # HSV saturation scaled to value: (max - min) is channel-order independent
+    spread = sample.max(axis=2) - sample.min(axis=2)
+    return float(np.count_nonzero(spread >= PageClassification.SATURATION_MIN)) / spread.size
+
+
+def is_color(pixels: np.ndarray) -> bool:
+    """True if enough pixels are saturated for the page to need colour"""
+    return color_fraction(pixels) >= PageClassification.COLOR_FRACTION
+
+
+def _bimodality(gray: np.ndarray):
+    """(Otsu effectiveness, midtone fraction) of a grayscale sample"""
+    hist = np.bincount(gray.reshape(-1), minlength=256).astype(np.float64)
+    total = hist.sum()
+    levels = np.arange(256, dtype=np.float64)
+    mean = (hist * levels).sum() / total
+    variance = (hist * (levels - mean) ** 2).sum() / total
+    if variance < 1e-6:
+        # Blank page: a single level is trivially bilevel
+        return 1.0, 0.0
+
+    # Between-class variance for every threshold at once
+    weight0 = np.cumsum(hist) / total
+    cum_mean = np.cumsum(hist * levels) / total
+    weight1 = 1.0 - weight0
+    valid = (weight0 > 0) & (weight1 > 0)
+    between = np.zeros(256)
+    between[valid] = (mean * weight0[valid] - cum_mean[valid]) ** 2 / (weight0[valid] * weight1[valid])
+    threshold = int(np.argmax(between))
+
+    mean0 = cum_mean[threshold] / weight0[threshold]
+    mean1 = (mean - cum_mean[threshold]) / weight1[threshold]
+    # Pixels well inside the gap between the two class means
+    margin = (mean1 - mean0) * PageClassification.MIDTONE_MARGIN
+    low, high = int(np.ceil(mean0 + margin)), int(np.floor(mean1 - margin))
+    midtones = hist[low:high + 1].sum() / total if high >= low else 0.0
+    return float(between[threshold] / variance), float(midtones)
+
+
+def classify(pixels: np.ndarray) -> PageClass:
+    """
+    Classify a page
+
+    Args:
+        pixels: uint8 array (height, width, 3 or 4) or (height, width) grayscale
+
+    Returns:
+        PageClass with label PageClassification.TEXT, GRAYSCALE or COLOR
+    """
+    colour = color_fraction(pixels)
+    if pixels.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if pixels.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        gray = cv2.cvtColor(np.ascontiguousarray(_subsample(pixels)), code)
+    else:
+        gray = np.ascontiguousarray(_subsample(pixels))
+
+    bimodality, midtones = _bimodality(gray)
+    gradient = np.abs(cv2.Sobel(gray, cv2.CV_16S, 1, 0)) + np.abs(cv2.Sobel(gray, cv2.CV_16S, 0, 1))
+    edges = float(np.count_nonzero(gradient >= PageClassification.EDGE_THRESHOLD)) / gradient.size
+
+    if colour >= PageClassification.COLOR_FRACTION:
+        label = PageClassification.COLOR
+    elif (bimodality >= PageClassification.BIMODALITY_MIN and
+          midtones <= PageClassification.MIDTONE_MAX and
+          (edges >= PageClassification.EDGE_MIN or midtones == 0.0)):
+        # Text: two clean levels with many sharp edges (or an empty page)
+        label = PageClassification.TEXT
+    else:
+        label = PageClassification.GRAYSCALE
+    return PageClass(label, bimodality, midtones, colour, edges)
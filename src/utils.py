@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import uuid
@@ -23,3 +24,15 @@ def cleanup_dir(dir_path):
         except OSError as e:
             # print(f"Error cleaning up directory {dir_path}: {e}") # For debugging
             pass
+
+def atomic_write_json(path, data):
+    """
+    Writes data as JSON to path via a temporary file and rename,
+    so readers never see a partially written file.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)